@@ -0,0 +1,111 @@
+"""
+IMPORT TIME BENCHMARK
+=====================
+
+Measure how long it takes to import each module in `src` in a fresh process,
+and which heavy third party packages are loaded as a side effect.
+
+Every import is timed in a new interpreter (so nothing is cached) and the best
+of `--repeat` runs is reported. The heavy packages are timed on their own as
+well: this is the start up cost a worker avoids when a module does not load
+them at import.
+
+Usage (from the repo root):
+
+    python benchmarks/bench_imports.py [--repeat 5] [--json out.json]
+"""
+
+# standard library
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+
+PATH_LIB = Path(__file__).resolve().parent.parent
+MODULES = [
+    'src.config',
+    'src.utils',
+    'src.lexisnexis_parser',
+    'src.doc_analysis',
+    'src.geo_data',
+    'src.spacy_helpers',
+    'src.geoplot',
+]
+HEAVY = ['spacy', 'matplotlib', 'bs4', 'requests', 'scipy', 'IPython']
+
+SNIPPET = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+{access}
+elapsed = time.perf_counter() - start
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print(json.dumps({{'seconds': elapsed, 'loaded': heavy}}))
+"""
+
+
+def time_import(module, access='', repeat=5):
+    """
+    Return the best import time (s) of `module` over `repeat` fresh processes
+    and the heavy packages it loaded. Return `None` if the import fails.
+    """
+
+    code = SNIPPET.format(module=module, access=access, heavy=HEAVY)
+    best = None
+    for _ in range(repeat):
+        run = subprocess.run(
+            [sys.executable, '-c', code],
+            cwd=PATH_LIB,
+            capture_output=True,
+            text=True,
+        )
+        if run.returncode != 0:
+            return None
+        result = json.loads(run.stdout.strip().splitlines()[-1])
+        if best is None or result['seconds'] < best['seconds']:
+            best = result
+    return best
+
+
+def main(repeat=5, path_json=None):
+    results = dict()
+    print(f"{'module':.<32}{'seconds':>10}  loaded heavy packages")
+    for module in MODULES:
+        result = time_import(module, repeat=repeat)
+        results[module] = result
+        if result is None:
+            print(f"{module:.<32}{'failed':>10}")
+            continue
+        loaded = ', '.join(result['loaded']) or '-'
+        print(f"{module:.<32}{result['seconds']:>10.3f}  {loaded}")
+
+    # accessing a setting parses the ini file once
+    access = 'src.config.PATHS, src.config.LEXISNEXIS'
+    result = time_import('src.config', access=access, repeat=repeat)
+    results['src.config (PATHS, LEXISNEXIS)'] = result
+    if result is not None:
+        print(f"{'src.config + 2 sections':.<32}{result['seconds']:>10.3f}")
+
+    print(f"\n{'avoided at import':.<32}{'seconds':>10}")
+    for package in HEAVY:
+        result = time_import(package, repeat=repeat)
+        results[package] = result
+        if result is None:
+            print(f"{package:.<32}{'n/a':>10}")
+            continue
+        print(f"{package:.<32}{result['seconds']:>10.3f}")
+
+    if path_json:
+        with open(path_json, 'w', encoding='utf8') as f:
+            json.dump(results, f, indent=4)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', dest='path_json', default=None)
+    args = parser.parse_args()
+    main(repeat=args.repeat, path_json=args.path_json)
@@ -0,0 +1,199 @@
+"""
+PIPELINE BENCHMARK
+==================
+
+Time the main steps of the pipeline on synthetic LexisNexis corpora of
+several sizes and report throughput and peak memory per step:
+
+1. `textract_batch`         parse the docx files, types, dedup, paragraph
+                             dedup, standardize, queries
+2. `strip_boilerplate`      corpus-wide boilerplate paragraphs
+3. `drop_near_duplicates`   corpus-wide near-duplicate articles
+4. `serialize_batch`        nlp + serialization of the Docs
+5. analysis                 `basic_stats` and `attribute_counter` over the Docs
+6. `PhraseSearch`           search a set of toponyms in the articles
+
+Steps 1 to 3 run the functions of the `textraction` module as they are used by
+02_textraction.py, with the settings in 'config.ini'. Steps 4 and 5 need
+spaCy. The model in `PATHS.model` is used if it exists, otherwise a blank
+Dutch model with an `EntityRuler` for the toponyms. Step 6 needs IPython
+(imported by `annotation_tools`).
+Steps that cannot run are reported as skipped.
+
+Peak memory is the peak of the Python heap during the step (`tracemalloc`).
+
+Usage (from the repo root):
+
+    python benchmarks/bench_pipeline.py [--sizes 100 1000 5000] [--json out.json]
+"""
+
+# standard library
+import argparse
+import json
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+PATH_LIB = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PATH_LIB))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+# third party
+import pandas as pd
+
+# local
+from src.config import PATHS
+from src.textraction import (
+    textract_batch,
+    strip_boilerplate,
+    drop_near_duplicates,
+)
+from synthetic_corpus import generate_corpus, load_toponyms
+
+
+BATCH = 'synthetic'
+
+
+@contextmanager
+def measure(results, step, n_items):
+    """
+    Time a step and trace its peak memory.
+    The measurement is added to `results` as a `dict`.
+    """
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    record = {'step': step, 'items': n_items}
+    try:
+        yield record
+    finally:
+        seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        record['seconds'] = seconds
+        record['items_per_s'] = n_items / seconds if seconds else None
+        record['peak_mb'] = peak / 2**20
+        results.append(record)
+
+
+def load_nlp(toponyms):
+    "Load the project model or build a blank one with an `EntityRuler`."
+    import spacy
+
+    if (PATHS.model / 'meta.json').exists():
+        return spacy.load(PATHS.model)
+
+    nlp = spacy.blank('nl')
+    patterns = [{'label': 'places', 'pattern': t} for t in toponyms]
+    try:
+        nlp.add_pipe('sentencizer')
+        ruler = nlp.add_pipe('entity_ruler')
+    except ValueError:
+        from spacy.pipeline import EntityRuler
+        nlp.add_pipe(nlp.create_pipe('sentencizer'))
+        ruler = EntityRuler(nlp)
+        nlp.add_pipe(ruler)
+    ruler.add_patterns(patterns)
+    return nlp
+
+
+def run_size(n_articles, path_tmp, toponyms, language, results):
+    path_raw = path_tmp / 'raw' / str(n_articles)
+    path_int = path_tmp / 'int' / str(n_articles)
+    path_clean = path_int / 'clean'
+    path_prc = path_tmp / 'prc'
+    path_int.mkdir(parents=True, exist_ok=True)
+    generate_corpus(
+        path_raw / BATCH, n_articles, toponyms=toponyms, language=language
+        )
+    run = list()
+
+    with measure(run, 'textract_batch', n_articles):
+        textract_batch(BATCH, BATCH, path_in=path_raw, path_out=path_int)
+
+    n_articles_int = len(pd.read_pickle(path_int / f"{BATCH}.pkl"))
+    with measure(run, 'strip_boilerplate', n_articles_int):
+        strip_boilerplate([BATCH], path_in=path_int, path_out=path_clean)
+
+    with measure(run, 'drop_near_duplicates', n_articles_int):
+        drop_near_duplicates([BATCH], path_in=path_clean, path_out=path_clean)
+    df = pd.read_pickle(path_clean / f"{BATCH}.pkl")
+
+    try:
+        from src.spacy_helpers import serialize_batch, fetch_docs
+        from src.doc_analysis import basic_stats, attribute_counter
+        nlp = load_nlp(toponyms)
+    except ImportError as e:
+        print(f"skipping nlp steps: {e}")
+    else:
+        with measure(run, 'serialize_batch', len(df)):
+            serialize_batch(nlp, BATCH, path_in=path_clean, path_out=path_prc)
+
+        with measure(run, 'basic_stats/attribute_counter', len(df)):
+            for doc in fetch_docs(path_prc / BATCH, nlp.vocab):
+                basic_stats(doc)
+                attribute_counter(doc)
+                attribute_counter(doc, unique=True)
+
+    try:
+        from src.annotation_tools import PhraseSearch
+    except ImportError as e:
+        print(f"skipping PhraseSearch: {e}")
+    else:
+        phrases = toponyms[::max(1, len(toponyms) // 25)]
+        with measure(run, 'PhraseSearch', len(phrases)):
+            for phrase in phrases:
+                PhraseSearch('bench', phrase, (df, 'body_str')).n_results
+
+    for record in run:
+        record['n_articles'] = n_articles
+    results.extend(run)
+    return run
+
+
+def main(sizes, path_json=None, keep=False, language='nl'):
+    toponyms = load_toponyms()
+    path_tmp = Path(tempfile.mkdtemp(prefix='bench_toponyms_'))
+    results = list()
+    try:
+        for n_articles in sizes:
+            print(f"--- {n_articles} articles", flush=True)
+            for record in run_size(
+                n_articles, path_tmp, toponyms, language, results
+                ):
+                print(
+                    f"{record['step']:.<32}"
+                    f"{record['seconds']:>9.2f}s"
+                    f"{record['items_per_s'] or 0:>11.0f}/s"
+                    f"{record['peak_mb']:>9.1f}MB",
+                    flush=True,
+                )
+    finally:
+        if not keep:
+            shutil.rmtree(path_tmp, ignore_errors=True)
+
+    if path_json:
+        with open(path_json, 'w', encoding='utf8') as f:
+            json.dump(results, f, indent=4)
+    return pd.DataFrame(results)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument(
+        '--sizes', type=int, nargs='+', default=[100, 1000, 5000]
+    )
+    parser.add_argument('--json', dest='path_json', default=None)
+    parser.add_argument('--keep', action='store_true', help='keep the corpus')
+    parser.add_argument('--language', default='nl', choices=['nl', 'en'])
+    args = parser.parse_args()
+    main(
+        args.sizes,
+        path_json=args.path_json,
+        keep=args.keep,
+        language=args.language,
+    )
@@ -0,0 +1,274 @@
+"""
+SYNTHETIC LEXISNEXIS CORPUS
+===========================
+
+Generate LexisNexis-style docx files for benchmarking. The real corpus is
+licensed, so the benchmarks run on articles with the same paragraph layout:
+
+    title
+    source
+    publication date
+    copyright
+    Section: ..., Length: ..., Byline: ..., Load-Date: ...
+    Body
+    ... paragraphs ...
+    Classification
+    Language: ..., Publication-Type: ...
+
+The document relations contain a LexisNexis url. Articles are sprinkled with
+toponyms taken from `PATHS.parameters`, the annotation files and (if present)
+the geonames table in `PATHS.resources`. Some articles are reprinted and some
+paragraphs recur across articles (boilerplate), like in the real data.
+
+Usage (from the repo root):
+
+    python benchmarks/synthetic_corpus.py path/to/output 1000 [--seed 0]
+"""
+
+# standard library
+import argparse
+import json
+import random
+import sys
+import zipfile
+from datetime import date, timedelta
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+PATH_LIB = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PATH_LIB))
+
+# local
+from src.config import PATHS, FILENAMES
+
+
+MONTHS = {
+    'nl': [
+        'januari', 'februari', 'maart', 'april', 'mei', 'juni', 'juli',
+        'augustus', 'september', 'oktober', 'november', 'december',
+    ],
+    'en': [
+        'January', 'February', 'March', 'April', 'May', 'June', 'July',
+        'August', 'September', 'October', 'November', 'December',
+    ],
+}
+WEEKDAYS = {
+    'nl': [
+        'maandag', 'dinsdag', 'woensdag', 'donderdag',
+        'vrijdag', 'zaterdag', 'zondag',
+    ],
+    'en': [
+        'Monday', 'Tuesday', 'Wednesday', 'Thursday',
+        'Friday', 'Saturday', 'Sunday',
+    ],
+}
+SECTIONS = [
+    'Binnenland', 'Buitenland', 'Economie', 'Opinie', 'Sport',
+    'Ten eerste | Buitenland', 'Podium', 'Nieuws; Politiek',
+]
+WORDS = (
+    "de het een en van in op met voor door naar over bij tegen onder "
+    "regering minister parlement akkoord deal onderhandelingen brexit "
+    "handel grens douane economie markt bedrijven export import burgers "
+    "premier kabinet verkiezingen referendum vertrek uitstel stemming "
+    "zegt volgens gisteren vandaag morgen week jaar maand besluit plan "
+    "gevolgen onzekerheid europese unie lidstaten afspraken tarieven"
+).split()
+BOILERPLATE = [
+    "Dit artikel is eerder verschenen in de gedrukte editie.",
+    "Reageren? Mail naar de redactie.",
+    "Lees ook de achtergrond op de website.",
+    "Correctie: in een eerdere versie stond een onjuiste datum.",
+]
+XML_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<w:document xmlns:w='
+    '"http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+    '<w:body>'
+)
+XML_TAIL = '</w:body></w:document>'
+RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns='
+    '"http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/'
+    'officeDocument/2006/relationships/hyperlink" '
+    'Target="{url}" TargetMode="External"/>'
+    '</Relationships>'
+)
+CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns='
+    '"http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '</Types>'
+)
+
+
+def load_toponyms(n_geonames=5000, seed=0):
+    """
+    Collect toponyms from the parameter files, the annotations and, if it has
+    been built, a sample of the geonames table.
+
+    Returns
+    =======
+    :load_toponyms: `list`
+    """
+
+    toponyms = set()
+    for filename in [FILENAMES.alt_country_names, FILENAMES.alt_placenames]:
+        path = PATHS.parameters / filename
+        if path.exists():
+            with open(path, 'r', encoding='utf8') as f:
+                alts = json.load(f)
+            for key, val in alts.items():
+                toponyms.add(key)
+                toponyms.update(val)
+
+    for path in PATHS.annotations.glob('annotations_*.csv'):
+        with open(path, 'r', encoding='utf8') as f:
+            next(f)
+            for line in f:
+                fields = line.split(',')
+                if len(fields) > 1 and fields[1]:
+                    toponyms.add(fields[1])
+
+    path = PATHS.resources / 'geonames/df_geonames.pkl'
+    if path.exists():
+        import pandas as pd
+        names = pd.read_pickle(path).alternate_name.dropna()
+        names = names.sample(min(n_geonames, len(names)), random_state=seed)
+        toponyms.update(names)
+    return sorted(toponyms)
+
+
+def paragraph_xml(text):
+    return f'<w:p><w:r><w:t xml:space="preserve">{escape(text)}</w:t></w:r></w:p>'
+
+
+def format_date(day, language='nl'):
+    month = MONTHS[language][day.month - 1]
+    weekday = WEEKDAYS[language][day.weekday()]
+    return f"{day.day} {month} {day.year} {weekday}"
+
+
+def make_sentence(rng, toponyms, p_toponym=0.15):
+    n = rng.randint(8, 25)
+    words = [
+        rng.choice(toponyms) if rng.random() < p_toponym else rng.choice(WORDS)
+        for _ in range(n)
+    ]
+    return ' '.join(words).capitalize() + '.'
+
+
+def make_article(rng, toponyms, source, n_article, start, language='nl'):
+    """
+    Return a synthetic article as a `dict` with the paragraphs and the url.
+    """
+
+    day = start + timedelta(days=rng.randint(0, 3 * 365))
+    n_paragraphs = rng.randint(3, 15)
+    body = [
+        ' '.join(make_sentence(rng, toponyms) for _ in range(rng.randint(1, 5)))
+        for _ in range(n_paragraphs)
+    ]
+    if rng.random() < 0.3:
+        body.append(rng.choice(BOILERPLATE))
+    n_words = sum(len(p.split()) for p in body)
+    title = make_sentence(rng, toponyms, p_toponym=0.3)[:-1]
+
+    paragraphs = [
+        title,
+        source,
+        f"{format_date(day, language)}, Editie: 1",
+        f"Copyright {day.year} {source}",
+        f"Section: {rng.choice(SECTIONS)}; Blz. {rng.randint(1, 40)}",
+        f"Length: {n_words} words",
+        f"Byline: Redacteur {rng.randint(1, 50)}",
+        f"Load-Date: {MONTHS['en'][day.month - 1]} {day.day}, {day.year}",
+        'Body',
+        *body,
+        'Classification',
+        'Language: DUT; DUTCH',
+        'Publication-Type: Krant',
+    ]
+    url = f"https://advance.lexis.com/api/document?id=urn:{source}:{n_article}"
+    return {'paragraphs': paragraphs, 'url': url}
+
+
+def write_docx(path, article):
+    document = (
+        XML_HEAD
+        + ''.join(paragraph_xml(p) for p in article['paragraphs'])
+        + XML_TAIL
+    )
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as docx:
+        docx.writestr('[Content_Types].xml', CONTENT_TYPES)
+        docx.writestr('word/document.xml', document)
+        docx.writestr(
+            'word/_rels/document.xml.rels', RELS.format(url=escape(article['url']))
+            )
+    return None
+
+
+def generate_corpus(
+    path_out,
+    n_articles,
+    source='Synthetic Courant',
+    toponyms=None,
+    language='nl',
+    p_reprint=0.05,
+    seed=0,
+):
+    """
+    Write `n_articles` synthetic LexisNexis docx files to `path_out`.
+
+    Parameters
+    ==========
+    :param path_out: `str` or `Path`
+    :param n_articles: `int`
+
+    Optional key-word arguments
+    ===========================
+    :param source: `str`, default='Synthetic Courant'
+    :param toponyms: `list`, default None
+        Toponyms to sprinkle in the text, `load_toponyms` if not given.
+    :param language: `str`, default='nl'
+        Language of the publication date ('nl' or 'en').
+    :param p_reprint: `float`, default=0.05
+        Probability that an article is a reprint of an earlier one.
+    :param seed: `int`, default=0
+
+    Returns
+    =======
+    :generate_corpus: `Path`
+    """
+
+    path_out = Path(path_out)
+    path_out.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    if toponyms is None:
+        toponyms = load_toponyms(seed=seed)
+    start = date(2016, 6, 1)
+
+    articles = list()
+    for n in range(n_articles):
+        if articles and rng.random() < p_reprint:
+            article = rng.choice(articles)
+        else:
+            article = make_article(rng, toponyms, source, n, start, language)
+            articles.append(article)
+        write_docx(path_out / f"{source}_{n:06d}.docx", article)
+    return path_out
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('path_out')
+    parser.add_argument('n_articles', type=int)
+    parser.add_argument('--language', default='nl')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    generate_corpus(
+        args.path_out, args.n_articles, language=args.language, seed=args.seed
+        )
@@ -54,13 +54,26 @@ annotation takes place where all found entities are marked as either positive
 not). The second time the model is built only the positive identities are added.
 
 The model itself will be stored in the `PATHS.model` folder.
+
+
+## CACHING
+Building the model is skipped when its inputs did not change since the last
+build. The inputs are fingerprinted per label:
+- the gazetteer (the stored geonames and RESTcountries files)
+- the query for the label in [MODEL]
+- the 'df_annotations_[label].pkl' file in `PATHS.annotations`
+
+The patterns of every label are stored with their fingerprint in
+`PATHS.resources / 'patterns'`. If nothing changed the stored model is reused.
+Otherwise only the labels with a changed fingerprint are queried again and the
+model is rebuilt from the stored and the new patterns.
+Run the script with '--force' to rebuild everything.
 """
 
 # standard library
 import json
 import sys
 import time
-from itertools import combinations
 
 start = time.time()
 sys.path.insert(0, '../')
@@ -71,82 +84,159 @@ import spacy
 from spacy.pipeline import EntityRuler
 
 # internal
-from src.config import PATHS, MODEL
+from src import profiling
+from src.config import PATHS, MODEL, PROJECT
 from src.doc_analysis import get_positives
 from src.geo_data import (
+    find_homonyms,
     load_geonames,
     load_rest_countries,
 )
+from src.utils import file_digest, fingerprint
+
+
+FORCE = '--force' in sys.argv
+PATTERNS_VERSION = 1 # increment when the pattern format changes
+profiling.start_run('01_create_model', path_out=PATHS.results / 'profiles')
+
+
+### Fingerprint inputs
+path_geonames = PATHS.resources / f'geonames/geonames_{PROJECT.language}.pkl'
+path_countries = PATHS.resources / 'rest_countries/rest_countries.json'
+path_patterns = PATHS.resources / 'patterns'
+path_patterns.mkdir(parents=True, exist_ok=True)
+queries = {k:getattr(MODEL, k) for k in MODEL._fields}
+queries['countries'] = None
+
+def fingerprint_gazetteer():
+    return fingerprint(file_digest(path_geonames), file_digest(path_countries))
+
+def fingerprint_label(label, gazetteer):
+    annotation = PATHS.annotations / f"df_annotations_{label}.pkl"
+    log = PATHS.annotations / f"annotations_{label}.jsonl"
+    return fingerprint(
+        PATTERNS_VERSION,
+        gazetteer,
+        queries[label],
+        file_digest(annotation),
+        file_digest(log),
+        )
+
+def load_cached_patterns(label):
+    try:
+        with open(path_patterns / f"{label}.json", 'r', encoding='utf8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def is_stale(label, gazetteer):
+    cached = cache.get(label)
+    return (
+        FORCE
+        or cached is None
+        or cached['fingerprint'] != fingerprint_label(label, gazetteer)
+    )
+
+cache = {label:load_cached_patterns(label) for label in queries}
+gazetteer = None
+if path_geonames.exists() and path_countries.exists():
+    gazetteer = fingerprint_gazetteer()
+stale = [label for label in queries if is_stale(label, gazetteer)]
+
+def fingerprint_model():
+    return fingerprint([cache[label]['fingerprint'] for label in queries])
+
+path_model_fingerprint = PATHS.model / 'fingerprint.txt'
+if not stale and path_model_fingerprint.exists():
+    if path_model_fingerprint.read_text() == fingerprint_model():
+        print('inputs unchanged, reusing model in', PATHS.model)
+        sys.exit(0)
 
 
 ### Prepare geo entities
 # load datasets
-print('loading RESTcountries')
-countries = load_rest_countries()
-print('loading geonames')
-geonames = load_geonames()
+with profiling.stage('load_gazetteer'):
+    print('loading RESTcountries')
+    countries = load_rest_countries()
+    print('loading geonames')
+    geonames = load_geonames()
+
+# the datasets are stored on first load, fingerprint them again
+if gazetteer is None:
+    gazetteer = fingerprint_gazetteer()
+    stale = [label for label in queries if is_stale(label, gazetteer)]
+print('rebuilding patterns for:', ', '.join(stale) if stale else '-')
 
 # remove geonames that are also country names and store the table
 geonames = geonames.query("alternate_name not in @countries")
 path = PATHS.resources / 'geonames/df_geonames.pkl'
-if not path.exists():
-    path.mkdir(parents=True, exist_ok=True)
+path.parent.mkdir(parents=True, exist_ok=True)
 geonames.to_pickle(path)
 
-# create topography
+# create topography (only for the labels that changed)
 print('creating topography')
-topography = {k:getattr(MODEL, k) for k in MODEL._fields}
-topography = {k:geonames.query(v).alternate_name for k, v in topography.items()}
-topography['countries'] = countries
-for k in topography:
-    topography[k] = [{'label': k, 'pattern': v} for v in topography[k]]
+topography = dict()
+for label in queries:
+    if label not in stale:
+        topography[label] = cache[label]['names']
+    elif label == 'countries':
+        topography[label] = list(countries)
+    else:
+        topography[label] = list(geonames.query(queries[label]).alternate_name)
 
 
 ### Check for duplicates between topographies
-problems = dict()
-place_names = dict()
-for key in topography:
-    patterns = set()
-    for d in topography[key]:
-        patterns.add(d['pattern'])
-    place_names[key] = patterns
-
-for key1, key2 in list(combinations(place_names, r=2)):
-    if place_names[key1] & place_names[key2]:
-        new_key = (key1, key2)
-        duplicates = place_names[key1] & place_names[key2]
-        print("Duplicate found: ", new_key, ": ", duplicates, "\n")
-        problems[new_key] = list(duplicates)
+duplicates, overlap = find_homonyms(topography)
+print(f"found {sum(len(v) for v in duplicates.values())} duplicate place names")
+print(overlap, "\n")
 
 path = PATHS.parameters / 'duplicate_place_names.json'
 with open(path, 'w', encoding='utf8') as f:
-    json.dump(problems, f, indent=4)
+    json.dump(duplicates, f, indent=4, ensure_ascii=False)
 
 
 ### Select topography based on annotation results
-for key in topography:
-    patterns = list()
-    try:
-        annotation = PATHS.annotations / f"df_annotations_{key}.pkl"
-        positives = get_positives(pd.read_pickle(annotation), threshold=50)
-    except FileNotFoundError:
+patterns = dict()
+for label in queries:
+    if label not in stale:
+        patterns[label] = cache[label]['patterns']
         continue
 
-    for item in topography[key]:
-        if item['pattern'] in positives:
-            patterns.append(item)
+    names = topography[label]
+    try:
+        # prefer the annotation log over the pickled annotations
+        annotation = PATHS.annotations / f"annotations_{label}.jsonl"
+        if not annotation.exists():
+            annotation = pd.read_pickle(
+                PATHS.annotations / f"df_annotations_{label}.pkl"
+                )
+        positives = set(get_positives(annotation, threshold=50))
+        names = [name for name in names if name in positives]
+    except FileNotFoundError:
+        pass
+    patterns[label] = [{'label': label, 'pattern': name} for name in names]
 
-    topography[key] = patterns
+    cache[label] = {
+        'fingerprint': fingerprint_label(label, gazetteer),
+        'names': topography[label],
+        'patterns': patterns[label],
+    }
+    with open(path_patterns / f"{label}.json", 'w', encoding='utf8') as f:
+        json.dump(cache[label], f, ensure_ascii=False)
 
 
 ### Create model
 print('building model')
-nlp = spacy.load('nl', disable=['ner'])
-ruler = EntityRuler(nlp)
-for label in topography:
-    ruler.add_patterns(topography[label])
-nlp.add_pipe(ruler)
-nlp.to_disk(PATHS.model)
+with profiling.stage('build_model'):
+    nlp = spacy.load('nl', disable=['ner'])
+    ruler = EntityRuler(nlp)
+    for label in patterns:
+        ruler.add_patterns(patterns[label])
+    nlp.add_pipe(ruler)
+    nlp.to_disk(PATHS.model)
+
+path_model_fingerprint.write_text(fingerprint_model())
+profiling.dump(PATHS.results / 'profiles')
 
 end = time.time()
 print(f"Finished in: {round(end - start)}s")
@@ -9,6 +9,8 @@ The files to be processed should be stored in 'PATHS.data_raw / batch name'.
 
 ## PHASE I
 The script will first create a DataFrame with the 'raw' articles.
+The processing of a batch is done by `textract_batch` in the `textraction`
+module.
 Check the `lexisnexis_parser` module for details on how extraction is performed.
 The parser should be able to parse most data, but adjustments may be needed as
 it was initially built to parse Dutch newspaper articles.
@@ -21,107 +23,91 @@ will be kept. The dataset is stored in PATHS.data_raw
 In the second phase the script will take the DataFrame with the raw data and do
 some additional processing:
 1. Where possible columns will be processed into the appropriate types.
-2. Any duplicate paragraph is removed from the text body.
+2. Any duplicate paragraph is removed from the text body. If 'paragraph_scope'
+   in [LEXISNEXIS] is 'corpus', paragraphs are counted over all batches once
+   all batches are processed (see `strip_boilerplate` and PHASE III).
 3. The df is standardized (only specified metadata is kept).
-4. The queries defined in 'config.ini' under [LEXISNEXIS] are performed.
-
-Finally, the processed dataset is stored in PATHS.data_int. The raw data, the duplicate paragraphs and the records that were removed through the queries are also stored in separate files starting with an underscore.
+4. The queries defined in 'config.ini' under [LEXISNEXIS] are performed. The
+   queries are compiled into a single filter (see `QueryFilter`), the number
+   of records removed per query is stored in '_[batch]_query_hits.pkl'.
+
+## PHASE III
+Once all batches are processed, near-duplicate articles (eg the same agency
+article in several newspapers) are removed corpus-wide if 'near_duplicates' in
+[DEDUPLICATION] is true (off by default). Only the earliest article of a
+cluster is kept. The clusters are stored in '_near_duplicates.pkl' and the
+removed articles per batch in '_[batch]_near_duplicates.pkl' (see
+`drop_near_duplicates`).
+The corpus-wide steps (see `clean_corpus`) leave the batches of PHASE II as
+they are and store the cleaned batches in the 'clean' folder in PATHS.data_int,
+so they can be run again (eg with other settings) without extracting the
+batches again.
+
+Finally, the processed dataset is stored in PATHS.data_int. The raw data, the
+duplicate paragraphs and the records that were removed through the queries are
+also stored in separate files starting with an underscore.
+
+## PARALLEL PROCESSING
+The batches are processed in parallel, one process per batch. Use '--jobs N' to
+limit the number of processes. The overview is kept in the order of the batches.
+
+## PROFILE
+The time and memory used per stage are stored as json (one file per batch) in
+PATHS.results / 'profiles'. Set the environment variable PROFILE_STAGE to a
+stage name (eg 'docxs_to_df') to also store a cProfile dump of that stage.
 """
 
-print('extract lexisnexis articles from word documents')
-
 # standard libray
 import sys
-import locale
 import time
-from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 
-start = time.time()
 sys.path.insert(0, '../')
-locale.setlocale(locale.LC_ALL, 'nl_NL.utf8')
-
-# third party
-import pandas as pd
 
 # local
-from src.config import LEXISNEXIS, PATHS, FILENAMES
-from src.lexisnexis_parser import (
-    docxs_to_df,
-    split_page_from_section,
-    parse_datestring,
-    standardize_df,
+from src.config import LEXISNEXIS, DEDUPLICATION, PATHS
+from src.textraction import (
+    textract_batch_profiled,
+    clean_corpus,
+    collect_overview,
 )
 
-line = 80 * '-'
-overview = list()
-for batch, name in zip(LEXISNEXIS.batches, LEXISNEXIS.batch_names):
+
+def main(jobs=None):
+    print('extract lexisnexis articles from word documents')
+    start = time.time()
+    path_profiles = PATHS.results / 'profiles'
+
+    # the batches are independent, process them in parallel
+    # `map` returns the results in the order of the batches
+    line = 80 * '-'
+    n_batches = len(LEXISNEXIS.batches)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        overview = pool.map(
+            textract_batch_profiled,
+            LEXISNEXIS.batches,
+            LEXISNEXIS.batch_names,
+            [path_profiles] * n_batches,
+        )
+        for s in overview:
+            print(line, flush=True)
+            print(s, flush=True)
+
+    # remove paragraphs that recur over the whole corpus and articles that
+    # were published more than once
+    if LEXISNEXIS.paragraph_scope == 'corpus' or DEDUPLICATION.near_duplicates:
+        print(line, flush=True)
+        print(clean_corpus(), flush=True)
+
     print(line, flush=True)
-    results = dict()
-
-    # save original parsed data
-    path_raw = PATHS.data_raw / batch
-    df = docxs_to_df(path_raw)
-    df.to_pickle(PATHS.data_int / f'_{batch}_raw.pkl')
-    results['initial'] = len(df)
-
-    # set source to configured batch name
-    df['source'] = name
-
-    # separate section and page
-    df = split_page_from_section(df)
-
-    # extract length as integer
-    df['length'] = df.length.str.split(' ').str[0].astype('int')
-
-    # convert date strings to dates
-    df['load_date'] = pd.to_datetime(df['load_date'])
-    df['publication_date'] = parse_datestring(
-        df['publication_date'],
-        split_on=',',
-        format='%d %B %Y %A',
-    )
-
-    # drop duplicate rows
-    subset = ['title', 'publication_date', 'section']
-    df = df.drop_duplicates(subset=subset, keep='first')
-    results['deduped'] = len(df)
-
-    # count occurrence of paragraphs
-    paragraphs = Counter()
-    for article in df.body.values:
-        for p in article:
-            paragraphs[p] += 1
-
-    dupes = {p:paragraphs[p] for p in paragraphs if paragraphs[p] > 1}
-    df_dupes = pd.DataFrame.from_dict(dupes, orient='index', columns=['count'])
-    df_dupes.to_pickle(PATHS.data_int / f"_{batch}_paragraph_dupes.pkl")
-
-    # remove duplicate (>2) paragraphs
-    dupes = {p:paragraphs[p] for p in paragraphs if paragraphs[p] > 2}
-    df['body_'] = df['body'].apply(lambda ps: [p for p in ps if p not in dupes])
-
-    # add body as string
-    df['body_str'] = df.body_.str.join('\n')
-
-    # standardize
-    df = standardize_df(df, batch)
-
-    # remove items
-    df_out = df.query(' and '.join(LEXISNEXIS.queries))
-    df_removed = df.loc[~df.index.isin(df_out.index)]
-
-    # save files
-    df_out.to_pickle(PATHS.data_int / f'{batch}.pkl')
-    df_removed.to_pickle(PATHS.data_int / f'_{batch}_removed.pkl')
-
-    results['filtered'] = len(df_out)
-    results['duped_paragraphs'] = len(df_dupes)
-    s = pd.Series(results, name=name)
-    print(s, flush=True)
-    overview.append(s)
-
-print(line, flush=True)
-pd.concat(overview, axis=1).to_pickle(PATHS.results / FILENAMES.textraction)
-
-end = time.time()
-print(f"finished in: {round(end - start)}s")
+    collect_overview()
+
+    end = time.time()
+    print(f"finished in: {round(end - start)}s")
+
+
+if __name__ == '__main__':
+    jobs = None
+    if '--jobs' in sys.argv:
+        jobs = int(sys.argv[sys.argv.index('--jobs') + 1])
+    main(jobs=jobs)
@@ -2,13 +2,37 @@
 SPACIFY THE LEXISNEXIS ARTICLES
 ===============================
 
-This script will serialize the LexisNexis articles. The resulting spaCy `Docs`
-will be stored in PATHS.data_prc. After processing all the files, an aggregated
-count will be performed on all entities and all lemmas. This counting procedure
-will be done twice: once counting every occurrence, and once counting entities
-and lemmas only once per article. These results will be stored in PATHS.results.
-It may happen that certain lemmas/entities fail to be counted. These will be
-stored in PATHS.results as well.
+This script will serialize the LexisNexis articles (from the 'clean' folder in
+PATHS.data_int if the corpus-wide steps of 02_textraction.py are enabled). The
+resulting spaCy `Docs` will be stored in PATHS.data_prc. After processing all
+the files, an aggregated count will be performed on all entities and all
+lemmas. This counting procedure will be done twice: once counting every
+occurrence, and once counting entities and lemmas only once per article. These
+results will be stored in PATHS.results.
+Lemmas and entities are counted by their spaCy hash id, the strings are stored
+once in the vocabulary (FILENAMES.vocabulary, see the `vocabulary` module).
+The count dicts are keyed by id, the count dataframes by string.
+It may happen that certain lemmas/entities fail to be counted (their string is
+not in the model's vocabulary). These will be stored in PATHS.results as well.
+
+While counting, the entity counts are also aggregated per source, section and
+publication day into the entity cube (see the `entity_cube` module), which is
+stored as FILENAMES.entity_cube. Use it for time series of the toponyms.
+In the same pass the co-occurrence of the entities per article and per sentence
+is counted (see `CooccurrenceCounter`) and stored as FILENAMES.cooccurrence.
+Finally the count dicts are stored as columnar count tables
+(FILENAMES.count_table, see the `count_table` module), which `load_counts`
+reads.
+
+Run the script with '--sketch' to also store fixed size sketches of the counts
+(FILENAMES.sketches): distinct lemmas/entities per source and month and the
+most frequent ones per source (see the `sketches` module). The sketches of
+separate runs can be merged, which is meant for corpora too large to count
+exactly.
+
+Run the script with '--skip-serialize' to only (re)count already serialized
+documents. The pipeline runner (`python -m src.pipeline`) does this after
+serializing the batches that changed.
 """
 
 print('spacify lexisnexis articles')
@@ -27,16 +51,31 @@ import pandas as pd
 from spacy.util import load_model
 
 # local
+from src import profiling
 from src.config import PATHS, FILENAMES, LEXISNEXIS
 from src.spacy_helpers import serialize_batch, fetch_docs
-from src.doc_analysis import basic_stats, attribute_counter, most_common
+from src.doc_analysis import (
+    basic_stats,
+    attribute_counter,
+    CooccurrenceCounter,
+)
+from src.count_table import CountTable, add_main_entries
+from src.entity_cube import CubeBuilder
+from src.vocabulary import Vocabulary
+from src.sketches import CorpusSketch
+from src.textraction import processed_path
+
+
+profiling.start_run('03_spacify', path_out=PATHS.results / 'profiles')
 
 
 ### Serialize LexisNexis documents
 print("[1] serialize batches")
-nlp = load_model(PATHS.model)
-for batch in LEXISNEXIS.batches:
-    serialize_batch(nlp, batch)
+with profiling.stage('serialize'):
+    nlp = load_model(PATHS.model)
+    if '--skip-serialize' not in sys.argv:
+        for batch in LEXISNEXIS.batches:
+            serialize_batch(nlp, batch, path_in=processed_path())
 
 
 ### Store some general stats
@@ -50,36 +89,69 @@ def get_stats(batch):
     df.columns = [col.lower() for col in df.columns]
     return df
 
-pd.concat(
-    [get_stats(batch) for batch in LEXISNEXIS.batches], sort=False,
-).to_pickle(PATHS.results / FILENAMES.nlp_statistics)
+with profiling.stage('stats'):
+    pd.concat(
+        [get_stats(batch) for batch in LEXISNEXIS.batches], sort=False,
+    ).to_pickle(PATHS.results / FILENAMES.nlp_statistics)
 
 
 ### Store entity and token counts
 print("[3] store counts")
-all_fails = []
-batches_totals = {}
-batches_unique = {}
-for batch in LEXISNEXIS.batches:
-    batch_totals = {}
-    batch_unique = {}
-    for doc in fetch_docs(PATHS.data_prc / batch, nlp.vocab):
-        totals, fails = attribute_counter(doc)
-        unique, _ = attribute_counter(doc, unique=True)
-        if fails:
-            all_fails.append(fails)
-        for key in totals:
-            if key not in batch_totals:
-                batch_totals[key] = totals[key]
-            else:
-                batch_totals[key] = batch_totals[key] + totals[key]
-        for key in unique:
-            if key not in batch_unique:
-                batch_unique[key] = unique[key]
-            else:
-                batch_unique[key] = batch_unique[key] + unique[key]
-    batches_totals[batch] = batch_totals
-    batches_unique[batch] = batch_unique
+def get_meta(batch):
+    cols = ['id', 'source', 'section', 'publication_date']
+    return pd.read_pickle(processed_path() / f"{batch}.pkl")[cols]
+
+with profiling.stage('counts'):
+    meta = pd.concat([get_meta(batch) for batch in LEXISNEXIS.batches])
+    meta = meta.set_index('id')
+    cube = CubeBuilder(meta)
+    cooccurrence = CooccurrenceCounter()
+    sketch = CorpusSketch() if '--sketch' in sys.argv else None
+    all_fails = []
+    batches_totals = {}
+    batches_unique = {}
+    for batch in LEXISNEXIS.batches:
+        batch_totals = {}
+        batch_unique = {}
+        for doc in fetch_docs(PATHS.data_prc / batch, nlp.vocab):
+            totals, _ = attribute_counter(doc, as_ids=True)
+            unique, _ = attribute_counter(doc, unique=True, as_ids=True)
+            cube.add(doc._.id, totals)
+            cooccurrence.update(doc)
+            if sketch is not None:
+                source, day = meta.loc[doc._.id, ['source', 'publication_date']]
+                sketch.update(source, day, totals)
+            for key in totals:
+                if key not in batch_totals:
+                    batch_totals[key] = totals[key]
+                else:
+                    batch_totals[key] = batch_totals[key] + totals[key]
+            for key in unique:
+                if key not in batch_unique:
+                    batch_unique[key] = unique[key]
+                else:
+                    batch_unique[key] = batch_unique[key] + unique[key]
+        batches_totals[batch] = batch_totals
+        batches_unique[batch] = batch_unique
+
+    # one vocabulary for all counts
+    vocabulary = Vocabulary()
+    for batch_totals in batches_totals.values():
+        for counter in batch_totals.values():
+            all_fails.extend(vocabulary.add(nlp.vocab.strings, counter))
+    add_main_entries(vocabulary)
+    vocabulary.save(PATHS.results / FILENAMES.vocabulary)
+
+with profiling.stage('entity_cube'):
+    cube = cube.build(vocabulary)
+    cube.save(PATHS.results / FILENAMES.entity_cube)
+    print(f"---entity cube with {len(cube)} cells")
+
+with profiling.stage('cooccurrence'):
+    cooccurrence.save(PATHS.results / FILENAMES.cooccurrence)
+
+if sketch is not None:
+    sketch.save(PATHS.results / FILENAMES.sketches)
 
 d = {
     FILENAMES.dct_counts_total:  batches_totals,
@@ -89,8 +161,11 @@ for key in d:
     with open(PATHS.results / key, 'wb') as f:
         pickle.dump(d[key], f)
 
-flatten_fails = [fail for fails in all_fails for fail in fails]
-print(f"---encountered {len(flatten_fails)} failed items.")
+with profiling.stage('count_table'):
+    for merge_entries in (True, False):
+        CountTable.cached(merge_entries=merge_entries)
+
+print(f"---encountered {len(all_fails)} failed items.")
 
 with open(PATHS.results / 'unrecognized_tokens.json', 'w') as f:
     json.dump(all_fails, f, indent=4)
@@ -99,9 +174,13 @@ with open(PATHS.results / 'unrecognized_tokens.json', 'w') as f:
 ### Store as dataframes
 print("[4] store as dataframes")
 def dict_to_df(dct, batch):
+    counters = {
+        attribute: vocabulary.materialize(counter)
+        for attribute, counter in dct[batch].items()
+    }
     return (
         pd.DataFrame
-            .from_dict(dct[batch], orient='index')
+            .from_dict(counters, orient='index')
             .stack()
             .to_frame()
             .rename(columns={0: batch})
@@ -111,12 +190,17 @@ d = {
     FILENAMES.df_counts_total:  batches_totals,
     FILENAMES.df_counts_unique: batches_unique,
 }
-for filename, dct in d.items():
-    df = pd.concat([dict_to_df(dct, b) for b in LEXISNEXIS.batches], axis=1)
-    print(filename, df.shape)
-    df.to_pickle(PATHS.results / filename)
+with profiling.stage('dataframes'):
+    for filename, dct in d.items():
+        df = pd.concat([dict_to_df(dct, b) for b in LEXISNEXIS.batches], axis=1)
+        print(filename, df.shape)
+        df.to_pickle(PATHS.results / filename)
+
 
 print(df.count())
 
+profiling.dump(PATHS.results / 'profiles')
+print(profiling.summary(), flush=True)
+
 end = time.time()
 print(f"finished in: {round(end - start)}s")
@@ -1,16 +1,15 @@
 # standard library
 import zipfile
 
-# third party
-import geopandas
-
 # local
+from src.basemaps import build_basemap, load_basemap, source_key
 from src.config import PATHS
 from src.geo_data import load_cbs_municipalities
 
 
 # create nl map on province level
-map_ = geopandas.read_file(PATHS.shapes / 'nl' / 'Uitvoer_shape')
+# the municipalities are read from the basemap cache after the first run
+map_ = load_basemap('nl_municipalities', detail='full')
 map_ = map_.query("WATER == 'NEE'")[['GM_NAAM', 'geometry']]
 df = load_cbs_municipalities()
 
@@ -25,9 +24,13 @@ map_prov = (
         .dissolve(by='provincie')
         .drop(['GM_NAAM', 'gemeentenaam'], axis=1)
     )
-map_prov.to_file(PATHS.shapes / 'nl' / 'nl_cbs_provincies_2018.shp')
+path = PATHS.shapes / 'nl' / 'nl_cbs_provincies_2018.shp'
+map_prov.to_file(path)
+# store the provinces at every level of detail
+build_basemap('nl', map_prov, key=source_key(path))
 
 # unpack world map
 path = PATHS.shapes / 'world/CNTR_RG_01M_2016_4326.shp.zip'
 with zipfile.ZipFile(path, 'r') as zip_ref:
-    zip_ref.extractall(path_out)
+    zip_ref.extractall(path.parent)
+load_basemap('world')
@@ -0,0 +1,158 @@
+"""
+This module stores the annotations of the annotators in `annotation_tools`.
+
+Every annotation is appended to a log (one json object per line) as soon as
+it is made, so a session can be interrupted at any point and is restored by
+replaying the log:
+
+    store = AnnotationStore.load(PATHS.annotations / 'places.jsonl')
+    store.positives(threshold=50)
+
+Next to the list of annotations, the store keeps the number of annotations
+per label ('+', '-', '?', ...) for every key (eg phrase), updated with every
+annotation. Checking whether a phrase was annotated and selecting the
+positive phrases do not go over the annotations.
+"""
+
+
+# standard library
+import json
+from collections import Counter, namedtuple
+from datetime import datetime
+from pathlib import Path
+
+# third party
+import pandas as pd
+
+
+def _to_json(value):
+    "Return `value` as json serializable value, None for a missing value."
+    if pd.api.types.is_scalar(value) and pd.isna(value):
+        return None
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if hasattr(value, 'item'):
+        return value.item()
+    return value
+
+
+class AnnotationStore():
+    """
+    AnnotationStore
+    ===============
+    Annotations with their counts per key and label, logged to disk.
+
+    Attributes
+    ==========
+    Annotation: `namedtuple` of the annotations
+    key: Field the annotations are grouped by, eg 'phrase'
+    label: Field with the annotation, eg '+' or '-'
+    path: Path to the log (jsonl), None to keep the annotations in memory
+    annotations: List of the annotations
+    tallies: `dict` mapping every key to a `Counter` of its labels
+
+    Methods
+    =======
+    append: Add an annotation and write it to the log
+    replace: Replace all annotations and rewrite the log
+    positives: Return the keys with enough positive annotations
+    to_dataframe: Return the annotations as `DataFrame`
+    load: Restore a store from its log (classmethod)
+    """
+
+    def __init__(self, fields, key='phrase', label='annotation', path=None):
+        if isinstance(fields, type):
+            self.Annotation = fields
+        else:
+            self.Annotation = namedtuple('Annotation', fields)
+        self.key = key
+        self.label = label
+        self.path = Path(path) if path is not None else None
+        self.annotations = list()
+        self.tallies = dict()
+        if self.path is not None and self.path.exists():
+            self._replay()
+
+    def __len__(self):
+        return len(self.annotations)
+
+    def __contains__(self, key):
+        return key in self.tallies
+
+    @property
+    def keys(self):
+        "The annotated keys (a set-like view)."
+        return self.tallies.keys()
+
+    def _add(self, annotation):
+        self.annotations.append(annotation)
+        key = getattr(annotation, self.key)
+        label = getattr(annotation, self.label)
+        self.tallies.setdefault(key, Counter())[label] += 1
+        return None
+
+    def _line(self, annotation):
+        record = {k: _to_json(v) for k, v in annotation._asdict().items()}
+        return json.dumps(record, ensure_ascii=False) + '\n'
+
+    def _replay(self):
+        with open(self.path, 'r', encoding='utf8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if 'timestamp' in record and record['timestamp']:
+                    record['timestamp'] = datetime.fromisoformat(
+                        record['timestamp']
+                    )
+                self._add(self.Annotation(**record))
+        return None
+
+    def append(self, annotation):
+        "Add `annotation` and append it to the log."
+        self._add(annotation)
+        if self.path is not None:
+            with open(self.path, 'a', encoding='utf8') as f:
+                f.write(self._line(annotation))
+        return None
+
+    def replace(self, annotations):
+        "Replace the annotations by `annotations` and rewrite the log."
+        self.annotations = list()
+        self.tallies = dict()
+        for annotation in annotations:
+            self._add(self.Annotation(*annotation))
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'w', encoding='utf8') as f:
+                f.writelines(self._line(a) for a in self.annotations)
+        return None
+
+    def positives(self, threshold=100, positive='+', ignore=('n/f',)):
+        """
+        Return the keys of which the percentage of `positive` annotations
+        (rounded to one decimal) is at least `threshold`. Labels in `ignore`
+        (eg phrases that were not found) are not counted.
+
+        Returns
+        =======
+        :positives: `list`
+        """
+
+        keys = list()
+        for key, tally in self.tallies.items():
+            total = sum(n for label, n in tally.items() if label not in ignore)
+            if total and round(tally[positive] / total * 100, 1) >= threshold:
+                keys.append(key)
+        return keys
+
+    def to_dataframe(self):
+        return pd.DataFrame(self.annotations, columns=self.Annotation._fields)
+
+    @classmethod
+    def load(cls, path, key='phrase', label='annotation'):
+        "Restore a store from the log at `path`, reading the fields from it."
+        with open(path, 'r', encoding='utf8') as f:
+            first = f.readline()
+        fields = list(json.loads(first)) if first.strip() else [key, label]
+        return cls(fields, key=key, label=label, path=path)
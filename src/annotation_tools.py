@@ -4,26 +4,64 @@ from collections import namedtuple
 from datetime import datetime
 
 # third party
-import pandas as pd
 from IPython.display import HTML, display, clear_output
 
+# local
+from src.annotation_store import AnnotationStore
+
 
 class Annotator():
-    def __init__(self):
-        self.annotations = list()
+    """
+    Annotator
+    =========
+    Base class of the annotators. The annotations are kept in an
+    `AnnotationStore`, which writes every annotation to the log at `path`
+    (jsonl) and restores the annotations of earlier sessions from it.
+
+    Attributes
+    ==========
+    store: `AnnotationStore`
+    annotations: List of stored annotations
+    annotated_phrases: Set-like view of the annotated phrases (keys)
+
+    Methods
+    =======
+    add: Store an annotation
+    positives: Return the phrases with enough positive annotations
+    to_dataframe: Return annotations as `DataFrame`
+    from_dataframe: Replace the annotations by those in a `DataFrame`
+    """
+
+    Annotation = namedtuple(
+        'Annotation', ['phrase', 'id', 'annotation', 'timestamp']
+        )
+    key = 'phrase'
+    label = 'annotation'
+
+    def __init__(self, path=None):
+        self.store = AnnotationStore(
+            self.Annotation, key=self.key, label=self.label, path=path
+            )
+
+    @property
+    def annotations(self):
+        return self.store.annotations
 
     @property
     def annotated_phrases(self):
-        return [annotation.phrase for annotation in self.annotations]
+        return self.store.keys
+
+    def add(self, annotation):
+        return self.store.append(annotation)
+
+    def positives(self, threshold=100):
+        return self.store.positives(threshold=threshold)
 
     def to_dataframe(self):
-        return pd.DataFrame(self.annotations)
+        return self.store.to_dataframe()
 
     def from_dataframe(self, df):
-        self.annotations = [
-            annotation for annotation in df.itertuples(
-                index=False, name='Annotation')
-                ]
+        self.store.replace(df.itertuples(index=False, name='Annotation'))
         return None
 
 
@@ -33,9 +71,11 @@ class DocEvaluator(Annotator):
     """
 
     Annotation = namedtuple('Annotation', ['id', 'idx', 'type', 'timestamp'])
+    key = 'id'
+    label = 'type'
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, path=None):
+        super().__init__(path=path)
 
     def __call__(self, doc):
         lines = HTML_from_doc(doc).html_lines
@@ -57,7 +97,7 @@ class DocEvaluator(Annotator):
                         #     annotation = input(
                         #         '[+] false positve, [-] false negative: '
                         #         )
-                        self.annotations.append(
+                        self.add(
                             self.Annotation(id, idx, annotation, datetime.now())
                             )
                     except ValueError:
@@ -174,7 +214,7 @@ class PhraseAnnotator(Annotator):
     info: Tuple of info data and column name with phrase key
     n: Number of samples
     annotations: List of stored annotations
-    annotated_phrases: List of annotated phrases
+    annotated_phrases: Set-like view of the annotated phrases
 
     Methods
     =======
@@ -183,11 +223,8 @@ class PhraseAnnotator(Annotator):
     """
 
     name = 'Phrase Annotator'
-    Annotation = namedtuple(
-        'Annotation', ['phrase', 'id', 'annotation', 'timestamp']
-        )
 
-    def __init__(self, data, info=None, n=5):
+    def __init__(self, data, info=None, n=5, path=None):
         """
         Initialize annotator.
 
@@ -211,9 +248,13 @@ class PhraseAnnotator(Annotator):
         :param n: `int`, default=5
             Number of samples to annotate per phrase.
             If n=0 no sampling will take place.
+        :param path: `Path`, default None
+            Log (jsonl) the annotations are written to after every decision.
+            The annotations in an existing log are loaded, so annotating
+            continues where the previous session stopped.
         """
 
-        super().__init__()
+        super().__init__(path=path)
         self.data = data
         self.info = info
         self.n = n
@@ -248,7 +289,7 @@ class PhraseAnnotator(Annotator):
 
         test = search()
         if not test:
-            self.annotations.append(
+            self.add(
                 self.Annotation(phrase, None, 'n/f', datetime.now())
                 )
             clear_output()
@@ -270,7 +311,7 @@ class PhraseAnnotator(Annotator):
             if user == '.':
                 return user
 
-            self.annotations.append(
+            self.add(
                 self.Annotation(phrase, row.id, user, datetime.now())
                 )
         return None
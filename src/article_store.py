@@ -0,0 +1,225 @@
+"""
+This module gives column-wise access to the articles in /data/01_interim
+(or its 'clean' folder if the corpus-wide steps are enabled, see
+`processed_path` in the `textraction` module).
+
+Every batch is stored by 02_textraction.py as one pickled `DataFrame`,
+including the list-valued 'body' and 'body_' columns. The `ArticleStore`
+splits each batch once into a pickle per column (in '_columns', rebuilt when
+the batch file changes), so a selection of columns can be loaded without
+unpickling the article bodies:
+
+    store = ArticleStore()
+    df = store.frame(['source', 'publication_date'], sources='Trouw')
+    store.get_article('5CBR-...')
+
+Single articles are looked up through an index of the ids. Every row is also
+pickled on its own into 'rows.pkl' with its byte offset in the meta data, so
+`get_article` only reads the requested row.
+"""
+
+
+# standard library
+import json
+import pickle
+from functools import lru_cache
+
+# third party
+import numpy as np
+import pandas as pd
+
+# local
+from src.config import PATHS
+
+
+class ArticleStore():
+    """
+    ArticleStore
+    ============
+    Lazy access to the articles of all batches, column by column.
+
+    Attributes
+    ==========
+    path: Path to the batch files
+    batches: Names of the batches (files not starting with '_')
+    columns: Names of the columns of the articles
+    index: `DataFrame` mapping the article ids to their batch and position
+
+    Methods
+    =======
+    column: Return a column of a batch
+    frame: Return the selected columns and articles as `DataFrame`
+    get_article: Return a single article as `Series`
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            from src.textraction import processed_path
+            path = processed_path()
+        self.path = path
+        self.cache = path / '_columns'
+        self.batches = sorted(f.stem for f in path.glob('[!_]*.pkl'))
+        self._index = None
+        self._metas = dict()
+        self._column = lru_cache(maxsize=32)(self._load_column)
+
+    def __len__(self):
+        return len(self.index)
+
+    def _stat(self, batch):
+        stat = (self.path / f'{batch}.pkl').stat()
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def _meta(self, batch):
+        "Return the meta data of the split batch, splitting it if needed."
+        if batch in self._metas:
+            return self._metas[batch]
+        path = self.cache / batch
+        try:
+            with open(path / 'meta.json', 'r', encoding='utf8') as f:
+                meta = json.load(f)
+            if meta['stat'] == self._stat(batch) and 'offsets' in meta:
+                self._metas[batch] = meta
+                return meta
+        except (OSError, ValueError, KeyError):
+            pass
+
+        df = pd.read_pickle(self.path / f'{batch}.pkl').reset_index(drop=True)
+        path.mkdir(parents=True, exist_ok=True)
+        for i, col in enumerate(df.columns):
+            df[col].to_pickle(path / f'{i}.pkl')
+        offsets = [0]
+        with open(path / 'rows.pkl', 'wb') as f:
+            for row in df.itertuples(index=False, name=None):
+                f.write(pickle.dumps(row))
+                offsets.append(f.tell())
+        meta = {
+            'stat': self._stat(batch),
+            'columns': list(df.columns),
+            'offsets': offsets,
+        }
+        with open(path / 'meta.json', 'w', encoding='utf8') as f:
+            json.dump(meta, f)
+        self._metas[batch] = meta
+        return meta
+
+    @property
+    def columns(self):
+        columns = list()
+        for batch in self.batches:
+            for col in self._meta(batch)['columns']:
+                if col not in columns:
+                    columns.append(col)
+        return columns
+
+    def _load_column(self, batch, col):
+        columns = self._meta(batch)['columns']
+        if col not in columns:
+            return None
+        return pd.read_pickle(self.cache / batch / f'{columns.index(col)}.pkl')
+
+    def column(self, batch, col):
+        "Return column `col` of `batch` as `Series` or None if it is missing."
+        return self._column(batch, col)
+
+    @property
+    def index(self):
+        if self._index is None:
+            ids = {batch: self.column(batch, 'id') for batch in self.batches}
+            self._index = pd.concat([
+                pd.DataFrame(
+                    {'batch': batch, 'position': np.arange(len(s))},
+                    index=s.values,
+                )
+                for batch, s in ids.items()
+            ])
+        return self._index
+
+    def frame(
+        self,
+        columns=None,
+        sources=None,
+        start=None,
+        end=None,
+        batches=None,
+    ):
+        """
+        Return the articles as `DataFrame` indexed by id.
+
+        Optional key-word arguments
+        ===========================
+        :param columns: `list`, default None
+            Columns to return, all columns if None.
+        :param sources: `str` or `list`, default None
+            Only return the articles of these sources.
+        :param start: date, default None
+            Only return the articles published on or after `start`.
+        :param end: date, default None
+            Only return the articles published on or before `end`.
+        :param batches: `str` or `list`, default None
+            Only read these batches.
+
+        Returns
+        =======
+        :frame: `DataFrame`
+        """
+
+        if isinstance(sources, str):
+            sources = [sources]
+        if isinstance(batches, str):
+            batches = [batches]
+        columns = self.columns if columns is None else list(columns)
+        columns = [col for col in columns if col != 'id']
+
+        dfs = list()
+        for batch in batches or self.batches:
+            mask = pd.Series(True, index=self.column(batch, 'id').index)
+            if sources is not None:
+                mask &= self.column(batch, 'source').isin(sources)
+            if start is not None or end is not None:
+                dates = self.column(batch, 'publication_date')
+                if start is not None:
+                    mask &= dates >= pd.Timestamp(start)
+                if end is not None:
+                    mask &= dates <= pd.Timestamp(end)
+            if not mask.any():
+                continue
+            ids = self.column(batch, 'id')[mask].values
+            df = pd.DataFrame(
+                {
+                    col: self.column(batch, col)[mask].values
+                    for col in columns
+                    if col in self._meta(batch)['columns']
+                },
+                index=pd.Index(ids, name='id'),
+            )
+            dfs.append(df)
+        if not dfs:
+            return pd.DataFrame(columns=columns, index=pd.Index([], name='id'))
+        return pd.concat(dfs)
+
+    def get_article(self, idx):
+        """
+        Return the article with id `idx` as `Series`, raises a KeyError if
+        there is no such article.
+        """
+
+        location = self.index.loc[idx]
+        if isinstance(location, pd.DataFrame):
+            location = location.iloc[0]
+        batch, row = location['batch'], location['position']
+        meta = self._meta(batch)
+        start, end = meta['offsets'][row:row + 2]
+        with open(self.cache / batch / 'rows.pkl', 'rb') as f:
+            f.seek(start)
+            values = pickle.loads(f.read(end - start))
+        article = pd.Series(
+            {
+                col: value
+                for col, value in zip(meta['columns'], values)
+                if col != 'id'
+            },
+            name=idx,
+        )
+        return article
+
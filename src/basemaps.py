@@ -0,0 +1,152 @@
+"""
+This module caches the basemaps at several levels of detail.
+
+Reading a full resolution shapefile and rendering all of its vertices
+dominates the time to plot a map. The first time a basemap is loaded, its
+geometries are simplified at every level in DETAIL and each level is stored
+as GeoParquet in PATHS.shapes / '_cache'. Later loads read the requested
+level only, until the shapefile or one of its sidecar files changes:
+
+    from src.basemaps import load_basemap
+    world = load_basemap('world', detail='low')
+
+The tolerance of a level is a fraction of the width of the map, so the levels
+mean the same for every crs. Polygons that share borders (municipalities,
+provinces) are simplified as a coverage where shapely supports it, so the
+simplified borders still meet without gaps or overlaps.
+"""
+
+
+# standard library
+import json
+
+# local
+from src.config import PATHS
+from src.utils import fingerprint
+
+
+# tolerance per level of detail, as fraction of the width of the map
+DETAIL = {
+    'full':   0,
+    'high':   0.0002,
+    'medium': 0.001,
+    'low':    0.005,
+}
+# shapefiles (in PATHS.shapes) per basemap
+BASEMAPS = {
+    'world': 'world/CNTR_RG_01M_2016_4326.shp',
+    'nl': 'nl/nl_cbs_provincies_2018.shp',
+    'nl_municipalities': 'nl/Uitvoer_shape',
+}
+
+
+def source_key(path):
+    """
+    Return a hash of the size and modification time of the file(s) at `path`:
+    the files in a directory or a shapefile with its sidecar files (.dbf,
+    .prj, .shx, ...). Return None if there are no files.
+    """
+
+    if path.is_dir():
+        files = sorted(path.glob('*'))
+    else:
+        files = sorted(path.parent.glob(f'{path.stem}.*'))
+    if not files:
+        return None
+    stats = [(f.name, f.stat().st_size, f.stat().st_mtime_ns) for f in files]
+    return fingerprint(stats)
+
+
+def simplify(gdf, tolerance):
+    """
+    Return `gdf` with its geometries simplified with `tolerance` (in the
+    units of the crs), preserving the topology of shared borders if shapely
+    supports coverage simplification (shapely >= 2.1).
+    """
+
+    if not tolerance:
+        return gdf
+    gdf = gdf.copy()
+    try:
+        from shapely import coverage_simplify
+    except ImportError:
+        gdf['geometry'] = gdf.geometry.simplify(
+            tolerance,
+            preserve_topology=True,
+        )
+    else:
+        geometry = gdf.geometry.make_valid().values
+        gdf['geometry'] = coverage_simplify(geometry, tolerance)
+    return gdf
+
+
+def build_basemap(name, gdf, path=PATHS.shapes / '_cache', key=None):
+    """
+    Store `gdf` at every level of detail as `name` in the cache.
+
+    Returns
+    =======
+    :build_basemap: `dict`
+        The `GeoDataFrame` per level of detail.
+    """
+
+    path.mkdir(parents=True, exist_ok=True)
+    xmin, _, xmax, _ = gdf.total_bounds
+    levels = dict()
+    for level, fraction in DETAIL.items():
+        levels[level] = simplify(gdf, fraction * (xmax - xmin))
+        levels[level].to_parquet(path / f'{name}.{level}.parquet')
+    with open(path / f'{name}.json', 'w', encoding='utf8') as f:
+        json.dump({'key': key, 'levels': list(DETAIL)}, f)
+    return levels
+
+
+def choose_detail(pixels):
+    """
+    Return the coarsest level of detail whose tolerance is below one pixel
+    for a map `pixels` wide.
+    """
+
+    for level, fraction in sorted(DETAIL.items(), key=lambda x: -x[1]):
+        if fraction * pixels <= 1:
+            return level
+    return 'full'
+
+
+def load_basemap(name, detail='medium', path=PATHS.shapes / '_cache'):
+    """
+    Load a basemap at a level of detail.
+
+    Parameters
+    ==========
+    :param name: `str`
+        Name of the basemap in BASEMAPS or of a basemap stored with
+        `build_basemap`.
+
+    Optional key-word arguments
+    ===========================
+    :param detail: `str`, default='medium'
+        Level of detail: 'full', 'high', 'medium' or 'low'.
+
+    Returns
+    =======
+    :load_basemap: `GeoDataFrame`
+    """
+
+    import geopandas
+
+    if detail not in DETAIL:
+        raise ValueError(f"Level of detail must be one of {list(DETAIL)}.")
+    source = PATHS.shapes / BASEMAPS[name] if name in BASEMAPS else None
+    key = source_key(source) if source is not None else None
+    try:
+        with open(path / f'{name}.json', 'r', encoding='utf8') as f:
+            meta = json.load(f)
+        # without its shapefile, the cached basemap is used as is
+        if key is None or meta['key'] == key:
+            return geopandas.read_parquet(path / f'{name}.{detail}.parquet')
+    except (OSError, ValueError, KeyError):
+        if key is None:
+            raise
+    levels = build_basemap(name, geopandas.read_file(source), path, key=key)
+    return levels[detail]
@@ -0,0 +1,272 @@
+"""
+This module detects boilerplate paragraphs (recurring columns, disclaimers,
+etc.) by counting how often a paragraph occurs in the corpus.
+
+Paragraphs are counted by a stable 64-bit hash instead of by their text, so
+the corpus is not held in memory a second time. Counting is streaming: the
+articles can be fed batch per batch (or by separate workers whose counters are
+merged afterwards).
+
+Two modes are available:
+- exact:  a `Counter` of paragraph hashes. Exact, memory grows with the
+          number of distinct paragraphs.
+- sketch: a count-min sketch of fixed size. Counts are overestimated (never
+          underestimated), so the paragraphs that pass the threshold in the
+          sketch are candidates. A second (verification) pass counts the
+          candidates exactly, which removes the false positives.
+
+In 'auto' mode the counter is exact until it holds `max_exact` distinct
+paragraphs and then switches to a sketch.
+"""
+
+
+# standard library
+import hashlib
+from collections import Counter
+
+# third party
+import numpy as np
+
+
+def paragraph_hash(paragraph):
+    "Return a stable 64-bit hash of a paragraph."
+    digest = hashlib.blake2b(paragraph.encode('utf8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def hash_paragraphs(articles):
+    """
+    Return the hashes of all paragraphs in an iterable of articles
+    (lists of paragraphs) as a `uint64` array.
+    """
+
+    return np.fromiter(
+        (paragraph_hash(p) for article in articles for p in article),
+        dtype='uint64',
+    )
+
+
+class CountMinSketch():
+    """
+    CountMinSketch
+    ==============
+    Fixed size frequency sketch over 64-bit hashes.
+
+    With `width` w and `depth` d the estimate of a count exceeds the true count
+    by at most 2N/w (N = total count) with probability 1 - (1/2)^d.
+    The default (2^20 x 4, int32) uses 16MB.
+
+    Methods
+    =======
+    update: Add an array of hashes
+    estimate: Return the estimated counts for an array of hashes
+    merge: Add the counts of another sketch with the same dimensions
+    """
+
+    def __init__(self, width=2**20, depth=4):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype='int32')
+        self.total = 0
+
+    def _indices(self, hashes):
+        hashes = np.asarray(hashes, dtype='uint64')
+        h1 = hashes & np.uint64(0xffffffff)
+        h2 = hashes >> np.uint64(32)
+        width = np.uint64(self.width)
+        for row in range(self.depth):
+            yield row, ((h1 + np.uint64(row) * h2) % width).astype('int64')
+
+    def update(self, hashes, counts=1):
+        for row, idx in self._indices(hashes):
+            np.add.at(self.table[row], idx, counts)
+        counts = np.broadcast_to(counts, np.shape(hashes))
+        self.total += int(np.sum(counts))
+        return None
+
+    def estimate(self, hashes):
+        estimates = [self.table[row, idx] for row, idx in self._indices(hashes)]
+        return np.min(estimates, axis=0)
+
+    def merge(self, other):
+        if self.table.shape != other.table.shape:
+            raise ValueError("Sketches must have the same width and depth.")
+        self.table += other.table
+        self.total += other.total
+        return self
+
+
+class ParagraphCounter():
+    """
+    ParagraphCounter
+    ================
+    Streaming counter of paragraph occurrences.
+
+    Attributes
+    ==========
+    mode: 'exact', 'sketch' or 'auto'
+    counts: `Counter` of paragraph hashes (exact mode)
+    sketch: `CountMinSketch` (sketch mode)
+
+    Methods
+    =======
+    update: Count the paragraphs of an iterable of articles
+    merge: Add the counts of another counter
+    verify: Count the candidates of the sketch exactly (second pass)
+    boilerplate: Return the hashes of paragraphs occurring more than n times
+    """
+
+    def __init__(self, mode='auto', max_exact=2_000_000, width=2**20, depth=4):
+        if mode not in ('auto', 'exact', 'sketch'):
+            raise ValueError(f"Unknown mode: '{mode}'")
+        self.mode = mode
+        self.max_exact = max_exact
+        self.width = width
+        self.depth = depth
+        self.counts = Counter()
+        self.sketch = None
+        self.verified = None
+        if mode == 'sketch':
+            self._to_sketch()
+
+    @property
+    def is_exact(self):
+        return self.sketch is None
+
+    def _counts_to_sketch(self, counts):
+        sketch = CountMinSketch(self.width, self.depth)
+        if counts:
+            hashes = np.fromiter(counts.keys(), dtype='uint64')
+            values = np.fromiter(counts.values(), dtype='int64')
+            sketch.update(hashes, values)
+        return sketch
+
+    def _to_sketch(self):
+        self.sketch = self._counts_to_sketch(self.counts)
+        self.counts = Counter()
+        return None
+
+    def update(self, articles):
+        """
+        Count the paragraphs of an iterable of articles (lists of paragraphs).
+        """
+
+        hashes, counts = np.unique(hash_paragraphs(articles), return_counts=True)
+        if self.is_exact:
+            self.counts.update(dict(zip(hashes.tolist(), counts.tolist())))
+            if self.mode == 'auto' and len(self.counts) > self.max_exact:
+                self._to_sketch()
+        else:
+            self.sketch.update(hashes, counts)
+        self.verified = None
+        return self
+
+    def merge(self, other):
+        "Add the counts of another `ParagraphCounter` (eg from a worker)."
+        if self.is_exact and other.is_exact:
+            self.counts.update(other.counts)
+            if self.mode == 'auto' and len(self.counts) > self.max_exact:
+                self._to_sketch()
+        else:
+            if self.is_exact:
+                self._to_sketch()
+            sketch = other.sketch
+            if other.is_exact:
+                sketch = self._counts_to_sketch(other.counts)
+            self.sketch.merge(sketch)
+        self.verified = None
+        return self
+
+    def verify(self, article_batches, max_count=2):
+        """
+        Second pass for sketch mode: count the candidates exactly.
+        Candidates are the paragraphs with an estimated count > `max_count`.
+
+        Parameters
+        ==========
+        :param article_batches: iterable
+            Iterable of iterables of articles, eg the 'body' column per batch.
+            Must be the same data as fed to `update`.
+
+        Optional key-word arguments
+        ===========================
+        :param max_count: `int`, default=2
+
+        Returns
+        =======
+        :verify: `ParagraphCounter`
+        """
+
+        if self.is_exact:
+            return self
+        verified = Counter()
+        for articles in article_batches:
+            hashes = hash_paragraphs(articles)
+            candidates = hashes[self.sketch.estimate(hashes) > max_count]
+            verified.update(candidates.tolist())
+        self.verified = verified
+        return self
+
+    def count(self, paragraph):
+        "Return the (verified, if available) count of a paragraph."
+        h = paragraph_hash(paragraph)
+        if self.is_exact:
+            return self.counts[h]
+        if self.verified is not None:
+            return self.verified[h]
+        return int(self.sketch.estimate([h])[0])
+
+    def boilerplate(self, max_count=2):
+        """
+        Return the hashes of the paragraphs occurring more than `max_count`
+        times as a `set`. In sketch mode `verify` must be run first.
+        """
+
+        if self.is_exact:
+            counts = self.counts
+        elif self.verified is not None:
+            counts = self.verified
+        else:
+            raise RuntimeError(
+                "Counts are estimates, run `verify` before selecting "
+                "boilerplate in sketch mode."
+                )
+        return {h for h, n in counts.items() if n > max_count}
+
+
+def paragraph_table(articles, counter, min_count=2):
+    """
+    Return the paragraphs occurring at least `min_count` times with their
+    count as a `DataFrame` (paragraphs as index, column 'count').
+    """
+
+    import pandas as pd
+
+    seen = set()
+    table = dict()
+    for article in articles:
+        for p in article:
+            if p in seen:
+                continue
+            seen.add(p)
+            n = counter.count(p)
+            if n >= min_count:
+                table[p] = n
+    return pd.DataFrame.from_dict(table, orient='index', columns=['count'])
+
+
+def remove_paragraphs(articles, hashes):
+    """
+    Remove the paragraphs with a hash in `hashes` from every article.
+
+    Returns
+    =======
+    :remove_paragraphs: `list` of `lists`
+    """
+
+    if not hashes:
+        return [list(article) for article in articles]
+    return [
+        [p for p in article if paragraph_hash(p) not in hashes]
+        for article in articles
+    ]
@@ -1,11 +1,19 @@
 """
 This module loads the settings from config.ini.
+
+The ini file is parsed on first access of a setting and every section is
+converted to a `namedtuple` only when it is requested, eg:
+
+    from src.config import PATHS
+
+will parse 'config.ini' once and build the PATHS section only.
 """
 
 
 # standard library
 import configparser
 from collections import namedtuple
+from functools import lru_cache
 from pathlib import Path
 
 
@@ -98,16 +106,40 @@ def get_list(value):
     return lst
 
 
+def path_from_value(value):
+    return PATH_LIB / value[1:] if value.startswith('/') else Path(value)
+
+
 # easy access to settings and paths
-config     = load_ini(CFG_FILE)
-PROJECT    = get_section(config, 'PROJECT')
-MODEL      = get_section(config, 'MODEL')
-LEXISNEXIS = get_section(config, 'LEXISNEXIS')
-GEONAMES   = get_section(config, 'GEONAMES')
-MAPPING    = get_section(config, 'MAPPING')
-FILENAMES  = get_section(config, 'FILENAMES')
-PATHS      = get_section(
-    config,
-    'PATHS',
-    func=lambda x: PATH_LIB / x[1:] if x.startswith('/') else Path(x)
-)
+SECTIONS = {
+    'PROJECT':       None,
+    'MODEL':         None,
+    'LEXISNEXIS':    None,
+    'DEDUPLICATION': None,
+    'GEONAMES':      None,
+    'MAPPING':       None,
+    'FILENAMES':     None,
+    'PATHS':         path_from_value,
+}
+
+
+@lru_cache(maxsize=None)
+def load_config():
+    return load_ini(CFG_FILE)
+
+
+@lru_cache(maxsize=None)
+def load_section(section):
+    return get_section(load_config(), section, func=SECTIONS[section])
+
+
+def __getattr__(name):
+    if name == 'config':
+        return load_config()
+    if name in SECTIONS:
+        return load_section(name)
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
+
+def __dir__():
+    return sorted(list(globals()) + ['config'] + list(SECTIONS))
@@ -0,0 +1,415 @@
+"""
+This module holds the count table: the total and unique counts stored by
+03_spacify.py as one columnar table
+
+    (count_type, batch, attribute, item) -> count
+
+The table is built once from the count dicts, with the synonymous country
+names (FILENAMES.alt_country_names) merged into their main entry, and stored
+as a directory of .npy columns in FILENAMES.count_table. Loading the table
+memory-maps the columns and reads the slices of the counters from its meta
+data (stored once by `save`), so it does not depend on the number of counts.
+The table is rebuilt when the count dicts or the alternative names change:
+
+    table = CountTable.cached()
+    table.to_dict(stopwords=['zijn', 'worden'])
+
+Rows are sorted by (count_type, batch, attribute), so every counter is a
+contiguous slice of the table. `to_dict` only converts a slice to a `Counter`
+when it is accessed.
+
+The main entries of the alternative names are added to the vocabulary by
+03_spacify.py, which also builds the tables. Reading the table does not write
+the vocabulary.
+"""
+
+
+# standard library
+import json
+import pickle
+from collections import Counter
+from collections.abc import Mapping
+
+# third party
+import numpy as np
+import pandas as pd
+
+# local
+from src.config import PATHS, FILENAMES
+from src.utils import fingerprint
+
+
+KEYS = ['count_type', 'batch', 'attribute']
+COLUMNS = KEYS + ['item', 'count']
+SOURCES = {
+    'total':  FILENAMES.dct_counts_total,
+    'unique': FILENAMES.dct_counts_unique,
+}
+
+
+def _fingerprint(paths):
+    "Return a fingerprint of the size and modification time of `paths`."
+    stats = [
+        (str(path), path.stat().st_size, path.stat().st_mtime_ns)
+        for path in paths
+        if path.exists()
+    ]
+    return fingerprint(stats)
+
+
+def add_main_entries(vocabulary, path=None):
+    """
+    Add the main entries of the alternative country names to `vocabulary`,
+    so the entries that were only counted under an alternative name can be
+    displayed. Called by 03_spacify.py before it stores the vocabulary.
+    """
+
+    path = path or PATHS.parameters / FILENAMES.alt_country_names
+    with open(path, 'r', encoding='utf8') as f:
+        for country in json.load(f):
+            vocabulary.add_string(country)
+    return vocabulary
+
+
+class CounterView(Mapping):
+    """
+    CounterView
+    ===========
+    Read-only mapping of the attributes of a (count_type, batch) to their
+    counts, as returned by `CountTable.to_dict`. The `Counter` of an attribute
+    is built from its slice of the table on first access and then kept.
+
+    Attributes
+    ==========
+    table: `CountTable`
+    rows: `dict` mapping the attributes to the slice of their rows
+    """
+
+    def __init__(self, table, rows, items, stop=None):
+        self.table = table
+        self.rows = rows
+        self._items = items
+        self._stop = stop
+        self._counters = dict()
+
+    def __getitem__(self, attribute):
+        if attribute not in self._counters:
+            rows = self.rows[attribute]
+            codes = self.table.columns['item'][rows]
+            counts = self.table.columns['count'][rows]
+            if self._stop is not None and attribute == 'lemma':
+                keep = ~np.isin(codes, self._stop)
+                codes, counts = codes[keep], counts[keep]
+            items = self._items()
+            self._counters[attribute] = Counter(
+                dict(zip(items[codes], counts.tolist()))
+            )
+        return self._counters[attribute]
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __repr__(self):
+        return f"CounterView({list(self.rows)})"
+
+
+class CountTable():
+    """
+    CountTable
+    ==========
+    Columnar table of the counts per (count_type, batch, attribute, item).
+
+    Attributes
+    ==========
+    categories: `dict` with the values of 'count_type', 'batch', 'attribute'
+                and 'item'; the table holds codes into these arrays
+    columns: `dict` of arrays (codes and 'count')
+    offsets: `dict` mapping (count_type, batch, attribute) to the slice of
+             its rows
+
+    Methods
+    =======
+    build: Build the table from the count dicts (classmethod)
+    cached: Load the stored table, (re)building it if needed (classmethod)
+    save: Store the table
+    load: Memory-map a stored table (classmethod)
+    mask: Return the boolean mask of a selection
+    to_frame: Return (a selection of) the table as `DataFrame`
+    to_dict: Return the counts as nested `dict` of `Counter` (lazily)
+    """
+
+    def __init__(self, categories, columns, offsets=None):
+        self.categories = categories
+        self.columns = columns
+        self.offsets = self._offsets() if offsets is None else offsets
+
+    def __len__(self):
+        return len(self.columns['count'])
+
+    def _offsets(self):
+        keys = np.stack([self.columns[key] for key in KEYS], axis=1)
+        if not len(keys):
+            return dict()
+        starts = np.flatnonzero(np.any(keys[1:] != keys[:-1], axis=1)) + 1
+        starts = np.concatenate([[0], starts])
+        ends = np.concatenate([starts[1:], [len(keys)]])
+        offsets = dict()
+        for start, end in zip(starts, ends):
+            group = tuple(
+                self.categories[key][code].item()
+                for key, code in zip(KEYS, keys[start])
+            )
+            offsets[group] = slice(start, end)
+        return offsets
+
+    @classmethod
+    def build(cls, d, alts=None, vocabulary=None):
+        """
+        Build the table from a `dict` mapping count types to the count dicts
+        of 03_spacify.py.
+
+        Optional key-word arguments
+        ===========================
+        :param alts: `dict`, default None
+            Mapping of main entries to their alternative names. The counts of
+            the alternative names are added to the main entry ('countries').
+        :param vocabulary: `Vocabulary`, default None
+            Vocabulary if the counts are keyed by hash id. Main entries that
+            are not in it are added (in memory, see `add_main_entries`).
+
+        Returns
+        =======
+        :build: `CountTable`
+        """
+
+        records = (
+            (count_type, batch, attribute, item, n)
+            for count_type, batches in d.items()
+            for batch, attributes in batches.items()
+            for attribute, counter in attributes.items()
+            for item, n in counter.items()
+        )
+        df = pd.DataFrame.from_records(records, columns=COLUMNS)
+
+        if alts:
+            main = dict()
+            for country, names in alts.items():
+                for name in names:
+                    key = name if vocabulary is None else vocabulary.id(name)
+                    if key is not None:
+                        main[key] = country
+            countries = df['attribute'] == 'countries'
+            alt = countries & df['item'].isin(main.keys())
+            if alt.any():
+                entries = df.loc[alt, 'item'].map(main)
+                if vocabulary is not None:
+                    entries = entries.map(vocabulary.add_string)
+                df.loc[alt, 'item'] = entries.values
+                df = (
+                    df.groupby(COLUMNS[:-1], sort=False)['count']
+                    .sum()
+                    .reset_index()
+                )
+
+        categories = dict()
+        columns = dict()
+        for col in COLUMNS[:-1]:
+            codes, uniques = pd.factorize(df[col], sort=True)
+            if col == 'item' and vocabulary is not None:
+                uniques = np.asarray(uniques, dtype='uint64')
+            else:
+                uniques = np.asarray(uniques, dtype=str)
+            dtype = 'int32' if col == 'item' else 'int16'
+            categories[col] = uniques
+            columns[col] = codes.astype(dtype)
+        columns['count'] = df['count'].to_numpy(dtype='int64')
+
+        order = np.lexsort([columns[key] for key in reversed(KEYS)])
+        columns = {col: values[order] for col, values in columns.items()}
+        return cls(categories, columns)
+
+    @classmethod
+    def cached(
+        cls,
+        merge_entries=True,
+        path=PATHS.results / FILENAMES.count_table,
+    ):
+        """
+        Return the stored table, building and storing it first if the count
+        dicts, the alternative names or the vocabulary changed.
+        """
+
+        path = path / ('merged' if merge_entries else 'raw')
+        sources = [PATHS.results / file for file in SOURCES.values()]
+        sources.append(PATHS.results / FILENAMES.vocabulary)
+        if merge_entries:
+            sources.append(PATHS.parameters / FILENAMES.alt_country_names)
+        key = _fingerprint(sources)
+
+        try:
+            with open(path / 'meta.json', 'r', encoding='utf8') as f:
+                if json.load(f)['key'] == key:
+                    return cls.load(path)
+        except (OSError, ValueError, KeyError):
+            pass
+
+        d = dict()
+        for count_type, file in SOURCES.items():
+            with open(PATHS.results / file, 'rb') as f:
+                d[count_type] = pickle.load(f)
+
+        vocabulary = None
+        if (PATHS.results / FILENAMES.vocabulary).exists():
+            from src.vocabulary import Vocabulary
+            vocabulary = Vocabulary.load()
+
+        alts = None
+        if merge_entries:
+            alts_file = PATHS.parameters / FILENAMES.alt_country_names
+            with open(alts_file, 'r', encoding='utf8') as f:
+                alts = json.load(f)
+
+        table = cls.build(d, alts=alts, vocabulary=vocabulary)
+        table.save(path, key=key)
+        return cls.load(path)
+
+    def save(self, path, key=None):
+        """
+        Store the columns and the items as .npy files in `path`. The offsets
+        and the other categories are stored in 'meta.json', so `load` does
+        not go over the rows.
+        """
+
+        path.mkdir(parents=True, exist_ok=True)
+        for col, values in self.columns.items():
+            np.save(path / f'{col}.npy', values)
+        np.save(path / '_item.npy', self.categories['item'])
+        meta = {
+            'key': key,
+            'rows': len(self),
+            'categories': {
+                col: self.categories[col].tolist() for col in KEYS
+            },
+            'offsets': [
+                [*group, int(rows.start), int(rows.stop)]
+                for group, rows in self.offsets.items()
+            ],
+        }
+        with open(path / 'meta.json', 'w', encoding='utf8') as f:
+            json.dump(meta, f)
+        return None
+
+    @classmethod
+    def load(cls, path):
+        "Memory-map the table stored in `path`."
+        with open(path / 'meta.json', 'r', encoding='utf8') as f:
+            meta = json.load(f)
+        columns = {
+            col: np.load(path / f'{col}.npy', mmap_mode='r')
+            for col in COLUMNS
+        }
+        categories = {
+            col: np.asarray(values, dtype=str)
+            for col, values in meta['categories'].items()
+        }
+        categories['item'] = np.load(path / '_item.npy', mmap_mode='r')
+        offsets = {
+            tuple(group): slice(start, stop)
+            for *group, start, stop in meta['offsets']
+        }
+        return cls(categories, columns, offsets=offsets)
+
+    def _codes(self, col, values):
+        if isinstance(values, (str, int, np.integer)):
+            values = [values]
+        return np.flatnonzero(np.isin(self.categories[col], list(values)))
+
+    def mask(
+        self,
+        count_type=None,
+        batch=None,
+        attribute=None,
+        stopwords=None,
+        vocabulary=None,
+    ):
+        """
+        Return the boolean mask of the rows of the given count types, batches
+        and attributes (single values or lists), without the `stopwords` in
+        'lemma'. Pass the `Vocabulary` if the items are hash ids.
+        """
+
+        mask = np.ones(len(self), dtype=bool)
+        for col, values in zip(KEYS, [count_type, batch, attribute]):
+            if values is not None:
+                mask &= np.isin(self.columns[col], self._codes(col, values))
+        if stopwords:
+            if vocabulary is not None:
+                stopwords = vocabulary.encode(stopwords)
+            lemma = self._codes('attribute', 'lemma')
+            stop = self._codes('item', stopwords)
+            mask &= ~(
+                np.isin(self.columns['attribute'], lemma)
+                & np.isin(self.columns['item'], stop)
+            )
+        return mask
+
+    def to_frame(self, vocabulary=None, **selection):
+        """
+        Return the rows selected with `mask` as `DataFrame` with categorical
+        keys. Pass the `Vocabulary` to display hash ids as strings.
+        """
+
+        mask = self.mask(vocabulary=vocabulary, **selection)
+        data = {
+            col: pd.Categorical.from_codes(
+                self.columns[col][mask], categories=self.categories[col]
+            )
+            for col in KEYS
+        }
+        items = self.categories['item']
+        if vocabulary is not None:
+            items = [vocabulary.strings.get(k, k) for k in items.tolist()]
+            items = np.asarray(items, dtype=object)
+        data['item'] = items[self.columns['item'][mask]]
+        data['count'] = np.asarray(self.columns['count'][mask])
+        return pd.DataFrame(data)
+
+    def to_dict(self, stopwords=None, vocabulary=None, as_strings=False):
+        """
+        Return the counts as `dict` of count types of `dict` of batches of
+        `CounterView`, a mapping of the attributes to their `Counter`, as
+        stored by 03_spacify.py. A `Counter` is only built when its attribute
+        is accessed. Set `as_strings` (with the `Vocabulary`) to key the
+        counters by string.
+        """
+
+        stop = None
+        if stopwords:
+            if vocabulary is not None:
+                stopwords = vocabulary.encode(stopwords)
+            stop = self._codes('item', stopwords)
+
+        items = list()
+        def get_items():
+            # the item keys are converted once, when the first counter is built
+            if not items:
+                keys = self.categories['item'].tolist()
+                if as_strings and vocabulary is not None:
+                    keys = [vocabulary.strings.get(k, k) for k in keys]
+                items.append(np.asarray(keys, dtype=object))
+            return items[0]
+
+        groups = dict()
+        for (count_type, batch, attribute), rows in self.offsets.items():
+            batches = groups.setdefault(count_type, dict())
+            batches.setdefault(batch, dict())[attribute] = rows
+        return {
+            count_type: {
+                batch: CounterView(self, rows, get_items, stop=stop)
+                for batch, rows in batches.items()
+            }
+            for count_type, batches in groups.items()
+        }
@@ -0,0 +1,136 @@
+"""
+This module loads the datasets shipped with the repo:
+
+- `load_dataset`: the metadata of the LexisNexis articles
+  (FILENAMES.lexisnexis_dataset)
+- `load_results`: the toponym or lemmata statistics per source
+  (FILENAMES.toponym_results, FILENAMES.lemmata_results)
+
+The csv files are read with explicit compact dtypes: categoricals for the
+source and section, nullable integers (missing stays missing) for the counts.
+The parsed `DataFrame` is cached as Parquet in PATHS.cache, keyed by the hash
+of the csv file, so it is only parsed again when the file changes:
+
+    from src.datasets import load_dataset, load_results
+    lexis = load_dataset()
+    toponym = load_results('toponym')
+"""
+
+
+# standard library
+from pathlib import Path
+
+# third party
+import pandas as pd
+
+# local
+from src.config import PATHS, FILENAMES
+from src.utils import file_digest
+
+
+COUNT_PREFIXES = ('ent_', 'unique_ent_', 'n_', 'pos_')
+RESULTS = {
+    'toponym': FILENAMES.toponym_results,
+    'lemmata': FILENAMES.lemmata_results,
+}
+
+
+def cached(path, reader, cache=True):
+    """
+    Return `reader(path)`, from the Parquet cache in PATHS.cache if the file
+    did not change since it was cached.
+    """
+
+    path = Path(path)
+    if not path.is_file():
+        raise FileNotFoundError(path)
+    if not cache:
+        return reader(path)
+    cache_file = PATHS.cache / f"{path.name}.{file_digest(path)[:16]}.parquet"
+    if cache_file.exists():
+        return pd.read_parquet(cache_file)
+    df = reader(path)
+    PATHS.cache.mkdir(parents=True, exist_ok=True)
+    for old in PATHS.cache.glob(f"{path.name}.*.parquet"):
+        old.unlink()
+    df.to_parquet(cache_file)
+    return df
+
+
+def read_dataset(path):
+    "Parse the LexisNexis metadata csv with compact dtypes."
+    columns = pd.read_csv(path, nrows=0).columns
+    dtypes = {
+        'id': 'string',
+        'source': 'category',
+        'title': 'string',
+        'section': 'category',
+        'page': 'Int16',
+        'length': 'Int32',
+        'byline': 'string',
+    }
+    dtypes.update({
+        col: 'Int32' for col in columns if col.startswith(COUNT_PREFIXES)
+    })
+    return pd.read_csv(
+        path,
+        dtype=dtypes,
+        parse_dates=['publication_date'],
+    )
+
+
+def read_results(path):
+    """
+    Parse a results csv (two header rows: source and measure, two index
+    columns: category and item) with nullable integer counts.
+    """
+
+    df = pd.read_csv(path, index_col=[0, 1], header=[0, 1])
+    df = df.astype('Int32')
+    df.index.names = ['category', 'item']
+    df.columns.names = ['source', 'measure']
+    return df
+
+
+def load_dataset(path=PATHS.data / FILENAMES.lexisnexis_dataset, cache=True):
+    """
+    Load the metadata of the LexisNexis articles.
+
+    Optional key-word arguments
+    ===========================
+    :param path: `Path`, default PATHS.data / FILENAMES.lexisnexis_dataset
+        Path to the csv file.
+    :param cache: `bool`, default=True
+        Use the cached copy in PATHS.cache.
+
+    Returns
+    =======
+    :load_dataset: `DataFrame`
+    """
+
+    return cached(path, read_dataset, cache=cache)
+
+
+def load_results(name='toponym', cache=True):
+    """
+    Load the statistics of the toponym or lemmata recognition.
+
+    Parameters
+    ==========
+    :param name: `str`, default='toponym'
+        'toponym', 'lemmata' or the path to a results csv.
+
+    Optional key-word arguments
+    ===========================
+    :param cache: `bool`, default=True
+        Use the cached copy in PATHS.cache.
+
+    Returns
+    =======
+    :load_results: `DataFrame`
+        Articles and frequency per source (columns) for every item per
+        category (index).
+    """
+
+    path = PATHS.results / RESULTS[name] if name in RESULTS else Path(name)
+    return cached(path, read_results, cache=cache)
@@ -1,15 +1,18 @@
 # standard library
-import json
-import pickle
+import heapq
+import operator
 from collections import Counter
 
 # third party
+import numpy as np
 import pandas as pd
 
 # local
+from src import profiling
 from src.config import PATHS, FILENAMES, LEXISNEXIS
 
 
+@profiling.timed()
 def basic_stats(doc):
     """
     Extract some basic statistics from a spaCy `Doc` instance as `dict`:
@@ -71,7 +74,8 @@ def basic_stats(doc):
     return stats
 
 
-def attribute_counter(doc, unique=False):
+@profiling.timed()
+def attribute_counter(doc, unique=False, as_ids=False):
     """
     Count occurrances of all lemmas and entities in a spaCy `Doc` instance.
     Return results as a `dict` of `dicts`:
@@ -81,6 +85,8 @@ def attribute_counter(doc, unique=False):
         * The key is the token.text/ent.text.
         * The value is the count of the key within the doc.
     If 'unique' is True, similar items are only counted once.
+    If 'as_ids' is True, the keys are the spaCy hash ids of the lemmas and
+    entity texts instead of the strings (see the `vocabulary` module).
 
     Parameters
     ==========
@@ -90,6 +96,8 @@ def attribute_counter(doc, unique=False):
     ===========================
     :param unique: `boolean`, default=False
         Set to True to count only unique occurrances.
+    :param as_ids: `boolean`, default=False
+        Set to True to count by hash id.
 
     Returns
     =======
@@ -99,6 +107,7 @@ def attribute_counter(doc, unique=False):
     fails = list()
     counters = dict()
     counters['lemma'] = Counter()
+    strings = doc.vocab.strings
 
     for token in doc:
         relevant_token = (
@@ -109,23 +118,225 @@ def attribute_counter(doc, unique=False):
             not token.text == '\n'
             )
         try:
-            if unique and token.lemma_ in counters['lemma']:
+            lemma = token.lemma if as_ids else token.lemma_
+            if unique and lemma in counters['lemma']:
                 continue
             if relevant_token:
-                counters['lemma'][token.lemma_] += 1
+                counters['lemma'][lemma] += 1
         except KeyError:
             fails.append((doc._.id, token))
     for ent in doc.ents:
         if ent.label_ not in counters:
             counters[ent.label_] = Counter()
-        if unique and ent.text in counters[ent.label_]:
+        text = strings.add(ent.text) if as_ids else ent.text
+        if unique and text in counters[ent.label_]:
             continue
-        counters[ent.label_][ent.text] += 1
+        counters[ent.label_][text] += 1
 
     return counters, fails
 
 
-def most_common(data, attribute, n=10, label_col='label', frq_col='count'):
+class CooccurrenceCounter():
+    """
+    CooccurrenceCounter
+    ===================
+    Count how often entities are mentioned together in the same article and in
+    the same sentence, as sparse (scipy) entity x entity matrices.
+
+    Every entity is a (label, text) pair and gets an index in order of
+    appearance. Pairs are collected in buffers which are summed into the
+    matrices every `buffer_size` pairs, so memory is bounded by the number of
+    distinct pairs (not by the number of mentions). The diagonal holds the
+    number of articles/sentences that mention the entity.
+
+    Attributes
+    ==========
+    labels: Entity labels to count (all if None)
+    index: Mapping of (label, text) to the index in the matrices
+    entities: `DataFrame` with the label and text per index
+
+    Methods
+    =======
+    update: Count the co-occurrences in a spaCy `Doc`
+    matrix: Return the symmetric co-occurrence matrix of a level
+    neighbours: Return the top k entities co-occurring with an entity
+    save: Store the matrices and the entities as npz
+    load: Load stored matrices (classmethod)
+    """
+
+    LEVELS = ('article', 'sentence')
+
+    def __init__(self, labels=None, buffer_size=5_000_000):
+        self.labels = set(labels) if labels else None
+        self.buffer_size = buffer_size
+        self.index = dict()
+        self._keys = list()
+        self._buffers = {level: [] for level in self.LEVELS}
+        self._buffered = {level: 0 for level in self.LEVELS}
+        self._matrices = {level: None for level in self.LEVELS}
+        self._symmetric = dict()
+
+    @property
+    def entities(self):
+        return pd.DataFrame(self._keys, columns=['label', 'text'])
+
+    def _id(self, key):
+        idx = self.index.get(key)
+        if idx is None:
+            idx = self.index[key] = len(self._keys)
+            self._keys.append(key)
+        return idx
+
+    def _add(self, level, ids):
+        ids = np.unique(np.fromiter(ids, dtype='int64'))
+        rows, cols = np.triu_indices(len(ids))
+        self._buffers[level].append((ids[rows], ids[cols]))
+        self._buffered[level] += len(rows)
+        self._symmetric.pop(level, None)
+        if self._buffered[level] >= self.buffer_size:
+            self._flush(level)
+        return None
+
+    def _flush(self, level):
+        from scipy import sparse
+
+        n = len(self._keys)
+        matrix = self._matrices[level]
+        if matrix is None:
+            matrix = sparse.csr_matrix((n, n), dtype='int32')
+        elif matrix.shape[0] < n:
+            matrix.resize((n, n))
+        if self._buffers[level]:
+            rows = np.concatenate([r for r, _ in self._buffers[level]])
+            cols = np.concatenate([c for _, c in self._buffers[level]])
+            data = np.ones(len(rows), dtype='int32')
+            matrix = matrix + sparse.coo_matrix(
+                (data, (rows, cols)), shape=(n, n)
+            ).tocsr()
+        self._matrices[level] = matrix
+        self._buffers[level] = list()
+        self._buffered[level] = 0
+        return None
+
+    def update(self, doc):
+        """
+        Count the entities co-occurring in the article and in each of the
+        sentences of a spaCy `Doc`.
+        """
+
+        article = set()
+        sentences = dict()
+        for ent in doc.ents:
+            if self.labels and ent.label_ not in self.labels:
+                continue
+            idx = self._id((ent.label_, ent.text))
+            article.add(idx)
+            sentences.setdefault(ent.sent.start, set()).add(idx)
+        if article:
+            self._add('article', article)
+        for sentence in sentences.values():
+            self._add('sentence', sentence)
+        return self
+
+    def matrix(self, level='article'):
+        """
+        Return the symmetric co-occurrence matrix of 'article' or 'sentence'
+        as scipy `csr_matrix`, rows and columns in the order of `entities`.
+        """
+
+        from scipy import sparse
+
+        if level not in self._symmetric:
+            self._flush(level)
+            upper = self._matrices[level]
+            self._symmetric[level] = (
+                upper + sparse.triu(upper, k=1).T
+            ).tocsr()
+        return self._symmetric[level]
+
+    def neighbours(self, text, label=None, k=10, level='article'):
+        """
+        Return the `k` entities mentioned most often together with `text`.
+
+        Parameters
+        ==========
+        :param text: `str`
+            Text of the entity.
+
+        Optional key-word arguments
+        ===========================
+        :param label: `str`, default None
+            Label of the entity, the first label found if None.
+        :param k: `int`, default=10
+        :param level: `str`, default='article'
+            'article' or 'sentence'.
+
+        Returns
+        =======
+        :neighbours: `DataFrame`
+            Columns label, text and count, sorted by count.
+        """
+
+        if label is None:
+            keys = [key for key in self._keys if key[1] == text]
+            if not keys:
+                raise KeyError(text)
+            label = keys[0][0]
+        idx = self.index[(label, text)]
+        row = self.matrix(level).getrow(idx)
+        counts, cols = row.data, row.indices
+        keep = cols != idx
+        counts, cols = counts[keep], cols[keep]
+        if len(counts) > k:
+            top = np.argpartition(-counts, k)[:k]
+            counts, cols = counts[top], cols[top]
+        order = np.argsort(-counts, kind='stable')
+        df = self.entities.iloc[cols[order]].reset_index(drop=True)
+        df['count'] = counts[order]
+        return df
+
+    def save(self, path=PATHS.results / FILENAMES.cooccurrence):
+        arrays = dict()
+        for level in self.LEVELS:
+            self._flush(level)
+            matrix = self._matrices[level]
+            arrays[f"{level}_data"] = matrix.data
+            arrays[f"{level}_indices"] = matrix.indices
+            arrays[f"{level}_indptr"] = matrix.indptr
+        arrays['labels'] = np.array([label for label, _ in self._keys], dtype=str)
+        arrays['texts'] = np.array([text for _, text in self._keys], dtype=str)
+        np.savez_compressed(path, **arrays)
+        return None
+
+    @classmethod
+    def load(cls, path=PATHS.results / FILENAMES.cooccurrence):
+        from scipy import sparse
+
+        counter = cls()
+        with np.load(path) as arrays:
+            for label, text in zip(arrays['labels'], arrays['texts']):
+                counter._id((str(label), str(text)))
+            n = len(counter._keys)
+            for level in cls.LEVELS:
+                counter._matrices[level] = sparse.csr_matrix(
+                    (
+                        arrays[f"{level}_data"],
+                        arrays[f"{level}_indices"],
+                        arrays[f"{level}_indptr"],
+                    ),
+                    shape=(n, n),
+                )
+        return counter
+
+
+def most_common(
+    data,
+    attribute,
+    n=10,
+    label_col='label',
+    frq_col='count',
+    vocabulary=None,
+):
     """
     Return the n most common attributes per source as DataFrame.
 
@@ -145,6 +356,8 @@ def most_common(data, attribute, n=10, label_col='label', frq_col='count'):
         Name for the label column.
     :param frq_col: `str`, default='count'
         Name for the frequency column.
+    :param vocabulary: `Vocabulary`, default None
+        Vocabulary to display the labels of counts keyed by hash id.
 
     Returns
     =======
@@ -152,75 +365,104 @@ def most_common(data, attribute, n=10, label_col='label', frq_col='count'):
     """
 
     if isinstance(data, pd.DataFrame):
-        def extract_sources(data):
-            if isinstance(data.index, pd.MultiIndex):
-                return data.columns
-            else:
-                return data.source.unique()
-
-        def extract_data(data, source, attribute, n):
-            if isinstance(data.index, pd.MultiIndex):
-                return (
-                    data.xs(attribute)[source]
-                        .sort_values(ascending=False)
-                        .to_frame()
-                        .reset_index()
-                        .head(n)
-                    ).values
-            else:
-                return (
-                    data.loc[data.source == source, attribute]
-                        .value_counts()
-                        .to_frame()
-                        .reset_index()
-                        .head(n)
-                    ).values
-
-        def transform(data, source, attribute, n=n):
-            cols = pd.MultiIndex.from_product([[source], [label_col, frq_col]])
-            df = extract_data(data, source, attribute, n)
-            return pd.DataFrame(df, columns=cols)
-        sources = extract_sources(data)
-
+        if isinstance(data.index, pd.MultiIndex):
+            top = _top_n_columns(data.xs(attribute), n)
+        else:
+            top = _top_n_groups(data, 'source', attribute, n)
     else:
-        def transform(data, source, attribute, n=n):
-            cols = pd.MultiIndex.from_product([[source], [label_col, frq_col]])
+        top = dict()
+        for source in data.keys():
             try:
-                n_most_common = data[source][attribute].most_common(n)
-                return pd.DataFrame(n_most_common, columns=cols)
+                counts = data[source][attribute]
             except KeyError:
-                return pd.DataFrame()
-        sources = data.keys()
+                continue
+            # partial selection with a heap, no full sort
+            top[source] = heapq.nlargest(
+                n, counts.items(), key=operator.itemgetter(1)
+            )
 
-    dfs = [transform(data, source, attribute) for source in sources]
-    df = pd.concat(dfs, axis=1)
+    dfs = list()
+    for source, items in top.items():
+        cols = pd.MultiIndex.from_product([[source], [label_col, frq_col]])
+        dfs.append(pd.DataFrame(items, columns=cols))
+    df = pd.concat(dfs, axis=1) if dfs else pd.DataFrame()
     df.index.name = 'ranking'
+    if vocabulary is not None:
+        for col in df.columns:
+            if col[1] == label_col:
+                df[col] = [vocabulary.strings.get(k, k) for k in df[col]]
     return df
 
 
-def overlapping_items(data, attribute, n=12):
-    counts = Counter()
-    keys = data.keys()
+def _top_n_columns(df, n):
+    """
+    Return the n largest values (with their index label) of every column of
+    `df` as a `dict` of lists of (label, value) tuples, selected for all
+    columns at once with `argpartition`. Missing values are skipped.
+    """
+
+    values = df.to_numpy(dtype='float64', na_value=np.nan)
+    filled = np.where(np.isnan(values), -np.inf, values)
+    k = min(n, len(df))
+    if k == 0:
+        return {col: [] for col in df.columns}
+    if k < len(df):
+        rows = np.argpartition(-filled, k - 1, axis=0)[:k]
+    else:
+        rows = np.tile(np.arange(len(df))[:, None], (1, len(df.columns)))
+    top = dict()
+    labels = df.index.to_numpy()
+    for i, col in enumerate(df.columns):
+        idx = rows[:, i]
+        idx = idx[np.lexsort((idx, -filled[idx, i]))]
+        idx = idx[~np.isnan(values[idx, i])]
+        top[col] = list(zip(labels[idx], df.iloc[idx, i]))
+    return top
+
+
+def _top_n_groups(df, group_col, attribute, n):
+    """
+    Return the n most common values of `attribute` per group in one group-by,
+    as a `dict` of lists of (value, count) tuples in order of appearance of
+    the groups.
+    """
+
+    counts = df.groupby(group_col, sort=False)[attribute].value_counts()
+    counts = counts.groupby(level=0, sort=False).head(n)
+    top = {group: [] for group in df[group_col].unique()}
+    for (group, value), count in counts.items():
+        top[group].append((value, count))
+    return top
+
+
+def overlapping_items(data, attribute, n=12, vocabulary=None):
+    """
+    Return how many sources have each item in their n most common items, as
+    list of (item, number of sources) tuples.
+    """
+
     labels = most_common(
         data,
         attribute,
-        n=n
+        n=n,
+        vocabulary=vocabulary,
     ).xs('label', level=1, axis=1)
-    for key in keys:
-        for item in labels[key]:
-            counts[item] += 1
+    items = labels.to_numpy().ravel(order='F')
+    counts = Counter(item for item in items if not pd.isna(item))
     return counts.most_common()
 
 
 def get_positives(df, threshold=100):
     """
     Return a list of phrases that have at least one positive annotation.
-    Input is a df_annotations `DataFrame` created by the annotator.
+    Input is a df_annotations `DataFrame` created by the annotator, or the
+    annotation log (`AnnotationStore` or the path to its jsonl file), whose
+    counts per phrase are kept up to date while annotating.
 
     Parameters
     ==========
-    :param df: `DataFrame`
-        df_annotations `DataFrame` created by the annotator.
+    :param df: `DataFrame`, `AnnotationStore` or `Path`
+        df_annotations `DataFrame` created by the annotator or annotation log.
 
     Optional key-word arguments
     ===========================
@@ -234,6 +476,12 @@ def get_positives(df, threshold=100):
     :get_positives: `list`
     """
 
+    if not isinstance(df, pd.DataFrame):
+        from src.annotation_store import AnnotationStore
+        if not isinstance(df, AnnotationStore):
+            df = AnnotationStore.load(df)
+        return df.positives(threshold=threshold)
+
     df = df.pivot_table(
         index='phrase',
         columns='annotation',
@@ -246,62 +494,89 @@ def get_positives(df, threshold=100):
     return list(df[df['positive']].index)
 
 
-def load_counts(merge_entries=True, stopwords=None):
+def load_counts(
+    merge_entries=True,
+    stopwords=None,
+    as_strings=True,
+    as_table=False,
+):
     """
     Return a dictionary of dictionaries with total and unique places counts.
     If merge_entries is True synonymous entries are merged in to the main entry.
     If a list of stopwords is given, these will be removed from 'lemma'.
+
+    The counts are keyed by string. If 03_spacify stored a vocabulary
+    (FILENAMES.vocabulary), set as_strings to False to key them by hash id.
+
+    The counts are read from the cached `CountTable`, which is (re)built from
+    the count dicts when they changed. The `Counter` of an attribute is only
+    built when it is accessed (see `CounterView`). Set as_table to True to
+    return the (memory-mapped) table itself, without the stopwords.
     """
 
-    d = dict()
-
-    files = {
-        'total':  FILENAMES.dct_counts_total,
-        'unique': FILENAMES.dct_counts_unique,
-    }
-    for key, file in files.items():
-        with open(PATHS.results / file, 'rb') as f:
-            d[key] = pickle.load(f)
-
-    # merge synonymoous entries into their main entry
-    if merge_entries:
-        alts_file = PATHS.parameters / 'alts_countries.json'
-        with open(alts_file, 'r', encoding='utf8') as f:
-            alts_countries = json.load(f)
-
-        for count_type in d:
-            for batch in LEXISNEXIS.batches:
-                for country in alts_countries:
-                    for alt in alts_countries[country]:
-                        n = d[count_type][batch]['countries'][alt]
-                        del d[count_type][batch]['countries'][alt]
-                        d[count_type][batch]['countries'][country] += n
-
-    # remove any given stopwords
-    if stopwords is not None:
-        for count_type in d:
-            for batch in LEXISNEXIS.batches:
-                for stopword in stopwords:
-                    del d[count_type][batch]['lemma'][stopword]
-
-    return d
-
-
-def load_lexisnexis_data(add_stats=True):
+    from src.count_table import CountTable
+
+    table = CountTable.cached(merge_entries=merge_entries)
+    if as_table:
+        return table
+
+    # the vocabulary is only needed to look up the stopwords or the strings
+    vocabulary = None
+    needed = stopwords or as_strings
+    if needed and (PATHS.results / FILENAMES.vocabulary).exists():
+        from src.vocabulary import Vocabulary
+        vocabulary = Vocabulary.load()
+
+    return table.to_dict(
+        stopwords=stopwords,
+        vocabulary=vocabulary,
+        as_strings=as_strings,
+    )
+
+
+def load_lexisnexis_data(
+    add_stats=True,
+    columns=None,
+    sources=None,
+    start=None,
+    end=None,
+    lazy=False,
+):
     """
     Load all lexisnexis data into a single `DataFrame`.
     Skips any files starting with '_'.
 
+    Optional key-word arguments
+    ===========================
+    :param add_stats: `bool`, default=True
+        Join the nlp statistics (FILENAMES.nlp_statistics).
+    :param columns: `list`, default None
+        Columns (of the articles and the statistics) to load, all if None.
+    :param sources: `str` or `list`, default None
+        Only load the articles of these sources.
+    :param start: date, default None
+        Only load the articles published on or after `start`.
+    :param end: date, default None
+        Only load the articles published on or before `end`.
+    :param lazy: `bool`, default=False
+        Return an `ArticleStore` instead, which loads columns and single
+        articles (`get_article`) on request.
+
     Returns
     =======
-    :load_lexisnexis_data: `DataFrame`
+    :load_lexisnexis_data: `DataFrame` or `ArticleStore`
     """
 
-    files = PATHS.data_int.glob('[!_]*.pkl')
-    dfs = [pd.read_pickle(f) for f in files]
-    df = pd.concat(dfs)
-    df = df.set_index('id')
+    from src.article_store import ArticleStore
+
+    store = ArticleStore()
+    if lazy:
+        return store
+    df = store.frame(columns=columns, sources=sources, start=start, end=end)
     if add_stats:
         stats_file = PATHS.results / FILENAMES.nlp_statistics
-        df = df.join(pd.read_pickle(stats_file).set_index('id'))
+        stats = pd.read_pickle(stats_file).set_index('id')
+        if columns is not None:
+            stats = stats[[col for col in stats.columns if col in columns]]
+        df = df.join(stats)
     return df
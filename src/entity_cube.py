@@ -0,0 +1,245 @@
+"""
+This module builds and queries the entity cube: the number of articles and
+the number of mentions of every entity per source, section and publication
+day:
+
+    (label, entity, source, section, day) -> (articles, frequency)
+
+The cube is built once while counting the entities in 03_spacify.py and
+stored (gzipped, with categorical dimensions) as FILENAMES.entity_cube.
+Questions like 'mentions of Rusland per week per newspaper' can then be
+answered without loading the Docs:
+
+    cube = EntityCube.load()
+    cube.series('week', entities='Rusland', by='source')
+
+Periods are 'day', 'week', 'month' or 'year', and each period is labelled by
+its first day.
+"""
+
+
+# third party
+import numpy as np
+import pandas as pd
+
+# local
+from src.config import PATHS, FILENAMES
+
+
+DIMENSIONS = ['label', 'entity', 'source', 'section', 'day']
+MEASURES = ['articles', 'frequency']
+PERIODS = {'day': 'D', 'week': 'W', 'month': 'M', 'year': 'Y'}
+
+
+class CubeBuilder():
+    """
+    CubeBuilder
+    ===========
+    Collect the entity counts per document and build the `EntityCube`.
+
+    Attributes
+    ==========
+    meta: `DataFrame` indexed by document id with the columns 'source',
+          'section' and 'publication_date'
+
+    Methods
+    =======
+    add: Add the entity counts of a document
+    build: Aggregate the counts into an `EntityCube`
+    """
+
+    def __init__(self, meta):
+        self.meta = meta[['source', 'section', 'publication_date']]
+        self._ids = list()
+        self._labels = list()
+        self._entities = list()
+        self._counts = list()
+
+    def add(self, doc_id, counters):
+        """
+        Add the entity counts of a document, eg as returned by
+        `attribute_counter` (the 'lemma' counts are skipped).
+        """
+
+        for label, counter in counters.items():
+            if label == 'lemma':
+                continue
+            for entity, n in counter.items():
+                self._ids.append(doc_id)
+                self._labels.append(label)
+                self._entities.append(entity)
+                self._counts.append(n)
+        return None
+
+    def build(self, vocabulary=None):
+        """
+        Return the `EntityCube`. Pass the `Vocabulary` if the entities were
+        counted by hash id, the cube holds the strings.
+        """
+
+        entities = pd.Categorical(self._entities)
+        if vocabulary is not None:
+            entities = entities.rename_categories(
+                [vocabulary.strings.get(k, k) for k in entities.categories]
+            )
+        df = pd.DataFrame({
+            'id': self._ids,
+            'label': pd.Categorical(self._labels),
+            'entity': entities,
+            'frequency': np.array(self._counts, dtype='int32'),
+        })
+        meta = self.meta.reindex(df['id'].values)
+        df['source'] = pd.Categorical(meta['source'].values)
+        df['section'] = pd.Categorical(meta['section'].values)
+        df['day'] = pd.to_datetime(meta['publication_date'].values).normalize()
+        df = (
+            df.groupby(DIMENSIONS, observed=True, dropna=False)
+            .agg(
+                articles=('frequency', 'size'),
+                frequency=('frequency', 'sum'),
+            )
+            .astype('int32')
+            .reset_index()
+        )
+        return EntityCube(df)
+
+
+class EntityCube():
+    """
+    EntityCube
+    ==========
+    Aggregated entity counts per (label, entity, source, section, day).
+
+    Attributes
+    ==========
+    data: `DataFrame` with the dimensions and the measures ('articles',
+          'frequency') as columns
+
+    Methods
+    =======
+    load: Load a stored cube (classmethod)
+    save: Store the cube
+    select: Return the cube sliced on one or more dimensions
+    rollup: Aggregate the cube to a period and the given dimensions
+    series: Return a time series per group as a wide `DataFrame`
+    """
+
+    def __init__(self, data):
+        self.data = data
+
+    def __len__(self):
+        return len(self.data)
+
+    @classmethod
+    def load(cls, path=PATHS.results / FILENAMES.entity_cube):
+        return cls(pd.read_pickle(path))
+
+    def save(self, path=PATHS.results / FILENAMES.entity_cube):
+        self.data.to_pickle(path)
+        return None
+
+    def select(
+        self,
+        labels=None,
+        entities=None,
+        sources=None,
+        sections=None,
+        start=None,
+        end=None,
+    ):
+        """
+        Return the cube sliced on labels, entities, sources and sections
+        (single values or lists) and on days from `start` up to and including
+        `end`.
+
+        Returns
+        =======
+        :select: `EntityCube`
+        """
+
+        mask = np.ones(len(self.data), dtype=bool)
+        for col, values in [
+            ('label', labels),
+            ('entity', entities),
+            ('source', sources),
+            ('section', sections),
+        ]:
+            if values is None:
+                continue
+            if isinstance(values, str):
+                values = [values]
+            mask &= self.data[col].isin(values).values
+        if start is not None:
+            mask &= (self.data['day'] >= pd.Timestamp(start)).values
+        if end is not None:
+            mask &= (self.data['day'] <= pd.Timestamp(end)).values
+        return EntityCube(self.data.loc[mask])
+
+    def rollup(self, period='day', by=None, **selection):
+        """
+        Aggregate the measures per period and the dimensions in `by`.
+
+        Parameters
+        ==========
+        :param period: `str`, default='day'
+            'day', 'week', 'month', 'year' or None (all days together).
+
+        Optional key-word arguments
+        ===========================
+        :param by: `str` or `list`, default None
+            Dimensions to keep, eg 'source' or ['label', 'entity'].
+        :param **selection:
+            Passed to `select`, eg entities='Rusland'.
+
+        Returns
+        =======
+        :rollup: `DataFrame`
+            Column 'day' (first day of the period) if `period` is given,
+            the dimensions in `by` and the measures.
+        """
+
+        df = self.select(**selection).data if selection else self.data
+        by = [by] if isinstance(by, str) else list(by or [])
+        keys = list(by)
+        if period is not None:
+            days = df['day'].dt.to_period(PERIODS[period]).dt.start_time
+            df = df.assign(day=days)
+            keys = ['day'] + keys
+        if not keys:
+            return df[MEASURES].sum().to_frame().T
+        return (
+            df.groupby(keys, observed=True)[MEASURES]
+            .sum()
+            .reset_index()
+        )
+
+    def series(self, period='week', by='source', value='articles', **selection):
+        """
+        Return the time series of `value` per period, with a column per
+        combination of the dimensions in `by`. Periods without counts are 0.
+
+        Returns
+        =======
+        :series: `DataFrame`
+        """
+
+        df = self.rollup(period, by=by, **selection)
+        by = [by] if isinstance(by, str) else list(by or [])
+        if by:
+            wide = df.pivot_table(
+                index='day',
+                columns=by,
+                values=value,
+                aggfunc='sum',
+                fill_value=0,
+                observed=True,
+            )
+        else:
+            wide = df.set_index('day')[[value]]
+        if len(wide):
+            days = pd.period_range(
+                wide.index.min(), wide.index.max(), freq=PERIODS[period]
+            ).start_time
+            wide = wide.reindex(days, fill_value=0)
+            wide.index.name = 'day'
+        return wide
@@ -1,15 +1,14 @@
 # standard library
 import json
 import re
-import requests
-from collections import namedtuple
+from collections import defaultdict, namedtuple
 from pathlib import Path
 
 # third party
 import pandas as pd
-from bs4 import BeautifulSoup
 
 # local
+from src import profiling
 from src.config import PATHS, FILENAMES, PROJECT
 from src.utils import download_from_url
 
@@ -45,9 +44,23 @@ def load_geonames(
     if path.exists():
         return pd.read_pickle(path)
 
-    # BUILD GEONAMES
+    df = build_geonames(language, alts_json, translations)
+    df.to_pickle(path)
+    return df
+
+
+@profiling.stage('build_geonames')
+def build_geonames(language, alts_json, translations):
+    """
+    Build the geonames table from the tables downloaded by `get_dataset`.
+    See `load_geonames`.
+    """
+
     path_geonames = PATHS.resources / 'geonames'
-    dfs = {i.stem[3:]:pd.read_pickle(i) for i in path_geonames.glob('*.pkl')}
+    with profiling.timer('build_geonames.read'):
+        dfs = {
+            i.stem[3:]:pd.read_pickle(i) for i in path_geonames.glob('*.pkl')
+            }
 
     ids = set(dfs['cities'].geoname_id)
     dfs['alts'] = dfs['alts'].query("geoname_id in @ids")
@@ -81,6 +94,53 @@ def load_geonames(
             )
         )
 
+    profiling.count('build_geonames.cities', len(dfs['cities']))
+    profiling.count('build_geonames.alts', len(dfs['alts']))
+    with profiling.timer('build_geonames.merge'):
+        df = merge_geonames(dfs)
+    df['alt'] = df.alternate_name.notna()
+    df['alternate_name'] = df.alternate_name.fillna(df.name)
+
+    with profiling.timer('build_geonames.dedup'):
+        df = df.sort_values(
+            ['alternate_name', 'population'],
+            ascending=False
+            ).drop_duplicates(
+                subset='alternate_name',
+                keep='first'
+                )
+
+    if alts_json and alts_json.exists():
+        with open(alts_json.with_suffix('.json'), 'r', encoding='utf8') as f:
+            alts = json.load(f)
+
+        for key, val in alts.items():
+            for item in val:
+                row = df.query("alternate_name == @key").copy()
+                row.alternate_name = item
+                df = df.append(row, ignore_index=True)
+
+    with profiling.timer('build_geonames.regions'):
+        rest = load_rest_countries()
+        region = {rest[c]['alpha2Code']:rest[c]['region'] for c in rest}
+        subregion = {rest[c]['alpha2Code']:rest[c]['subregion'] for c in rest}
+        df.loc[df.country == 'Namibia', 'country_code'] = 'NA'
+        df['region'] = df.country_code.apply(region.get)
+        df['subregion'] = df.country_code.apply(subregion.get)
+
+    if translations and translations.exists():
+        with open(translations.with_suffix('.json'), 'r', encoding='utf8') as f:
+            d = json.load(f)
+        df = df.replace(d['region']
+                ).replace(d['subregion'])
+    return df
+
+
+def merge_geonames(dfs):
+    """
+    Merge the geonames tables into a single `DataFrame` of cities.
+    """
+
     df = (
         dfs['cities']
         .merge(dfs['alts'][
@@ -108,43 +168,57 @@ def load_geonames(
         'admin_code1', 'admin_name1', 'admin_code2', 'admin_name2',
         'population',
     ]
-    df = df[cols]
-    df['alt'] = df.alternate_name.notna()
-    df['alternate_name'] = df.alternate_name.fillna(df.name)
+    return df[cols]
 
-    df = df.sort_values(
-        ['alternate_name', 'population'],
-        ascending=False
-        ).drop_duplicates(
-            subset='alternate_name',
-            keep='first'
-            )
 
-    if alts_json and alts_json.exists():
-        with open(alts_json.with_suffix('.json'), 'r', encoding='utf8') as f:
-            alts = json.load(f)
+# Topography
+def find_homonyms(topography):
+    """
+    Find place names that occur in more than one topography.
 
-        for key, val in alts.items():
-            for item in val:
-                row = df.query("alternate_name == @key").copy()
-                row.alternate_name = item
-                df = df.append(row, ignore_index=True)
+    A multimap from name to labels is built in a single pass over all patterns.
+    Every name mapped to more than one label is a homonym. The homonyms are
+    grouped by the combination of labels they occur in.
 
-    rest = load_rest_countries()
-    region = {rest[c]['alpha2Code']:rest[c]['region'] for c in rest}
-    subregion = {rest[c]['alpha2Code']:rest[c]['subregion'] for c in rest}
-    df.loc[df.country == 'Namibia', 'country_code'] = 'NA'
-    df['region'] = df.country_code.apply(region.get)
-    df['subregion'] = df.country_code.apply(subregion.get)
+    Parameters
+    ==========
+    :param topography: `dict`
+        Mapping of labels to an iterable of place names or of patterns
+        (`dict` with a 'pattern' key) as passed to the `EntityRuler`.
 
-    if translations and translations.exists():
-        with open(translations.with_suffix('.json'), 'r', encoding='utf8') as f:
-            d = json.load(f)
-        df = df.replace(d['region']
-                ).replace(d['subregion'])
+    Returns
+    =======
+    :find_homonyms: `tuple` of `dict`, `DataFrame`
+        - `dict` mapping label combinations (joined with ', ') to a sorted
+          list of the names they share.
+        - `DataFrame` with per label the number of names, the number of names
+          shared with other labels and the percentage shared.
+    """
 
-    df.to_pickle(path)
-    return df
+    labels_per_name = defaultdict(set)
+    for label, patterns in topography.items():
+        for pattern in patterns:
+            if isinstance(pattern, dict):
+                pattern = pattern['pattern']
+            labels_per_name[pattern].add(label)
+
+    n_names = dict.fromkeys(topography, 0)
+    n_shared = dict.fromkeys(topography, 0)
+    duplicates = defaultdict(list)
+    for name, labels in labels_per_name.items():
+        shared = len(labels) > 1
+        for label in labels:
+            n_names[label] += 1
+            n_shared[label] += shared
+        if shared:
+            duplicates[', '.join(sorted(labels))].append(name)
+
+    duplicates = {key: sorted(duplicates[key]) for key in sorted(duplicates)}
+    stats = pd.DataFrame({'names': n_names, 'shared': n_shared})
+    names = stats.names.where(stats.names > 0)
+    stats['%'] = (stats.shared / names * 100).round(1)
+    stats.index.name = 'label'
+    return duplicates, stats
 
 
 # REST_countries
@@ -197,6 +271,8 @@ def load_rest_countries(
     else:
         path.parent.mkdir(parents=True, exist_ok=True)
 
+    import requests
+
     r = requests.get('https://restcountries.eu/rest/v2/all')
     r.raise_for_status()  # make sure requests raises an error if it fails
     data = r.json()
@@ -302,6 +378,8 @@ def load_cbs_dataset(table_id):
     :load_cbs: `namedtuple`
     """
 
+    import requests
+
     url = f"https://opendata.cbs.nl/ODataApi/OData/{table_id}"
     data_links = requests.get(url).json()['value']
     CBS_Data = namedtuple(
@@ -325,6 +403,9 @@ def load_capitals_from_wiki():
     :load_capitals_from_wiki: `list`
     """
 
+    import requests
+    from bs4 import BeautifulSoup
+
     url = 'https://nl.wikipedia.org/wiki/Lijst_van_hoofdsteden'
     html = requests.get(url)
     soup = BeautifulSoup(html.text, features='lxml')
@@ -359,6 +440,9 @@ def parse_wiki_place_lists(url):
     :parse_wiki_places: `list`
     """
 
+    import requests
+    from bs4 import BeautifulSoup
+
     html = requests.get(url)
     soup = BeautifulSoup(html.text, features='lxml')
     results = list()
@@ -0,0 +1,280 @@
+"""
+Spatial index over geographical coordinates.
+
+The `GeoIndex` answers proximity questions on the gazetteer, such as:
+- which places lie within X km of Y
+- what are the k nearest (populated) places to a coordinate
+
+Coordinates are projected onto the unit sphere and stored in a KD-tree.
+The straight-line (chord) distance between two points on the sphere is
+monotonic with the great-circle (haversine) distance, so k-NN and radius
+queries on the tree are exact for haversine distances.
+"""
+
+
+# third party
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+
+EARTH_RADIUS = 6371.0088 # mean earth radius in km
+
+
+def to_unit_vectors(latitude, longitude):
+    """
+    Convert latitude/longitude (in degrees) to points on the unit sphere.
+
+    Parameters
+    ==========
+    :param latitude: array-like
+    :param longitude: array-like
+
+    Returns
+    =======
+    :to_unit_vectors: `ndarray` of shape (n, 3)
+    """
+
+    lat = np.radians(np.asarray(latitude, dtype='float64'))
+    lon = np.radians(np.asarray(longitude, dtype='float64'))
+    cos_lat = np.cos(lat)
+    return np.column_stack(
+        [cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)]
+        )
+
+
+def chord_to_km(chord, radius=EARTH_RADIUS):
+    "Convert chord length on the unit sphere to great-circle distance in km."
+    chord = np.clip(chord, 0, 2)
+    return 2 * radius * np.arcsin(chord / 2)
+
+
+def km_to_chord(km, radius=EARTH_RADIUS):
+    "Convert great-circle distance in km to chord length on the unit sphere."
+    angle = np.clip(np.asarray(km, dtype='float64') / radius, 0, np.pi)
+    return 2 * np.sin(angle / 2)
+
+
+def haversine(lat1, lon1, lat2, lon2, radius=EARTH_RADIUS):
+    """
+    Return the great-circle distance in km between two (arrays of) points.
+    """
+
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * radius * np.arcsin(np.sqrt(a))
+
+
+def coordinates_from_frame(df, lat_col='latitude', lon_col='longitude'):
+    """
+    Extract latitude and longitude arrays from a `DataFrame`.
+    For a `GeoDataFrame` with point geometries, the geometry is used
+    if the coordinate columns are missing.
+    """
+
+    if lat_col in df.columns and lon_col in df.columns:
+        return df[lat_col].values, df[lon_col].values
+    if 'geometry' in df.columns:
+        geometry = df['geometry']
+        return geometry.y.values, geometry.x.values
+    raise KeyError(
+        f"DataFrame has no '{lat_col}'/'{lon_col}' columns "
+        f"and no point geometry."
+        )
+
+
+class GeoIndex():
+    """
+    GeoIndex
+    ========
+    Haversine spatial index over a table of places.
+
+    Attributes
+    ==========
+    data: `DataFrame` with the indexed places
+    latitude, longitude: coordinates of the indexed places
+    tree: `cKDTree` over the places projected on the unit sphere
+    _populated: `dict` with the places and tree per minimum population
+
+    Methods
+    =======
+    nearest: Return the k nearest places for one or more coordinates
+    populated: Return the places above a population and a tree over them
+    within: Return the places within a radius (km) of one or more coordinates
+    within_pairs: Return all pairs of indexed places within a radius (km)
+    from_geonames: Build an index from the geonames table
+    """
+
+    def __init__(self, df, lat_col='latitude', lon_col='longitude'):
+        """
+        Build the index.
+
+        Parameters
+        ==========
+        :param df: `DataFrame` or `GeoDataFrame`
+            Table of places with latitude/longitude columns or points.
+
+        Optional key-word arguments
+        ===========================
+        :param lat_col: `str`, default='latitude'
+        :param lon_col: `str`, default='longitude'
+        """
+
+        lat, lon = coordinates_from_frame(df, lat_col, lon_col)
+        mask = ~(np.isnan(lat) | np.isnan(lon))
+        self.data = df.loc[mask]
+        self.latitude = lat[mask]
+        self.longitude = lon[mask]
+        self.tree = cKDTree(to_unit_vectors(lat[mask], lon[mask]))
+        self._populated = {}
+
+    def __len__(self):
+        return len(self.data)
+
+    @classmethod
+    def from_geonames(cls, geonames=None, query=None, unique_places=True):
+        """
+        Build an index over the geonames dataset.
+
+        Optional key-word arguments
+        ===========================
+        :param geonames: `DataFrame`, default None
+            Geonames table, loaded with `load_geonames` if not given.
+        :param query: `str`, default None
+            Query to select a subset, eg a query from [MODEL] in 'config.ini'.
+        :param unique_places: `boolean`, default=True
+            Index every geoname_id once (the table holds alternate names).
+
+        Returns
+        =======
+        :from_geonames: `GeoIndex`
+        """
+
+        if geonames is None:
+            from src.geo_data import load_geonames
+            geonames = load_geonames()
+        if query:
+            geonames = geonames.query(query)
+        if unique_places:
+            geonames = geonames.drop_duplicates(subset='geoname_id')
+        return cls(geonames)
+
+    def nearest(self, latitude, longitude, k=1, min_population=None):
+        """
+        Return the k nearest places for one or more coordinates.
+
+        Parameters
+        ==========
+        :param latitude: `float` or array-like
+        :param longitude: `float` or array-like
+
+        Optional key-word arguments
+        ===========================
+        :param k: `int`, default=1
+            Number of neighbours to return per coordinate.
+        :param min_population: `int`, default None
+            Only return places with at least this population.
+
+        Returns
+        =======
+        :nearest: `DataFrame`
+            Indexed places with the columns 'query' (position of the
+            coordinate in the input), 'rank' and 'distance_km' added.
+        """
+
+        points = to_unit_vectors(
+            np.atleast_1d(latitude), np.atleast_1d(longitude)
+            )
+        data, tree = self.data, self.tree
+        if min_population is not None:
+            data, tree = self.populated(min_population)
+
+        k = min(k, len(data))
+        if k == 0:
+            return data.iloc[:0].assign(query=[], rank=[], distance_km=[])
+        dist, idx = tree.query(points, k=k)
+        dist = dist.reshape(len(points), k)
+        idx = idx.reshape(len(points), k)
+
+        result = data.iloc[idx.ravel()].copy()
+        result['query'] = np.repeat(np.arange(len(points)), k)
+        result['rank'] = np.tile(np.arange(1, k + 1), len(points))
+        result['distance_km'] = chord_to_km(dist.ravel())
+        return result
+
+    def populated(self, min_population):
+        """
+        Return the places with at least `min_population` inhabitants and a
+        `cKDTree` over them. The tree is built once per threshold.
+        """
+
+        if min_population not in self._populated:
+            mask = (self.data.population >= min_population).values
+            self._populated[min_population] = (
+                self.data.loc[mask], cKDTree(self.tree.data[mask])
+            )
+        return self._populated[min_population]
+
+    def within(self, latitude, longitude, km):
+        """
+        Return the places within `km` of one or more coordinates.
+
+        Parameters
+        ==========
+        :param latitude: `float` or array-like
+        :param longitude: `float` or array-like
+        :param km: `float`
+            Radius in km.
+
+        Returns
+        =======
+        :within: `DataFrame`
+            Indexed places with the columns 'query' (position of the
+            coordinate in the input) and 'distance_km' added.
+            Sorted by query and distance.
+        """
+
+        lat = np.atleast_1d(latitude)
+        lon = np.atleast_1d(longitude)
+        points = to_unit_vectors(lat, lon)
+        hits = self.tree.query_ball_point(points, r=km_to_chord(km))
+
+        query = np.repeat(np.arange(len(points)), [len(h) for h in hits])
+        idx = np.fromiter(
+            (i for h in hits for i in h), dtype='int64', count=len(query)
+            )
+        result = self.data.iloc[idx].copy()
+        result['query'] = query
+        result['distance_km'] = haversine(
+            lat[query], lon[query],
+            self.latitude[idx], self.longitude[idx],
+            )
+        return result.sort_values(['query', 'distance_km'])
+
+    def within_pairs(self, km):
+        """
+        Return all pairs of indexed places that lie within `km` of eachother.
+
+        Parameters
+        ==========
+        :param km: `float`
+            Radius in km.
+
+        Returns
+        =======
+        :within_pairs: `DataFrame`
+            Columns 'left' and 'right' (positions in `data`) and 'distance_km'.
+        """
+
+        pairs = self.tree.query_pairs(r=km_to_chord(km), output_type='ndarray')
+        left, right = pairs[:, 0], pairs[:, 1]
+        vectors = self.tree.data
+        dist = np.linalg.norm(vectors[left] - vectors[right], axis=1)
+        return pd.DataFrame({
+            'left': left,
+            'right': right,
+            'distance_km': chord_to_km(dist),
+        })
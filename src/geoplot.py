@@ -1,12 +1,45 @@
+"""
+This module plots (aggregated) points on a basemap.
+
+Large numbers of points are binned before plotting with `bin_points`: the
+points are assigned to square or hexagonal cells (sized by zoom level) and
+every cell is plotted as one point at the weighted centre of its points, with
+their total weight and the name of its heaviest point. Labels are placed by
+`annotate_geoplot` with a greedy layout that tries a fixed number of positions
+per label. Set its `n` to only label the top-n points, which bounds its time
+by top-n.
+"""
+
+
+# standard library
+from functools import lru_cache
+
 # third party
-import matplotlib.pyplot as plt
-from matplotlib import rcParams
-rcParams.update({
-    "font.family": "serif",  # use serif/main font for text elements
-    "text.usetex": True,     # use inline math for ticks
-    "pgf.rcfonts": False,    # don't setup fonts from rc parameters
-})
-from adjustText import adjust_text
+import numpy as np
+
+
+# label positions tried around a point: (dx, dy) in units of the label size
+LABEL_POSITIONS = [
+    (0, 0), (0.5, 0.5), (-0.5, 0.5), (0.5, -0.5), (-0.5, -0.5),
+    (0, 1), (0, -1), (1, 0), (-1, 0),
+]
+EARTH_CIRCUMFERENCE = 40075016.686  # metres, at the equator
+
+
+@lru_cache(maxsize=None)
+def setup_matplotlib():
+    """
+    Import matplotlib and set the plotting style.
+    Postponed until the first plot, so importing this module stays cheap.
+    """
+
+    from matplotlib import rcParams
+    rcParams.update({
+        "font.family": "serif",  # use serif/main font for text elements
+        "text.usetex": True,     # use inline math for ticks
+        "pgf.rcfonts": False,    # don't setup fonts from rc parameters
+    })
+    return None
 
 
 def geoplot_points(
@@ -28,12 +61,36 @@ def geoplot_points(
     legend_labelspacing=2.5,
     legend_handletextpad=1.8,
     frameon=True,
-    legend_loc='upper left'
+    legend_loc='upper left',
+    cell_size=None,
+    zoom=None,
+    hexagonal=False,
+    detail=None,
     ):
     """
     Plot points on a basemap.
+    The basemap is a `GeoDataFrame` or the name of a cached basemap (see
+    `basemaps.load_basemap`), loaded at `detail` or, by default, at the
+    coarsest level of detail that is still sharp at the width of `ax`.
+    Set `cell_size` or `zoom` to plot the points binned by `bin_points`
+    instead, with the total of `points` per cell as size.
     """
 
+    setup_matplotlib()
+    if isinstance(basemap, str):
+        from src.basemaps import choose_detail, load_basemap
+        if detail is None:
+            detail = choose_detail(ax.bbox.width)
+        basemap = load_basemap(basemap, detail=detail)
+    if cell_size is not None or zoom is not None:
+        gdf = bin_points(
+            gdf,
+            points,
+            cell_size=cell_size,
+            zoom=zoom,
+            hexagonal=hexagonal,
+        )
+        points = gdf['weight']
     basemap.plot(
         ax=ax,
         color=basemap_color,
@@ -68,17 +125,279 @@ def geoplot_points(
     return ax
 
 
-def annotate_geoplot(ax, gdf, text):
-    "Annotate names on plot."
+def point_coordinates(gdf):
+    "Return the x and y coordinates of a GeoDataFrame of points as arrays."
+    return gdf.geometry.x.to_numpy(), gdf.geometry.y.to_numpy()
+
+
+def zoom_cell_size(zoom, cells_per_tile=8, crs=None):
+    """
+    Return the cell size for `zoom`, the level of the web map tiles: at zoom
+    level z the world is 2^z tiles wide, each tile is divided in
+    `cells_per_tile` cells. The size is in the units of `crs`: degrees for a
+    geographic crs (or no crs), otherwise the width of the world at the
+    equator (as in web mercator) converted to the units of the crs.
+    """
+
+    width = 360
+    if crs is not None:
+        from pyproj import CRS
+        crs = CRS.from_user_input(crs)
+        if not crs.is_geographic:
+            metres = crs.axis_info[0].unit_conversion_factor
+            width = EARTH_CIRCUMFERENCE / metres
+    return width / (2 ** zoom * cells_per_tile)
+
+
+def hex_cells(x, y, size):
+    """
+    Return the axial coordinates (q, r) of the pointy-top hexagons of
+    circumradius `size` holding the points (x, y).
+    """
+
+    q = (np.sqrt(3) / 3 * x - y / 3) / size
+    r = (2 / 3 * y) / size
+    # round the cube coordinates (q, r, -q-r), fixing the largest error
+    rq, rr = np.round(q), np.round(r)
+    rs = np.round(-q - r)
+    dq, dr, ds = np.abs(rq - q), np.abs(rr - r), np.abs(rs + q + r)
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    rq = np.where(fix_q, -rr - rs, rq)
+    rr = np.where(fix_r, -rq - rs, rr)
+    return rq.astype('int64'), rr.astype('int64')
+
+
+def aggregate_points(x, y, weights, cell_size, hexagonal=False):
+    """
+    Bin points (x, y) with `weights` into square cells of `cell_size` or
+    hexagons of circumradius `cell_size`.
+
+    Returns
+    =======
+    :aggregate_points: `tuple`
+        - codes: the cell of every point (index into the other arrays)
+        - x, y: weighted centre of the points per cell
+        - weight: total weight per cell
+        - top: position of the heaviest point per cell
+    """
+
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    weights = np.asarray(weights, dtype='float64')
+    if hexagonal:
+        i, j = hex_cells(x, y, cell_size)
+    else:
+        i = np.floor(x / cell_size).astype('int64')
+        j = np.floor(y / cell_size).astype('int64')
+    if not len(i):
+        empty, none = np.empty(0), np.empty(0, dtype='int64')
+        return none, empty, empty, empty, none
+    # one integer key per cell
+    i, j = i - i.min(), j - j.min()
+    _, codes = np.unique(i * (j.max() + 1) + j, return_inverse=True)
+    n = codes.max() + 1
+
+    weight = np.bincount(codes, weights=weights, minlength=n)
+    # unweighted centre for cells with a total weight of 0
+    count = np.bincount(codes, minlength=n)
+    safe = np.where(weight > 0, weight, 1)
+    cx = np.where(
+        weight > 0,
+        np.bincount(codes, weights=x * weights, minlength=n) / safe,
+        np.bincount(codes, weights=x, minlength=n) / np.maximum(count, 1),
+    )
+    cy = np.where(
+        weight > 0,
+        np.bincount(codes, weights=y * weights, minlength=n) / safe,
+        np.bincount(codes, weights=y, minlength=n) / np.maximum(count, 1),
+    )
+
+    # heaviest point per cell: last of each cell after sorting on weight
+    order = np.lexsort([weights, codes])
+    last = np.r_[codes[order][1:] != codes[order][:-1], True]
+    top = order[last]
+    return codes, cx, cy, weight, top
+
+
+def bin_points(
+    gdf,
+    weights,
+    cell_size=None,
+    zoom=None,
+    hexagonal=False,
+    text=None,
+    ):
+    """
+    Aggregate a GeoDataFrame of points into cells.
+
+    Parameters
+    ==========
+    :param gdf: `GeoDataFrame`
+        Points to aggregate.
+    :param weights: `Series` or array
+        Weight of every point, eg the number of articles.
+
+    Optional key-word arguments
+    ===========================
+    :param cell_size: `float`, default None
+        Size of the cells in the units of the crs.
+    :param zoom: `int`, default None
+        Zoom level to derive the cell size from (see `zoom_cell_size`, in
+        the units of the crs of `gdf`), used if no `cell_size` is given.
+    :param hexagonal: `bool`, default=False
+        Use hexagonal instead of square cells.
+    :param text: `str`, default None
+        Column with the names of the points, every cell gets the name of its
+        heaviest point.
+
+    Returns
+    =======
+    :bin_points: `GeoDataFrame`
+        Columns 'weight', 'n_points', 'geometry' and `text`.
+    """
+
+    import geopandas
+
+    if cell_size is None:
+        cell_size = zoom_cell_size(zoom, crs=gdf.crs)
+    x, y = point_coordinates(gdf)
+    codes, cx, cy, weight, top = aggregate_points(
+        x, y, weights, cell_size, hexagonal=hexagonal
+    )
+    data = {
+        'weight': weight,
+        'n_points': np.bincount(codes, minlength=len(weight)),
+    }
+    if text is not None:
+        data[text] = gdf[text].to_numpy()[top]
+    return geopandas.GeoDataFrame(
+        data,
+        geometry=geopandas.points_from_xy(cx, cy),
+        crs=gdf.crs,
+    )
+
+
+def top_n(weights, n):
+    """
+    Return the positions of the n largest weights, largest first. All
+    positions if `n` is None.
+    """
+
+    weights = np.asarray(weights, dtype='float64')
+    if n is None or n >= len(weights):
+        return np.argsort(-weights, kind='stable')
+    idx = np.argpartition(-weights, n - 1)[:n]
+    return idx[np.argsort(-weights[idx], kind='stable')]
+
+
+def place_labels(xy, sizes, positions=LABEL_POSITIONS):
+    """
+    Greedy label layout: place every label (in order) at the first position
+    around its point where its box does not overlap the boxes of the labels
+    already placed or any of the points. Labels without such a position are
+    dropped. Runs in O(labels^2 * positions), independent of the data size.
+
+    Parameters
+    ==========
+    :param xy: `ndarray`
+        Anchor points of the labels in display coordinates, shape (n, 2).
+    :param sizes: `ndarray`
+        Width and height of the labels in display coordinates, shape (n, 2).
+
+    Returns
+    =======
+    :place_labels: `ndarray`
+        Offset (dx, dy) of every label centre from its point, NaN if the
+        label was dropped.
+    """
+
+    xy = np.asarray(xy, dtype='float64')
+    sizes = np.asarray(sizes, dtype='float64')
+    n = len(xy)
+    offsets = np.full((n, 2), np.nan)
+    # placed boxes as (x0, y0, x1, y1)
+    boxes = np.empty((n, 4))
+    placed = 0
+    for i in range(n):
+        half = sizes[i] / 2
+        pad = sizes[i, 1] / 2
+        for dx, dy in positions:
+            offset = np.array([dx, dy]) * (sizes[i] + pad)
+            centre = xy[i] + offset
+            box = np.r_[centre - half, centre + half]
+            others = boxes[:placed]
+            overlap = (
+                (box[0] < others[:, 2]) & (others[:, 0] < box[2])
+                & (box[1] < others[:, 3]) & (others[:, 1] < box[3])
+            )
+            points = (
+                (box[0] < xy[:, 0]) & (xy[:, 0] < box[2])
+                & (box[1] < xy[:, 1]) & (xy[:, 1] < box[3])
+            )
+            points[i] = False
+            if not overlap.any() and not points.any():
+                offsets[i] = offset
+                boxes[placed] = box
+                placed += 1
+                break
+    return offsets
+
+
+def annotate_geoplot(
+    ax,
+    gdf,
+    text,
+    weights=None,
+    n=None,
+    fontsize=9,
+    adjust=False,
+    ):
+    """
+    Annotate names on plot and return the labels (`Annotation` objects).
+    The points are labelled in order of their `weights`, and only where the
+    label fits (`place_labels`). Set `n` to only label the `n` points with
+    the largest `weights`, all points are labelled if `n` is None. Without
+    `weights` the points are ranked by their number of points ('n_points' of
+    `bin_points`), or kept in order if `gdf` is not binned.
+    Set `adjust` to True to fine-tune the labels with `adjust_text`.
+    """
+
+    setup_matplotlib()
+
+    x, y = point_coordinates(gdf)
+    names = gdf[text].to_numpy()
+    if weights is None:
+        if 'n_points' in gdf:
+            weights = gdf['n_points']
+        else:
+            weights = np.zeros(len(gdf))
+    idx = top_n(weights, n)
+    x, y, names = x[idx], y[idx], names[idx]
+
+    # label sizes in points, estimated from the font size
+    dpi = ax.figure.dpi
+    sizes = np.column_stack([
+        np.array([len(str(name)) for name in names]) * fontsize * 0.6,
+        np.full(len(names), fontsize * 1.2),
+    ]) * dpi / 72
+    xy = ax.transData.transform(np.column_stack([x, y]))
+    offsets = place_labels(xy, sizes) * 72 / dpi
 
     texts = [
-        ax.text(
-            row['geometry'].x,
-            row['geometry'].y,
-            row[text],
+        ax.annotate(
+            name,
+            xy=(x[i], y[i]),
+            xytext=offsets[i],
+            textcoords='offset points',
             ha='center',
             va='center',
-            fontsize=9,
-            ) for _, row in gdf.iterrows()
+            fontsize=fontsize,
+            )
+        for i, name in enumerate(names)
+        if not np.isnan(offsets[i, 0])
         ]
-    return adjust_text(texts, ax=ax)
+    if adjust:
+        from adjustText import adjust_text
+        adjust_text(texts, ax=ax)
+    return texts
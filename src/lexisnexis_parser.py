@@ -1,5 +1,7 @@
 # standard library
+import re
 import zipfile
+from functools import lru_cache
 from pathlib import Path
 from unicodedata import normalize
 
@@ -8,10 +10,44 @@ import pandas as pd
 from tqdm import tqdm
 import xml.etree.ElementTree as ET
 
+# local
+from src import profiling
+
 
 URI = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
 BASE_URL = 'https://advance.lexis.com/api/document'
 
+# month and weekday names used in the LexisNexis dates (locale independent)
+MONTH_NAMES = {
+    'nl': [
+        'januari', 'februari', 'maart', 'april', 'mei', 'juni', 'juli',
+        'augustus', 'september', 'oktober', 'november', 'december',
+    ],
+    'en': [
+        'january', 'february', 'march', 'april', 'may', 'june', 'july',
+        'august', 'september', 'october', 'november', 'december',
+    ],
+}
+WEEKDAY_NAMES = {
+    'nl': [
+        'maandag', 'dinsdag', 'woensdag', 'donderdag',
+        'vrijdag', 'zaterdag', 'zondag',
+    ],
+    'en': [
+        'monday', 'tuesday', 'wednesday', 'thursday',
+        'friday', 'saturday', 'sunday',
+    ],
+}
+MONTHS = {'mrt': 3, 'sept': 9}
+for names in MONTH_NAMES.values():
+    for i, name in enumerate(names, start=1):
+        MONTHS[name] = i
+        MONTHS[name[:3]] = i
+WEEKDAYS = {
+    name: i for names in WEEKDAY_NAMES.values() for i, name in enumerate(names)
+}
+RE_DATE_TOKEN = re.compile(r'\d+|[^\W\d_]+')
+
 
 def docxs_to_df(path):
     """
@@ -33,18 +69,22 @@ def docxs_to_df(path):
     if isinstance(path, str):
         path = Path(path)
 
-    n_articles = len(list(path.glob('*.docx')))
-    articles = path.glob('*.docx')
-    data = []
-    for a in tqdm(articles, total=n_articles):
-        try:
-            row = docx_to_dict(a)
-            data.append(row)
-        except zipfile.BadZipFile:
-            print('Bad docx (did not parse): ', a)
-
-    df = pd.DataFrame(data)
-    df.columns = [format_colname(column) for column in df.columns]
+    with profiling.stage('docxs_to_df'):
+        n_articles = len(list(path.glob('*.docx')))
+        articles = path.glob('*.docx')
+        data = []
+        for a in tqdm(articles, total=n_articles):
+            try:
+                row = docx_to_dict(a)
+                data.append(row)
+                profiling.count('docx.parsed')
+            except zipfile.BadZipFile:
+                print('Bad docx (did not parse): ', a)
+                profiling.count('docx.bad_zip')
+
+        with profiling.timer('docxs_to_df.frame'):
+            df = pd.DataFrame(data)
+        df.columns = [format_colname(column) for column in df.columns]
 
     return df
 
@@ -80,20 +120,24 @@ def docx_to_dict(filename):
     :docx_to_dict: `dict`.
     """
 
-    with zipfile.ZipFile(filename, 'r') as docx:
-        with docx.open('word/document.xml') as xml:
-            xml_doc = xml.read()
-        with docx.open('word/_rels/document.xml.rels') as xml:
-            xml_rel = xml.read()
+    with profiling.timer('docx.unzip'):
+        with zipfile.ZipFile(filename, 'r') as docx:
+            with docx.open('word/document.xml') as xml:
+                xml_doc = xml.read()
+            with docx.open('word/_rels/document.xml.rels') as xml:
+                xml_rel = xml.read()
+
+    with profiling.timer('docx.xml_parse'):
+        url = get_url(xml_rel)
+        document = xml_to_text(xml_doc)
 
     doc = {}
     doc['folder'] = str(filename.parent)
     doc['filename'] = filename.name
-    doc['url'] = get_url(xml_rel)
+    doc['url'] = url
     doc['body'] = []
 
     in_body = False
-    document = xml_to_text(xml_doc)
     for idx, paragraph in enumerate(document):
 
         if idx < 4:
@@ -209,14 +253,15 @@ def standardize_df(
     ## Format
     This function creates a df containing the following columns:
 
-        01. id                      09. section
-        02. source                  10. page
-        03. title                   11. length
-        04. body (as list)          12. byline
-        05. body (filtered)         13. copyright
-        06. body (as string)        14. folder
-        07. publication date        15. filename
-        08. load date               16. url
+        01. id                      10. sub-section
+        02. source                  11. page
+        03. title                   12. length
+        04. body (as list)          13. byline
+        05. body (filtered)         14. copyright
+        06. body (as string)        15. folder
+        07. publication date        16. filename
+        08. load date               17. url
+        09. section
 
     Any columns missing in the input, will be added to the ouptut (`nan`).
     This format may be replaced completely (by passing `cols`).
@@ -248,38 +293,72 @@ def standardize_df(
             'id', 'source', 'title',
             'body', 'body_', 'body_str',
             'publication_date', 'load_date',
-            'section', 'page', 'length',
+            'section', 'sub_section', 'page', 'length',
             'byline', 'copyright',
             'folder', 'filename', 'url',
         ]
+    cols = list(cols)
     if extend:
         cols.extend(extend)
     if not 'id' in cols:
         cols.insert(0, 'id')
 
-    df = df.sort_values(sort_on).reset_index(drop=True)
+    # sort on a view of the sort columns only
+    keys = [sort_on] if isinstance(sort_on, str) else list(sort_on)
+    order = df[keys].reset_index(drop=True).sort_values(keys).index
+
+    # select the available columns in the sorted order (the only full copy)
+    present = [col for col in cols if col in df.columns and col != 'id']
+    output = df.iloc[order.values, df.columns.get_indexer(present)]
+    output.index = pd.RangeIndex(len(output))
+
+    # add id
+    prefix = f"{codify_batch(batch)}_"
+    ids = prefix + output.index.astype(str).str.zfill(4)
 
-    # prepare output df with expected columns
+    # add the missing columns in place
     # even if columns are missing in the input df
     # they will be in the output df
-    output = pd.DataFrame(columns=cols, index=df.index)
-    date_cols = [col for col in output.columns if 'date' in col]
-    if date_cols:
-        output[date_cols] = output[date_cols].astype('datetime64[ns]')
+    for loc, col in enumerate(cols):
+        if col == 'id':
+            output.insert(loc, col, ids)
+        elif col not in present:
+            dtype = 'datetime64[ns]' if 'date' in col else 'object'
+            values = pd.Series(None, index=output.index, dtype=dtype)
+            output.insert(loc, col, values)
+    return output
 
-    # add id
-    df['id'] = df.apply(
-        lambda row: f"{codify_batch(batch)}_{row.name:04d}", axis=1
-    )
 
-    output.update(df)
+@lru_cache(maxsize=None)
+def parse_date(string):
+    """
+    Parse a Dutch or English date string, eg '4 januari 2017 woensdag' or
+    'January 4, 2017 Wednesday', without depending on the locale.
+    The day (1-2 digits), month name (or abbreviation) and year (4 digits)
+    may be in any order; weekdays and other words are ignored.
 
-    # set columns to their original dtypes
-    dtypes = df.dtypes.to_dict()
-    output = output.astype(
-        {col:dtypes[col] for col in dtypes if col in output.columns}
-    )
-    return output
+    Returns
+    =======
+    :parse_date: `Timestamp` or `NaT` if no valid date is found
+    """
+
+    day = month = year = None
+    for token in RE_DATE_TOKEN.findall(string.lower()):
+        if token in WEEKDAYS:
+            continue
+        if token.isdigit():
+            if len(token) == 4 and year is None:
+                year = int(token)
+            elif len(token) <= 2 and day is None:
+                day = int(token)
+        elif token in MONTHS and month is None:
+            month = MONTHS[token]
+    if None in (day, month, year):
+        return pd.NaT
+    try:
+        return pd.Timestamp(year, month, day)
+    except ValueError:
+        return pd.NaT
 
 
 def parse_datestring(
@@ -295,6 +374,10 @@ def parse_datestring(
     Use 'split_on' to split the string from the right to remove it.
     If more splits are needed, set 'nsplits' to the number of splits necessary.
 
+    Without `format` the dates are parsed with `parse_date`, which knows the
+    Dutch and English month and weekday names (no locale needed). Every
+    unique string is parsed only once. Unparsable dates become `NaT`.
+
     Arguments
     =========
     :param s: `Series`
@@ -303,6 +386,7 @@ def parse_datestring(
     ===========================
     :param format: `str`, default None
         strftime to parse time, eg '%d/%m/%Y'.
+        Note that '%B' and '%A' depend on the locale.
     :param split_on: `str`, default ';'
         String to split on.
     :param nsplits: `int`, default 1
@@ -314,20 +398,45 @@ def parse_datestring(
     :parse_datestring: `Series`
     """
 
+    if format:
+        if split_on:
+            s = s.str.rsplit(split_on, n=nsplits).str[0]
+        return pd.to_datetime(s, format=format)
+
+    codes, uniques = pd.factorize(s)
+    uniques = pd.Series(uniques, dtype='object')
     if split_on:
-        s = s.str.rsplit(split_on, n=nsplits).str[0]
-    s = pd.to_datetime(s, format=format)
-    return s
+        uniques = uniques.str.rsplit(split_on, n=nsplits).str[0]
+    dates = pd.DatetimeIndex(
+        [parse_date(value) for value in uniques]
+        + [pd.NaT], # for missing values (code -1)
+        dtype='datetime64[ns]',
+    )
+    return pd.Series(dates.take(codes), index=s.index, name=s.name)
+
+
+def section_regex(split_on=';'):
+    "Return the regex splitting 'SECTION; [SUB-SECTION;] PAGE NO' in one pass."
+    sep = re.escape(split_on)
+    return re.compile(
+        rf'^\s*(?P<section>[^{sep}]*?(?:\s*{sep}\s*(?P<sub_section>.*?))??)\s*'
+        rf'(?:{sep}[^{sep}\d]*(?P<page>\d+)[^{sep}]*)?$'
+    )
 
 
 def split_page_from_section(df, split_on=';'):
     """
-    Separate section and page number in the LexisNexis 'section' field.
-    Assumes something like the following format:
+    Separate section, sub-section and page number in the LexisNexis 'section'
+    field. Assumes something like the following format:
 
         'SECTION; [SUB-SECTION;] PAGE NO'
 
-    Splits string once from the right.
+    The fields are extracted with a single regex (see `section_regex`), which
+    is applied once per unique value. 'section' keeps everything before the
+    page number (including the sub-section), so it can be used to tell the
+    articles apart (eg in `drop_duplicates`) and in the queries.
+    'sub_section' only holds the sub-section. Both are lower cased.
+    Missing fields are `nan`.
     String to split on can be modified via the `split_on` parameter.
 
     Parameters
@@ -344,13 +453,20 @@ def split_page_from_section(df, split_on=';'):
     :split_section_page: `DataFrame`
     """
 
-    colnames = {0: 'section', 1: 'page'}
-    section_page = df.section.str.rsplit(
-        split_on, n=1, expand=True
-    ).rename(columns=colnames)
-    df = df.drop('section', axis=1).join(section_page)
-    df['section'] = df['section'].str.lower().str.replace('| ', '', regex=False)
-    df['page'] = df['page'].str.split('. ').str[1].astype('int')
+    codes, uniques = pd.factorize(df.section)
+    parts = pd.Series(uniques, dtype='object').str.extract(
+        section_regex(split_on)
+    )
+    for col in ['section', 'sub_section']:
+        s = parts[col].str.lower().str.replace('| ', '', regex=False)
+        parts[col] = s.mask(s == '')
+    parts['page'] = pd.to_numeric(parts['page'])
+    parts = parts.reindex(codes)
+    parts.index = df.index
+
+    df = df.drop('section', axis=1).join(parts)
+    if df['page'].notna().all():
+        df['page'] = df['page'].astype('int')
     return df
 
 
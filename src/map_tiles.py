@@ -0,0 +1,254 @@
+"""
+This module exports the resolved toponyms as a pyramid of GeoJSON tiles for
+the interactive map (docs/map_tiles.html).
+
+The tiles follow the web map (slippy map) scheme: at zoom level z the world
+is divided in 2^z x 2^z tiles, stored as '{z}/{x}/{y}.geojson'. Every tile
+holds the toponyms within it, aggregated per source into a grid of
+`cells_per_tile` x `cells_per_tile` cells. Every cell is one point at the
+weighted centre of its toponyms with:
+
+- source
+- name: the most frequent toponym in the cell
+- frequency, articles: summed over the toponyms in the cell
+- toponyms: number of toponyms in the cell
+
+At `max_zoom` the toponyms are not aggregated. The map only requests the
+tiles in view, so the data loaded per view is bounded by the number of tiles
+on screen and the number of cells per tile, not by the size of the corpus.
+'index.json' holds the zoom levels, the sources and the number of tiles per
+zoom level; the map skips tiles that do not exist.
+"""
+
+
+# standard library
+import json
+import shutil
+
+# third party
+import numpy as np
+import pandas as pd
+
+# local
+from src.config import PATH_LIB
+
+
+MAX_LATITUDE = 85.0511287798  # limit of the web mercator projection
+PATH_TILES = PATH_LIB / 'docs' / 'tiles'  # read by docs/map_tiles.html
+
+
+def tile_coordinates(latitude, longitude, zoom):
+    """
+    Return the (fractional) web mercator tile coordinates of points at
+    `zoom`, the integer part being the tile and the fraction the position
+    within the tile.
+
+    Returns
+    =======
+    :tile_coordinates: `tuple` of two `ndarray`
+    """
+
+    lat = np.radians(np.clip(latitude, -MAX_LATITUDE, MAX_LATITUDE))
+    lon = np.asarray(longitude, dtype='float64')
+    n = 2 ** zoom
+    x = (lon + 180) / 360 * n
+    y = (1 - np.arcsinh(np.tan(lat)) / np.pi) / 2 * n
+    return np.clip(x, 0, n - 1e-9), np.clip(y, 0, n - 1e-9)
+
+
+def toponym_coordinates(geonames=None, countries=None, queries=None):
+    """
+    Return the coordinates of the toponyms as `DataFrame` indexed by
+    category and name with the columns 'latitude' and 'longitude'.
+
+    Places are looked up in the geonames selected by the query of their
+    category (the [MODEL] queries, as in 01_create_model.py), by name and
+    alternate name. The most populous place wins within a category, so a
+    homonym gets the coordinates of the place the model labelled it for.
+    Countries are looked up in the rest countries data.
+    """
+
+    if geonames is None:
+        from src.geo_data import load_geonames
+        geonames = load_geonames()
+    if countries is None:
+        from src.geo_data import load_rest_countries
+        countries = load_rest_countries()
+    if queries is None:
+        from src.config import MODEL
+        queries = {label: getattr(MODEL, label) for label in MODEL._fields}
+
+    cols = ['latitude', 'longitude', 'population']
+    categories = dict()
+    for category, query in queries.items():
+        selection = geonames.query(query)
+        places = pd.concat([
+            selection[['name'] + cols],
+            selection[['alternate_name'] + cols].rename(
+                columns={'alternate_name': 'name'}
+            ),
+        ])
+        categories[category] = (
+            places
+            .dropna(subset=['name'])
+            .sort_values('population', ascending=False)
+            .drop_duplicates(subset='name')
+            .set_index('name')[['latitude', 'longitude']]
+        )
+    categories['countries'] = pd.DataFrame.from_dict(
+        {
+            name: country['latlng'][:2]
+            for name, country in countries.items()
+            if len(country.get('latlng') or []) >= 2
+        },
+        orient='index',
+        columns=['latitude', 'longitude'],
+    )
+    return pd.concat(categories, names=['category', 'name'])
+
+
+def toponym_points(results, coordinates):
+    """
+    Return the toponym statistics (see `datasets.load_results`) as one row
+    per (category, toponym, source) with the columns 'category', 'name',
+    'source', 'frequency', 'articles', 'latitude' and 'longitude'.
+    Toponyms without coordinates (in their category, see
+    `toponym_coordinates`) are dropped.
+    """
+
+    df = (
+        results
+        .stack(level=0)
+        .dropna(how='all')
+        .fillna(0)
+        .rename_axis(['category', 'name', 'source'])
+        .reset_index()
+    )
+    df = df.join(coordinates, on=['category', 'name'], how='inner')
+    return df.loc[df[['frequency', 'articles']].sum(axis=1) > 0]
+
+
+def aggregate_tiles(df, zoom, cells_per_tile=8, aggregate=True):
+    """
+    Return the toponyms in `df` (see `toponym_points`) aggregated per source
+    and cell of the tiles at `zoom`, with the tile ('x', 'y') of every cell.
+    """
+
+    tx, ty = tile_coordinates(df['latitude'], df['longitude'], zoom)
+    df = df.assign(
+        x=tx.astype('int64'),
+        y=ty.astype('int64'),
+        cx=(tx * cells_per_tile).astype('int64'),
+        cy=(ty * cells_per_tile).astype('int64'),
+    )
+    if not aggregate:
+        return df.assign(toponyms=1)
+
+    keys = ['source', 'x', 'y', 'cx', 'cy']
+    weight = df['frequency'].clip(lower=1)
+    df = df.assign(
+        weight=weight,
+        wlat=df['latitude'] * weight,
+        wlon=df['longitude'] * weight,
+    )
+    groups = df.groupby(keys, sort=False, observed=True)
+    cells = groups.agg(
+        frequency=('frequency', 'sum'),
+        articles=('articles', 'sum'),
+        toponyms=('name', 'size'),
+        weight=('weight', 'sum'),
+        wlat=('wlat', 'sum'),
+        wlon=('wlon', 'sum'),
+    )
+    # the name of the most frequent toponym per cell
+    top = df.loc[groups['frequency'].idxmax(), keys + ['name']]
+    cells = cells.join(top.set_index(keys))
+    cells['latitude'] = cells.pop('wlat') / cells['weight']
+    cells['longitude'] = cells.pop('wlon') / cells['weight']
+    return cells.drop(columns='weight').reset_index()
+
+
+def to_features(df):
+    "Return the rows of `df` as GeoJSON point features."
+    properties = ['source', 'name', 'frequency', 'articles', 'toponyms']
+    records = df[properties].to_dict(orient='records')
+    coordinates = df[['longitude', 'latitude']].round(5).values.tolist()
+    return [
+        {
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': xy},
+            'properties': {
+                key: value.item() if hasattr(value, 'item') else value
+                for key, value in record.items()
+            },
+        }
+        for xy, record in zip(coordinates, records)
+    ]
+
+
+def export_tiles(
+    df,
+    path=PATH_TILES,
+    min_zoom=0,
+    max_zoom=8,
+    cells_per_tile=8,
+):
+    """
+    Export the toponyms as a pyramid of GeoJSON tiles.
+
+    Parameters
+    ==========
+    :param df: `DataFrame`
+        Toponyms as returned by `toponym_points`.
+
+    Optional key-word arguments
+    ===========================
+    :param path: `Path`, default=PATH_TILES (docs/tiles)
+        Directory to write the tiles to, it is replaced.
+    :param min_zoom: `int`, default=0
+    :param max_zoom: `int`, default=8
+        At `max_zoom` the toponyms are not aggregated.
+    :param cells_per_tile: `int`, default=8
+        Number of cells along each side of a tile.
+
+    Returns
+    =======
+    :export_tiles: `dict`
+        The index written to 'index.json'.
+    """
+
+    if path.exists():
+        shutil.rmtree(path)
+    tiles = dict()
+    max_frequency = 0
+    for zoom in range(min_zoom, max_zoom + 1):
+        cells = aggregate_tiles(
+            df,
+            zoom,
+            cells_per_tile=cells_per_tile,
+            aggregate=zoom < max_zoom,
+        )
+        tiles[zoom] = 0
+        if len(cells):
+            max_frequency = max(max_frequency, int(cells['frequency'].max()))
+        for (x, y), tile in cells.groupby(['x', 'y'], sort=True):
+            out = path / str(zoom) / str(x) / f'{y}.geojson'
+            out.parent.mkdir(parents=True, exist_ok=True)
+            collection = {
+                'type': 'FeatureCollection',
+                'features': to_features(tile),
+            }
+            with open(out, 'w', encoding='utf8') as f:
+                json.dump(collection, f, ensure_ascii=False)
+            tiles[zoom] += 1
+
+    index = {
+        'min_zoom': min_zoom,
+        'max_zoom': max_zoom,
+        'sources': list(pd.unique(df['source'])),
+        'max_frequency': max_frequency,
+        'tiles': tiles,
+    }
+    with open(path / 'index.json', 'w', encoding='utf8') as f:
+        json.dump(index, f)
+    return index
@@ -0,0 +1,228 @@
+"""
+This module detects near-duplicate articles (eg reprints with an edited title
+or a slightly changed body) with MinHash and locality sensitive hashing (LSH).
+
+1. Every article is reduced to a set of word shingles (n consecutive words).
+2. A MinHash signature of `permutations` values is computed per article.
+   The share of equal values in two signatures estimates the Jaccard
+   similarity of their shingle sets.
+3. The signatures are split into `bands`. Articles with an identical band
+   end up in the same bucket and become candidate pairs. Only candidates are
+   compared, so the run time is sub-quadratic in the number of articles.
+4. Candidates with an estimated similarity >= `threshold` are linked and the
+   linked articles form the duplicate clusters.
+
+With b bands of r rows, a pair with similarity s becomes a candidate with
+probability 1 - (1 - s^r)^b. The default (32 bands x 4 rows) catches pairs
+with s >= 0.7 with a probability > 99.9%.
+"""
+
+
+# standard library
+import re
+import zlib
+from collections import defaultdict
+
+# third party
+import numpy as np
+import pandas as pd
+
+
+PRIME = np.uint64(4294967291) # largest prime < 2^32
+SHINGLE_BASE = np.uint64(1000003)
+MASK_32 = np.uint64(0xffffffff)
+RE_WORD = re.compile(r'\w+')
+
+
+def word_hashes(text):
+    "Return the crc32 hashes of the lower cased words in `text`."
+    return np.fromiter(
+        (zlib.crc32(w.encode('utf8')) for w in RE_WORD.findall(text.lower())),
+        dtype='uint64',
+    )
+
+
+def shingle_hashes(text, size=5):
+    """
+    Return the 32-bit hashes of the word shingles of `size` words in `text`.
+    Texts shorter than `size` words are a single shingle.
+    """
+
+    words = word_hashes(text)
+    if len(words) == 0:
+        return words
+    size = min(size, len(words))
+    n = len(words) - size + 1
+    shingles = np.zeros(n, dtype='uint64')
+    for i in range(size):
+        shingles = (shingles * SHINGLE_BASE + words[i:i + n]) & MASK_32
+    return np.unique(shingles)
+
+
+class MinHasher():
+    """
+    MinHasher
+    =========
+    Compute MinHash signatures of shingle sets.
+
+    Attributes
+    ==========
+    permutations: Number of hash functions (length of a signature)
+    seed: Seed for drawing the hash functions
+    """
+
+    def __init__(self, permutations=128, seed=0):
+        rng = np.random.RandomState(seed)
+        self.permutations = permutations
+        self.a = rng.randint(1, PRIME, size=permutations, dtype='uint64')
+        self.b = rng.randint(0, PRIME, size=permutations, dtype='uint64')
+
+    def signature(self, shingles):
+        """
+        Return the signature of an array of 32-bit shingle hashes as `uint32`.
+        An empty set of shingles returns `None`.
+
+        The hash functions are (a * x + b) mod p with p < 2^32, so the
+        products fit in 64 bits.
+        """
+
+        if len(shingles) == 0:
+            return None
+        shingles = shingles % PRIME
+        hashed = (
+            self.a[:, None] * shingles[None, :] + self.b[:, None]
+            ) % PRIME
+        return hashed.min(axis=1).astype('uint32')
+
+
+def lsh_candidates(signatures, bands=32):
+    """
+    Return the candidate pairs of rows in the signature matrix that share at
+    least one band, as a `set` of (i, j) tuples with i < j.
+    """
+
+    n, permutations = signatures.shape
+    if permutations % bands:
+        raise ValueError(
+            f"The number of permutations ({permutations}) must be a multiple "
+            f"of the number of bands ({bands})."
+            )
+    rows = permutations // bands
+    candidates = set()
+    for band in range(bands):
+        buckets = defaultdict(list)
+        chunk = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+        for i, key in enumerate(chunk.view(f'V{chunk.itemsize * rows}').ravel()):
+            buckets[key.tobytes()].append(i)
+        for members in buckets.values():
+            if len(members) > 1:
+                for a in range(len(members)):
+                    for b in range(a + 1, len(members)):
+                        candidates.add((members[a], members[b]))
+    return candidates
+
+
+def clusters_from_pairs(n, pairs):
+    "Return the cluster (lowest member) of every item, linking the pairs."
+    parent = np.arange(n)
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in pairs:
+        ri, rj = find(i), find(j)
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+    return np.array([find(i) for i in range(n)])
+
+
+def find_near_duplicates(
+    df,
+    text_col='body_',
+    threshold=0.8,
+    shingle_size=5,
+    permutations=128,
+    bands=32,
+    across_sources=True,
+    seed=0,
+):
+    """
+    Find clusters of near-duplicate articles and decide which to keep.
+    Within a cluster the earliest article is kept (ties: lowest id).
+
+    Parameters
+    ==========
+    :param df: `DataFrame`
+        Articles with the columns 'id', 'source', 'publication_date' and
+        `text_col` (`str` or list of paragraphs).
+
+    Optional key-word arguments
+    ===========================
+    :param text_col: `str`, default='body_'
+    :param threshold: `float`, default=0.8
+        Minimum estimated Jaccard similarity of two duplicates.
+    :param shingle_size: `int`, default=5
+        Number of words per shingle.
+    :param permutations: `int`, default=128
+    :param bands: `int`, default=32
+    :param across_sources: `boolean`, default=True
+        Also link duplicates published by different sources.
+    :param seed: `int`, default=0
+
+    Returns
+    =======
+    :find_near_duplicates: `DataFrame`
+        One row per article in a cluster of more than one article:
+        'id', 'source', 'publication_date', 'cluster' (id of the kept
+        article), 'similarity' (to the kept article) and 'keep'.
+    """
+
+    df = df.reset_index(drop=True)
+    hasher = MinHasher(permutations, seed=seed)
+    signatures = list()
+    positions = list()
+    for pos, text in enumerate(df[text_col].values):
+        if not isinstance(text, str):
+            text = '\n'.join(text)
+        signature = hasher.signature(shingle_hashes(text, shingle_size))
+        if signature is not None:
+            signatures.append(signature)
+            positions.append(pos)
+
+    columns = [
+        'id', 'source', 'publication_date', 'cluster', 'similarity', 'keep'
+        ]
+    if len(signatures) < 2:
+        return pd.DataFrame(columns=columns)
+    signatures = np.vstack(signatures)
+    positions = np.array(positions)
+    sources = df.source.values[positions]
+
+    def similarity(i, j):
+        return (signatures[i] == signatures[j]).mean()
+
+    pairs = [
+        (i, j) for i, j in lsh_candidates(signatures, bands)
+        if (across_sources or sources[i] == sources[j])
+        and similarity(i, j) >= threshold
+    ]
+    clusters = clusters_from_pairs(len(signatures), pairs)
+    sizes = np.bincount(clusters, minlength=len(signatures))
+    members = np.flatnonzero(sizes[clusters] > 1)
+    if len(members) == 0:
+        return pd.DataFrame(columns=columns)
+
+    result = df.loc[positions[members], ['id', 'source', 'publication_date']]
+    result['_row'] = members
+    result['_cluster'] = clusters[members]
+    result = result.sort_values(['_cluster', 'publication_date', 'id'])
+    first = result.groupby('_cluster')['_row'].transform('first').values
+    result['cluster'] = result.groupby('_cluster')['id'].transform('first')
+    result['similarity'] = [
+        similarity(row, kept) for row, kept in zip(result['_row'].values, first)
+    ]
+    result['keep'] = result['_row'].values == first
+    return result[columns].reset_index(drop=True)
@@ -0,0 +1,446 @@
+"""
+PIPELINE
+========
+
+Run the pipeline of the numbered scripts as a set of stages with declared
+inputs and outputs (based on [PATHS] and [FILENAMES] in 'config.ini'):
+
+    gather_resources          00_gather_resources.py
+    create_model              01_create_model.py
+    textraction:[batch]       `textract_batch` for every batch
+    corpus                    `clean_corpus`: `strip_boilerplate` (if
+                              paragraph_scope = corpus) and
+                              `drop_near_duplicates` (if near_duplicates)
+                              into the 'clean' folder of PATHS.data_int
+    textraction_overview      `collect_overview`
+    serialize:[batch]         `serialize_batch` for every batch
+    analysis                  03_spacify.py --skip-serialize
+    map_tiles                 `export_tiles` of the toponym results into
+                              docs/tiles for docs/map_tiles.html
+
+A stage depends on the stages whose outputs it takes as input. A stage is
+skipped if its inputs and parameters did not change since its last successful
+run and all of its outputs exist. Inputs are compared on path and content
+(digest), so a stage that rewrites an output with the same content does not
+make the stages downstream rerun. Adding a batch therefore only runs the
+stages of that batch and the stages over all batches. Stages that do not
+depend on eachother (eg the batches) run in parallel on a process pool.
+
+The state of the last runs is stored in `PATHS.resources / 'pipeline.json'`.
+
+Usage (from the repo root):
+
+    python -m src.pipeline [stages ...] [--jobs N] [--force] [--dry-run]
+
+Pass stage names (or prefixes such as 'textraction') to run only these stages
+and the stages they depend on.
+"""
+
+
+# standard library
+import argparse
+import json
+import subprocess
+import sys
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+
+# local
+from src.config import (
+    PATH_LIB,
+    PATHS,
+    FILENAMES,
+    LEXISNEXIS,
+    DEDUPLICATION,
+    GEONAMES,
+    MAPPING,
+    MODEL,
+    PROJECT,
+)
+from src.utils import file_digest, fingerprint
+
+
+PATH_SCRIPTS = PATH_LIB / 'scripts'
+PATH_STATE = PATHS.resources / 'pipeline.json'
+
+Stage = namedtuple(
+    'Stage', ['name', 'func', 'args', 'inputs', 'outputs', 'params']
+    )
+Stage.__doc__ = """
+Stage of the pipeline.
+- name:    unique name of the stage
+- func:    picklable function running the stage
+- args:    arguments passed to `func`
+- inputs:  list of paths or (folder, glob pattern) tuples
+- outputs: list of paths (files or folders)
+- params:  settings the result depends on (eg queries from 'config.ini')
+"""
+
+
+# stage functions
+def run_script(script, *argv):
+    "Run one of the numbered scripts in a separate process."
+    subprocess.run(
+        [sys.executable, script, *argv], cwd=PATH_SCRIPTS, check=True
+        )
+    return None
+
+
+def run_textraction(batch, name):
+    from src.textraction import textract_batch_profiled
+    return textract_batch_profiled(batch, name, PATHS.results / 'profiles')
+
+
+def run_corpus():
+    "Run the corpus-wide steps on the processed batches."
+    from src.textraction import clean_corpus
+    return clean_corpus()
+
+
+def run_overview():
+    from src.textraction import collect_overview
+    return collect_overview()
+
+
+@lru_cache(maxsize=None)
+def load_nlp():
+    from spacy.util import load_model
+    return load_model(PATHS.model)
+
+
+def run_serialize(batch):
+    from src.spacy_helpers import serialize_batch
+    from src.textraction import processed_path
+    return serialize_batch(load_nlp(), batch, path_in=processed_path())
+
+
+def run_map_tiles():
+    from src.datasets import load_results
+    from src.map_tiles import export_tiles, toponym_coordinates, toponym_points
+    df = toponym_points(load_results('toponym'), toponym_coordinates())
+    export_tiles(df)
+    return None
+
+
+# stages
+def get_stages():
+    """
+    Return the stages of the pipeline in topological order.
+    """
+
+    from src.map_tiles import PATH_TILES
+    from src.textraction import processed_path
+
+    tables = [f[4:] for f in GEONAMES._fields if f.startswith('url_')]
+    geonames = [
+        PATHS.resources / 'geonames' / f"df_{table}.pkl"
+        for table in tables if table != 'readme'
+    ]
+    model = [PATHS.model / 'fingerprint.txt']
+    results = [
+        PATHS.results / FILENAMES.nlp_statistics,
+        PATHS.results / FILENAMES.dct_counts_total,
+        PATHS.results / FILENAMES.dct_counts_unique,
+        PATHS.results / FILENAMES.df_counts_total,
+        PATHS.results / FILENAMES.df_counts_unique,
+        PATHS.results / FILENAMES.vocabulary,
+        PATHS.results / FILENAMES.entity_cube,
+        PATHS.results / FILENAMES.cooccurrence,
+        PATHS.results / FILENAMES.count_table,
+    ]
+
+    stages = [
+        Stage(
+            name='gather_resources',
+            func=run_script,
+            args=('00_gather_resources.py',),
+            inputs=[],
+            outputs=geonames + [PATHS.shapes / f for f in MAPPING._fields],
+            params=[list(GEONAMES), list(MAPPING)],
+        ),
+        Stage(
+            name='create_model',
+            func=run_script,
+            args=('01_create_model.py',),
+            inputs=geonames + [(PATHS.annotations, 'df_annotations_*.pkl')],
+            outputs=model + [
+                PATHS.resources / f'geonames/geonames_{PROJECT.language}.pkl',
+                PATHS.resources / 'rest_countries/rest_countries.json',
+            ],
+            params=[list(MODEL), PROJECT.language],
+        ),
+    ]
+    for batch, name in zip(LEXISNEXIS.batches, LEXISNEXIS.batch_names):
+        stages.append(Stage(
+            name=f'textraction:{batch}',
+            func=run_textraction,
+            args=(batch, name),
+            inputs=[(PATHS.data_raw / batch, '*.docx')],
+            outputs=[
+                PATHS.data_int / f'{batch}.pkl',
+                PATHS.data_int / f'_{batch}_overview.pkl',
+            ],
+            params=[LEXISNEXIS.queries],
+        ))
+
+    # the corpus-wide steps need all batches, so they share one stage which
+    # writes the cleaned batches to their own folder
+    clean = processed_path()
+    corpus = list()
+    if clean != PATHS.data_int:
+        corpus = [clean / '_overview.pkl']
+        if LEXISNEXIS.paragraph_scope == 'corpus':
+            stripped = clean
+            if DEDUPLICATION.near_duplicates:
+                stripped = clean / '_stripped'
+            corpus.append(stripped / '_paragraph_dupes.pkl')
+        if DEDUPLICATION.near_duplicates:
+            corpus.append(clean / '_near_duplicates.pkl')
+        stages.append(Stage(
+            name='corpus',
+            func=run_corpus,
+            args=(),
+            inputs=[PATHS.data_int / f'{b}.pkl' for b in LEXISNEXIS.batches],
+            outputs=corpus + [clean / f'{b}.pkl' for b in LEXISNEXIS.batches],
+            params=[
+                LEXISNEXIS.batches,
+                LEXISNEXIS.max_paragraph_count,
+                LEXISNEXIS.paragraph_scope,
+                list(DEDUPLICATION),
+            ],
+        ))
+    stages.append(Stage(
+        name='textraction_overview',
+        func=run_overview,
+        args=(),
+        inputs=[
+            PATHS.data_int / f'_{batch}_overview.pkl'
+            for batch in LEXISNEXIS.batches
+        ] + corpus[:1],
+        outputs=[PATHS.results / FILENAMES.textraction],
+        params=[LEXISNEXIS.batches, str(clean)],
+    ))
+    for batch in LEXISNEXIS.batches:
+        stages.append(Stage(
+            name=f'serialize:{batch}',
+            func=run_serialize,
+            args=(batch,),
+            inputs=model + [clean / f'{batch}.pkl'],
+            outputs=[PATHS.data_prc / batch],
+            params=[],
+        ))
+    stages.append(Stage(
+        name='analysis',
+        func=run_script,
+        args=('03_spacify.py', '--skip-serialize'),
+        inputs=model + [
+            (PATHS.data_prc / batch, '*.spacy') for batch in LEXISNEXIS.batches
+        ] + [clean / f'{batch}.pkl' for batch in LEXISNEXIS.batches],
+        outputs=results,
+        params=[LEXISNEXIS.batches],
+    ))
+    stages.append(Stage(
+        name='map_tiles',
+        func=run_map_tiles,
+        args=(),
+        inputs=[
+            PATHS.results / FILENAMES.toponym_results,
+            PATHS.resources / f'geonames/geonames_{PROJECT.language}.pkl',
+            PATHS.resources / 'rest_countries/rest_countries.json',
+        ],
+        outputs=[PATH_TILES],
+        params=[list(MODEL)],
+    ))
+    return stages
+
+
+def input_paths(inputs):
+    "Expand the inputs of a stage into a sorted list of files."
+    paths = set()
+    for item in inputs:
+        if isinstance(item, tuple):
+            folder, pattern = item
+            paths.update(p for p in Path(folder).glob(pattern) if p.is_file())
+        else:
+            paths.add(Path(item))
+    return sorted(paths)
+
+
+def input_folders(inputs):
+    return [
+        Path(item[0]) if isinstance(item, tuple) else Path(item)
+        for item in inputs
+    ]
+
+
+def signature(stage):
+    """
+    Return the fingerprint of the inputs (path, digest) and parameters.
+    """
+
+    files = [
+        [str(path), file_digest(path)] for path in input_paths(stage.inputs)
+    ]
+    return fingerprint(stage.name, stage.params, files)
+
+
+def dependencies(stages):
+    """
+    Return a `dict` mapping each stage name to the names of the stages
+    that produce (part of) its inputs.
+    """
+
+    deps = dict()
+    for stage in stages:
+        deps[stage.name] = set()
+        for needed in input_folders(stage.inputs):
+            for other in stages:
+                if other.name == stage.name:
+                    continue
+                for output in other.outputs:
+                    output = Path(output)
+                    if needed == output or output in needed.parents:
+                        deps[stage.name].add(other.name)
+                    elif needed in output.parents:
+                        deps[stage.name].add(other.name)
+    return deps
+
+
+def select(stages, deps, names):
+    "Select the stages matching `names` (or prefixes) and their dependencies."
+    selected = set()
+    todo = [
+        s.name for s in stages
+        if any(s.name == n or s.name.startswith(f"{n}:") for n in names)
+    ]
+    while todo:
+        name = todo.pop()
+        if name not in selected:
+            selected.add(name)
+            todo.extend(deps[name])
+    return [s for s in stages if s.name in selected]
+
+
+def load_state(path=PATH_STATE):
+    try:
+        with open(path, 'r', encoding='utf8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return dict()
+
+
+def save_state(state, path=PATH_STATE):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf8') as f:
+        json.dump(state, f, indent=4)
+    return None
+
+
+def is_up_to_date(stage, state):
+    outputs_exist = all(Path(p).exists() for p in stage.outputs)
+    return outputs_exist and state.get(stage.name) == signature(stage)
+
+
+def run(
+    names=None,
+    jobs=None,
+    force=False,
+    dry_run=False,
+    stages=None,
+    path_state=PATH_STATE,
+):
+    """
+    Run the (selected) stages of the pipeline.
+
+    Stages are run in waves: every wave holds the stages whose dependencies
+    are done. The stale stages in a wave run in parallel on a process pool.
+
+    Optional key-word arguments
+    ===========================
+    :param names: `list`, default None
+        Names of the stages to run (with their dependencies), all if `None`.
+    :param jobs: `int`, default None
+        Number of processes, defaults to the number of cpus.
+    :param force: `boolean`, default=False
+        Run the stages even if they are up to date.
+    :param dry_run: `boolean`, default=False
+        Only print which stages would run.
+    :param stages: `list`, default None
+        Stages to run instead of `get_stages()`.
+    :param path_state: `Path`, default=PATH_STATE
+
+    Returns
+    =======
+    :run: `dict`
+        Mapping of the stage names to 'ran', 'skipped' or 'would run'.
+    """
+
+    stages = get_stages() if stages is None else stages
+    deps = dependencies(stages)
+    if names:
+        stages = select(stages, deps, names)
+    state = load_state(path_state)
+    status = dict()
+
+    remaining = list(stages)
+    while remaining:
+        waiting = {s.name for s in remaining}
+        wave = [s for s in remaining if not deps[s.name] & waiting]
+        if not wave:
+            raise RuntimeError(f"Circular dependencies between: {waiting}")
+        remaining = [s for s in remaining if s not in wave]
+
+        # a stage is stale if it is forced or if its inputs changed; the
+        # stages that ran in earlier waves already wrote their outputs, on a
+        # dry run they did not, so their dependents would run
+        pending = {n for n, v in status.items() if v == 'would run'}
+        stale = [
+            s for s in wave
+            if force
+            or deps[s.name] & pending
+            or not is_up_to_date(s, state)
+        ]
+        for stage in wave:
+            if stage not in stale:
+                status[stage.name] = 'skipped'
+                print(f"{stage.name:.<40}up to date", flush=True)
+        if dry_run:
+            for stage in stale:
+                status[stage.name] = 'would run'
+                print(f"{stage.name:.<40}would run", flush=True)
+            continue
+        if not stale:
+            continue
+
+        for stage in stale:
+            print(f"{stage.name:.<40}running", flush=True)
+        if len(stale) == 1 or jobs == 1:
+            for stage in stale:
+                stage.func(*stage.args)
+        else:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                futures = [pool.submit(s.func, *s.args) for s in stale]
+                for future in futures:
+                    future.result()
+        for stage in stale:
+            status[stage.name] = 'ran'
+            state[stage.name] = signature(stage)
+        save_state(state, path_state)
+    return status
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Run the toponym extraction pipeline.'
+        )
+    parser.add_argument('stages', nargs='*', help='stages to run (default all)')
+    parser.add_argument('--jobs', type=int, default=None)
+    parser.add_argument('--force', action='store_true')
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    # import run from the module so stage functions pickle by module path
+    from src.pipeline import run
+    run(args.stages, jobs=args.jobs, force=args.force, dry_run=args.dry_run)
@@ -0,0 +1,310 @@
+"""
+This module collects timings, counters and memory usage of a pipeline run.
+
+Measurements are collected in a module level `Profile`, so functions can be
+instrumented without passing a profiler around:
+
+    from src import profiling
+
+    with profiling.stage('textraction'):        # time + RSS sampling
+        ...
+        with profiling.timer('xml_parse'):      # cheap, use in loops
+            ...
+        profiling.count('articles')
+
+    profiling.dump(path)                         # machine-readable JSON
+
+A stage can be profiled in depth with cProfile (or pyinstrument if it is
+installed) by naming it in `start_run` or in the environment variables:
+
+    PROFILE_STAGE=serialize_batch PROFILER=cprofile python 03_spacify.py
+
+The profiler output is written next to the JSON profile.
+"""
+
+
+# standard library
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from pathlib import Path
+
+
+def rss_mb():
+    """
+    Return the resident set size of the current process in MB.
+    Falls back to the peak RSS if the current RSS cannot be read.
+    """
+
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2**20
+    except ImportError:
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+    except ImportError:
+        return None
+
+
+class RSSSampler(threading.Thread):
+    """
+    Sample the RSS in a background thread and keep track of the peak.
+    """
+
+    def __init__(self, interval=0.1):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = rss_mb()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            rss = rss_mb()
+            if rss is not None and (self.peak is None or rss > self.peak):
+                self.peak = rss
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        return self.peak
+
+
+class Profile():
+    """
+    Profile
+    =======
+    Measurements of a single run.
+
+    Attributes
+    ==========
+    name: Name of the run
+    stages: List of stage records (time and memory)
+    timers: Accumulated seconds and calls per timer
+    counters: Counts per counter
+    profile_stage: Name of the stage to profile in depth
+    profiler: 'cprofile' or 'pyinstrument'
+    path_out: Folder to write the profiler output to
+    """
+
+    def __init__(
+        self,
+        name='run',
+        profile_stage=None,
+        profiler='cprofile',
+        path_out=None,
+        rss_interval=0.1,
+    ):
+        self.name = name
+        self.started = datetime.now()
+        self.stages = list()
+        self.timers = defaultdict(lambda: {'seconds': 0.0, 'calls': 0})
+        self.counters = defaultdict(int)
+        self.profile_stage = profile_stage
+        self.profiler = profiler
+        self.path_out = path_out
+        self.rss_interval = rss_interval
+        self._stack = list()
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'started': self.started.isoformat(),
+            'python': sys.version.split()[0],
+            'pid': os.getpid(),
+            'stages': self.stages,
+            'timers': dict(self.timers),
+            'counters': dict(self.counters),
+        }
+
+
+_profile = Profile()
+
+
+def get_profile():
+    return _profile
+
+
+def start_run(name, profile_stage=None, profiler=None, path_out=None):
+    """
+    Start collecting measurements for a new run.
+
+    Parameters
+    ==========
+    :param name: `str`
+        Name of the run, eg the name of the script.
+
+    Optional key-word arguments
+    ===========================
+    :param profile_stage: `str`, default env variable PROFILE_STAGE
+        Name of the stage to profile with cProfile/pyinstrument.
+    :param profiler: `str`, default env variable PROFILER or 'cprofile'
+        'cprofile' or 'pyinstrument'.
+    :param path_out: `str` or `Path`, default None
+        Folder for the profiler output.
+
+    Returns
+    =======
+    :start_run: `Profile`
+    """
+
+    global _profile
+    _profile = Profile(
+        name=name,
+        profile_stage=profile_stage or os.environ.get('PROFILE_STAGE'),
+        profiler=profiler or os.environ.get('PROFILER', 'cprofile'),
+        path_out=Path(path_out) if path_out else None,
+    )
+    return _profile
+
+
+@contextmanager
+def stage(name):
+    """
+    Measure a pipeline stage: wall time, cpu time and RSS (start, end, peak).
+    Stages can be nested, the record holds the full path of the stage.
+    """
+
+    profile = _profile
+    profile._stack.append(name)
+    path = '/'.join(profile._stack)
+    sampler = RSSSampler(profile.rss_interval)
+    sampler.start()
+    record = {'stage': path, 'rss_start_mb': rss_mb()}
+
+    deep = None
+    if profile.profile_stage in (name, path):
+        deep = _start_profiler(profile.profiler)
+    start, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield record
+    finally:
+        record['seconds'] = time.perf_counter() - start
+        record['cpu_seconds'] = time.process_time() - cpu
+        if deep is not None:
+            record['profile'] = _stop_profiler(deep, profile, path)
+        record['rss_end_mb'] = rss_mb()
+        peaks = [sampler.stop(), record['rss_start_mb'], record['rss_end_mb']]
+        peaks = [peak for peak in peaks if peak is not None]
+        record['rss_peak_mb'] = max(peaks) if peaks else None
+        profile.stages.append(record)
+        profile._stack.pop()
+
+
+@contextmanager
+def timer(name):
+    """
+    Accumulate time spent under `name`.
+    Cheap enough to be used within loops (eg per document).
+    """
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        t = _profile.timers[name]
+        t['seconds'] += time.perf_counter() - start
+        t['calls'] += 1
+
+
+def timed(name=None):
+    """
+    Decorator version of `timer`, named after the function by default.
+    """
+
+    def decorator(func):
+        label = name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name, n=1):
+    "Add `n` to the counter `name`."
+    _profile.counters[name] += n
+    return None
+
+
+def dump(path=None, profile=None):
+    """
+    Write the profile as json and return it as `dict`.
+    If `path` is a folder, the file is named after the run and its start time.
+    """
+
+    profile = profile or _profile
+    data = profile.to_dict()
+    if path is None:
+        return data
+
+    path = Path(path)
+    if path.suffix != '.json':
+        path.mkdir(parents=True, exist_ok=True)
+        stamp = profile.started.strftime('%Y%m%d_%H%M%S')
+        path = path / f"profile_{profile.name}_{stamp}.json"
+    with open(path, 'w', encoding='utf8') as f:
+        json.dump(data, f, indent=4)
+    return data
+
+
+def summary(profile=None):
+    "Return a printable summary of the stages and timers."
+    profile = profile or _profile
+    lines = [f"{'stage':.<48}{'seconds':>9}{'peak MB':>10}"]
+    for record in profile.stages:
+        peak = record['rss_peak_mb'] or 0
+        lines.append(
+            f"{record['stage']:.<48}{record['seconds']:>9.2f}{peak:>10.0f}"
+            )
+    if profile.timers:
+        lines.append(f"{'timer':.<48}{'seconds':>9}{'calls':>10}")
+        for name, t in profile.timers.items():
+            lines.append(f"{name:.<48}{t['seconds']:>9.2f}{t['calls']:>10}")
+    return '\n'.join(lines)
+
+
+def _start_profiler(profiler):
+    if profiler == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+            deep = Profiler()
+            deep.start()
+            return deep
+        except ImportError:
+            print('pyinstrument not installed, using cProfile', flush=True)
+    import cProfile
+    deep = cProfile.Profile()
+    deep.enable()
+    return deep
+
+
+def _stop_profiler(deep, profile, path):
+    path_out = profile.path_out or Path('.')
+    path_out.mkdir(parents=True, exist_ok=True)
+    stem = f"profile_{profile.name}_{path.replace('/', '.')}"
+    if hasattr(deep, 'output_html'):
+        deep.stop()
+        file = path_out / f"{stem}.html"
+        file.write_text(deep.output_html(), encoding='utf8')
+    else:
+        deep.disable()
+        file = path_out / f"{stem}.prof"
+        deep.dump_stats(str(file))
+    return str(file)
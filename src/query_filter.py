@@ -0,0 +1,166 @@
+"""
+This module compiles the queries in [LEXISNEXIS] into a filter.
+
+Joining the queries with ' and ' into a single `df.query` evaluates every
+clause as a separate pass over a column. The `QueryFilter` groups the clauses
+before evaluating them:
+
+- `col != 'a'`, `col != 'b'`, ...   one `isin` test per column
+- `col == 'a'`                      one `isin` test per column
+- `~col.str.contains('a')`, ...     one regex (a|b|...) pass per column
+- anything else                     evaluated with `df.eval`
+
+So adding exclusions (eg ids) does not add passes over the data. The filter
+also reports how many records each clause excludes.
+
+Only clauses comparing a column with a single string literal are grouped.
+Clauses combining tests (and, or, not, &, |, parentheses) are evaluated with
+`df.eval` as a whole.
+"""
+
+
+# standard library
+import re
+from collections import defaultdict
+
+# third party
+import numpy as np
+import pandas as pd
+
+
+RE_COMPARE = re.compile(r"""^\s*(\w+)\s*(==|!=)\s*(['"])([^'"]*)\3\s*$""")
+RE_CONTAINS = re.compile(
+    r"""^\s*(~?)\s*(\w+)\.str\.contains\(\s*(['"])([^'"]*)\3\s*\)\s*$"""
+)
+RE_LITERAL = re.compile(r"""(['"])[^'"]*\1""")
+RE_COMPOUND = re.compile(r"\b(?:and|or|not)\b|[&|]")
+
+
+def is_compound(query):
+    "Return True if `query` combines clauses (outside of its string literals)."
+    return bool(RE_COMPOUND.search(RE_LITERAL.sub("''", query)))
+
+
+class QueryFilter():
+    """
+    QueryFilter
+    ===========
+    Filter compiled from a list of query strings (combined with 'and').
+
+    Attributes
+    ==========
+    queries: The query strings
+    exclude: Values to exclude per column (`!=` clauses)
+    require: Values to require per column (`==` clauses)
+    exclude_patterns: Regex patterns to exclude per column
+    require_patterns: Regex patterns to require per column
+    (each value or pattern maps to the list of its queries)
+    other: Clauses evaluated with `df.eval`
+
+    Methods
+    =======
+    mask: Return the boolean mask of the records that pass the filter
+    hits: Return the number of records excluded per clause
+    apply: Return the records that pass and the records that were removed
+    """
+
+    def __init__(self, queries):
+        self.queries = list(queries)
+        self.exclude = defaultdict(dict)
+        self.require = defaultdict(dict)
+        self.exclude_patterns = defaultdict(dict)
+        self.require_patterns = defaultdict(dict)
+        self.other = list()
+        for query in self.queries:
+            self._compile(query)
+        self._regex = {
+            col: re.compile('|'.join(f'(?:{p})' for p in patterns))
+            for col, patterns in self.exclude_patterns.items()
+        }
+
+    def _compile(self, query):
+        if is_compound(query):
+            self.other.append(query)
+            return None
+        match = RE_COMPARE.match(query)
+        if match:
+            col, op, _, value = match.groups()
+            target = self.exclude if op == '!=' else self.require
+            target[col].setdefault(value, []).append(query)
+            return None
+        match = RE_CONTAINS.match(query)
+        if match:
+            negate, col, _, pattern = match.groups()
+            target = self.exclude_patterns if negate else self.require_patterns
+            target[col].setdefault(pattern, []).append(query)
+            return None
+        self.other.append(query)
+        return None
+
+    def _exclusions(self, df):
+        "Yield the boolean array of excluded records per compiled test."
+        for col, values in self.exclude.items():
+            yield df[col].isin(values.keys()).values
+        for col, values in self.require.items():
+            if len(values) > 1:
+                # a column cannot be equal to two different values
+                yield np.ones(len(df), dtype=bool)
+            else:
+                yield ~df[col].isin(values.keys()).values
+        for col, regex in self._regex.items():
+            yield df[col].str.contains(regex, na=False).values
+        for col, patterns in self.require_patterns.items():
+            for pattern in patterns:
+                yield ~df[col].str.contains(pattern, na=False).values
+        for query in self.other:
+            yield ~df.eval(query).values.astype(bool)
+
+    def mask(self, df):
+        "Return a boolean `Series` marking the records that pass the filter."
+        keep = np.ones(len(df), dtype=bool)
+        for excluded in self._exclusions(df):
+            keep &= ~excluded
+        return pd.Series(keep, index=df.index)
+
+    def hits(self, df):
+        """
+        Return the number of records excluded by every clause (on its own) as
+        a `Series` indexed by the query strings, in the order of the queries.
+        """
+
+        hits = dict.fromkeys(self.queries, 0)
+        for col, values in self.exclude.items():
+            counts = df.loc[df[col].isin(values.keys()), col].value_counts()
+            for value, n in counts.items():
+                for query in values[value]:
+                    hits[query] = int(n)
+        for col, values in self.require.items():
+            for value, queries in values.items():
+                n = int((df[col] != value).sum())
+                hits.update(dict.fromkeys(queries, n))
+        for col, patterns in self.exclude_patterns.items():
+            # only the records matching the combined regex are tested per clause
+            subset = df.loc[df[col].str.contains(self._regex[col], na=False), col]
+            for pattern, queries in patterns.items():
+                n = int(subset.str.contains(pattern).sum())
+                hits.update(dict.fromkeys(queries, n))
+        for col, patterns in self.require_patterns.items():
+            for pattern, queries in patterns.items():
+                n = int((~df[col].str.contains(pattern, na=False)).sum())
+                hits.update(dict.fromkeys(queries, n))
+        for query in self.other:
+            hits[query] = int((~df.eval(query).astype(bool)).sum())
+        return pd.Series(hits, name='hits', dtype='int64')
+
+    def apply(self, df):
+        """
+        Filter `df`.
+
+        Returns
+        =======
+        :apply: `tuple`
+            The records that pass and the records that were removed.
+        """
+
+        keep = self.mask(df)
+        return df.loc[keep], df.loc[~keep]
@@ -0,0 +1,317 @@
+"""
+This module contains fixed size sketches for counting over very large
+corpora. All sketches are mergeable: sketches built per batch or per worker
+can be combined afterwards into the sketch of the whole corpus.
+
+- `HyperLogLog`: number of distinct items.
+  Uses 2^p one byte registers (16KB for the default p=14). The relative
+  standard error of the estimate is 1.04 / sqrt(2^p), 0.8% for p=14; 95% of
+  the estimates are within two standard errors (1.6%).
+
+- `FrequentItems`: heavy hitters (top-k) with the Misra-Gries algorithm, the
+  deterministic counterpart of Space-Saving. At most `2k` counters are kept.
+  The estimated count of an item is never too high and at most N / (k + 1)
+  too low, N being the total count added (also after merging). Every item
+  occurring more than N / (k + 1) times is kept.
+
+- `CorpusSketch`: distinct lemmas/entities per source and period and the
+  most frequent lemmas/entities per source, built from the counters of
+  `attribute_counter`.
+
+For exact counts with bounded memory see the count-min sketch in the
+`boilerplate` module.
+"""
+
+
+# standard library
+import pickle
+from collections import defaultdict
+
+# third party
+import numpy as np
+import pandas as pd
+
+# local
+from src.boilerplate import paragraph_hash
+
+
+def _splitmix64(x):
+    "Mix 64-bit integers into well distributed 64-bit hashes."
+    with np.errstate(over='ignore'):
+        x = x + np.uint64(0x9e3779b97f4a7c15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xbf58476d1ce4e5b9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94d049bb133111eb)
+        return x ^ (x >> np.uint64(31))
+
+
+def hash_items(items):
+    """
+    Return 64-bit hashes of an iterable of items as `uint64` array.
+    Integers (eg spaCy hash ids) are mixed, other items are hashed as string.
+    """
+
+    items = list(items)
+    if all(isinstance(item, (int, np.integer)) for item in items):
+        keys = np.array(items, dtype='uint64')
+    else:
+        keys = np.fromiter(
+            (paragraph_hash(str(item)) for item in items), dtype='uint64'
+        )
+    return _splitmix64(keys)
+
+
+def _bit_length(x):
+    "Return the number of bits needed for every value of a `uint64` array."
+    length = np.zeros(x.shape, dtype='uint8')
+    x = x.copy()
+    for shift in (32, 16, 8, 4, 2, 1):
+        shift = np.uint64(shift)
+        big = x >= (np.uint64(1) << shift)
+        length[big] += np.uint8(shift)
+        x[big] >>= shift
+    return length + (x > 0)
+
+
+class HyperLogLog():
+    """
+    HyperLogLog
+    ===========
+    Estimate the number of distinct items.
+
+    Attributes
+    ==========
+    p: Precision, the sketch holds 2^p registers
+    registers: `uint8` array
+
+    Methods
+    =======
+    update: Add an iterable of items (or `hashes`, a `uint64` array)
+    merge: Add the items of another sketch with the same precision
+    estimate: Return the estimated number of distinct items
+    """
+
+    def __init__(self, p=14):
+        if not 4 <= p <= 18:
+            raise ValueError("Precision p must be between 4 and 18.")
+        self.p = p
+        self.m = 1 << p
+        self.registers = np.zeros(self.m, dtype='uint8')
+
+    @property
+    def standard_error(self):
+        return 1.04 / np.sqrt(self.m)
+
+    def update(self, items=None, hashes=None):
+        if hashes is None:
+            hashes = hash_items(items)
+        if len(hashes) == 0:
+            return self
+        p = np.uint64(self.p)
+        idx = (hashes >> (np.uint64(64) - p)).astype('int64')
+        rest = hashes & ((np.uint64(1) << (np.uint64(64) - p)) - np.uint64(1))
+        rank = (64 - self.p) - _bit_length(rest).astype('int64') + 1
+        np.maximum.at(self.registers, idx, rank.astype('uint8'))
+        return self
+
+    def merge(self, other):
+        if self.p != other.p:
+            raise ValueError("Sketches must have the same precision.")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(int)))
+        zeros = np.count_nonzero(self.registers == 0)
+        if raw <= 2.5 * m and zeros:
+            # small range correction (linear counting)
+            return m * np.log(m / zeros)
+        return raw
+
+
+class FrequentItems():
+    """
+    FrequentItems
+    =============
+    Misra-Gries heavy hitters sketch keeping at most `2k` counters.
+
+    Attributes
+    ==========
+    k: Number of items guaranteed to be tracked
+    counts: `dict` of the tracked items with their (under)estimated count
+    total: Total count added (N)
+
+    Methods
+    =======
+    update: Add a `dict`/`Counter` of counts
+    merge: Add the counts of another sketch
+    top: Return the n most frequent items
+    """
+
+    def __init__(self, k=1000):
+        self.k = k
+        self.counts = dict()
+        self.total = 0
+
+    @property
+    def max_error(self):
+        "Upper bound of the underestimation of every count: N / (k + 1)."
+        return self.total / (self.k + 1)
+
+    def _reduce(self):
+        # subtract the (k + 1)th largest count from all and drop the rest
+        values = np.fromiter(self.counts.values(), dtype='int64')
+        cut = np.partition(values, len(values) - self.k - 1)[-self.k - 1]
+        self.counts = {
+            item: n - cut for item, n in self.counts.items() if n > cut
+        }
+        return None
+
+    def update(self, counts):
+        for item, n in counts.items():
+            self.counts[item] = self.counts.get(item, 0) + n
+            self.total += n
+        if len(self.counts) > 2 * self.k:
+            self._reduce()
+        return self
+
+    def merge(self, other):
+        total = self.total + other.total
+        self.update(other.counts)
+        self.total = total
+        if len(self.counts) > self.k:
+            self._reduce()
+        return self
+
+    def top(self, n=10):
+        "Return the `n` most frequent items as list of (item, count) tuples."
+        items = sorted(self.counts.items(), key=lambda x: x[1], reverse=True)
+        return items[:n]
+
+
+class CorpusSketch():
+    """
+    CorpusSketch
+    ============
+    Distinct counts per (source, period, attribute) and frequent items per
+    (source, attribute), eg attribute 'lemma' or an entity label.
+
+    Attributes
+    ==========
+    period: 'day', 'week', 'month' or 'year'
+    distinct: `dict` of `HyperLogLog` per (source, period, attribute)
+    frequent: `dict` of `FrequentItems` per (source, attribute)
+
+    Methods
+    =======
+    update: Add the counters of a document
+    merge: Add another `CorpusSketch`
+    distinct_counts: Return the estimated distinct counts as `DataFrame`
+    most_common: Return the most frequent items as `DataFrame`
+    save: Store the sketch
+    load: Load a stored sketch (classmethod)
+    """
+
+    PERIODS = {'day': 'D', 'week': 'W', 'month': 'M', 'year': 'Y'}
+
+    def __init__(self, period='month', p=14, k=1000):
+        self.period = period
+        self.p = p
+        self.k = k
+        self.distinct = defaultdict(lambda: HyperLogLog(self.p))
+        self.frequent = defaultdict(lambda: FrequentItems(self.k))
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['distinct'] = dict(self.distinct)
+        state['frequent'] = dict(self.frequent)
+        return state
+
+    def __setstate__(self, state):
+        distinct = state.pop('distinct')
+        frequent = state.pop('frequent')
+        self.__dict__.update(state)
+        self.distinct = defaultdict(lambda: HyperLogLog(self.p), distinct)
+        self.frequent = defaultdict(lambda: FrequentItems(self.k), frequent)
+
+    def _period(self, day):
+        if pd.isna(day):
+            return pd.NaT
+        return pd.Timestamp(day).to_period(self.PERIODS[self.period]).start_time
+
+    def update(self, source, day, counters):
+        """
+        Add the counters of a document (eg from `attribute_counter`) published
+        by `source` on `day`. Documents without a (parsable) date are counted
+        in the period `NaT`.
+        """
+
+        period = self._period(day)
+        for attribute, counter in counters.items():
+            if not counter:
+                continue
+            self.distinct[(source, period, attribute)].update(counter.keys())
+            self.frequent[(source, attribute)].update(counter)
+        return self
+
+    def merge(self, other):
+        for key, sketch in other.distinct.items():
+            self.distinct[key].merge(sketch)
+        for key, sketch in other.frequent.items():
+            self.frequent[key].merge(sketch)
+        return self
+
+    def distinct_counts(self, by=('source', 'period', 'attribute')):
+        """
+        Return the estimated number of distinct items per combination of the
+        dimensions in `by` ('source', 'period' and/or 'attribute'). The
+        sketches of the other dimensions are merged.
+
+        Returns
+        =======
+        :distinct_counts: `Series`
+        """
+
+        dims = ['source', 'period', 'attribute']
+        by = [by] if isinstance(by, str) else list(by)
+        groups = dict()
+        for key, sketch in self.distinct.items():
+            group = tuple(key[dims.index(dim)] for dim in by)
+            if group not in groups:
+                groups[group] = HyperLogLog(self.p)
+            groups[group].merge(sketch)
+        index = pd.MultiIndex.from_tuples(list(groups), names=by)
+        estimates = [sketch.estimate() for sketch in groups.values()]
+        return pd.Series(estimates, index=index, name='distinct').sort_index()
+
+    def most_common(self, attribute, n=10, vocabulary=None):
+        """
+        Return the `n` most frequent items of `attribute` per source, in the
+        format of `doc_analysis.most_common`.
+        """
+
+        dfs = list()
+        for (source, attr), sketch in self.frequent.items():
+            if attr != attribute:
+                continue
+            cols = pd.MultiIndex.from_product([[source], ['label', 'count']])
+            top = sketch.top(n)
+            if vocabulary is not None:
+                top = [(vocabulary.strings.get(k, k), c) for k, c in top]
+            dfs.append(pd.DataFrame(top, columns=cols))
+        if not dfs:
+            return pd.DataFrame()
+        df = pd.concat(dfs, axis=1)
+        df.index.name = 'ranking'
+        return df
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            pickle.dump(self, f)
+        return None
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
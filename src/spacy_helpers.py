@@ -1,16 +1,32 @@
+# standard library
+from functools import lru_cache
+from pathlib import Path
+
 # third party
 import pandas as pd
 from tqdm import tqdm
-from spacy.tokens import Doc
 
 # local
+from src import profiling
 from src.config import PATHS
 from src.lexisnexis_parser import codify_batch
 
-Doc.set_extension('id', default=None)
+
+@lru_cache(maxsize=None)
+def get_doc_class():
+    """
+    Import the spaCy `Doc` class and register the 'id' extension.
+    Postponed until first use, so importing this module does not load spaCy.
+    """
+
+    from spacy.tokens import Doc
+    if not Doc.has_extension('id'):
+        Doc.set_extension('id', default=None)
+    return Doc
 
 
 def fetch_docs(path, vocab):
+    Doc = get_doc_class()
     l = len(list(path.glob('*.spacy')))
     for doc in tqdm(
         path.glob('*.spacy'), desc=f"{path.name:.<24}", ncols=80, total=l
@@ -20,6 +36,7 @@ def fetch_docs(path, vocab):
 
 
 def fetch_doc(path, vocab):
+    Doc = get_doc_class()
     with open(path, 'rb') as f:
         return Doc(vocab).from_bytes(f.read())
 
@@ -55,27 +72,37 @@ def serialize_batch(
     :serialize_batch: None
     """
 
+    get_doc_class()
     if isinstance(path_in, str):
         path_in = Path(path_in)
     if isinstance(path_out, str):
         path_out = Path(path_out)
 
-    path_batch = path_out / batch
-    if not path_batch.exists():
-        path_batch.mkdir(parents=True)
-
-    for doc_file in path_batch.glob('*.spacy'):
-        doc_file.unlink()
-
-    df = pd.read_pickle(path_in / f"{batch}.pkl")
-    for idx, body in tqdm(
-        df.body_str.iteritems(), desc=f"{batch:.<24}", total=len(df), ncols=80
-        ):
-        doc_id = f"{codify_batch(batch)}_{idx:04d}"
-        doc = nlp(body)
-        doc._.id = doc_id
-        doc_bytes = doc.to_bytes()
-        with open(path_batch / f"{doc_id}.spacy", 'wb') as f:
-            f.write(doc_bytes)
+    with profiling.stage('serialize_batch'):
+        path_batch = path_out / batch
+        if not path_batch.exists():
+            path_batch.mkdir(parents=True)
+
+        for doc_file in path_batch.glob('*.spacy'):
+            doc_file.unlink()
+
+        with profiling.timer('serialize_batch.read'):
+            df = pd.read_pickle(path_in / f"{batch}.pkl")
+        for idx, body in tqdm(
+            df.body_str.iteritems(),
+            desc=f"{batch:.<24}",
+            total=len(df),
+            ncols=80,
+            ):
+            doc_id = f"{codify_batch(batch)}_{idx:04d}"
+            with profiling.timer('serialize_batch.nlp'):
+                doc = nlp(body)
+            doc._.id = doc_id
+            with profiling.timer('serialize_batch.serialize'):
+                doc_bytes = doc.to_bytes()
+            with profiling.timer('serialize_batch.write'):
+                with open(path_batch / f"{doc_id}.spacy", 'wb') as f:
+                    f.write(doc_bytes)
+        profiling.count('serialize_batch.docs', len(df))
 
     return None
@@ -0,0 +1,402 @@
+# standard library
+from pathlib import Path
+
+# third party
+import pandas as pd
+
+# local
+from src import profiling
+from src.boilerplate import ParagraphCounter, paragraph_table, remove_paragraphs
+from src.config import LEXISNEXIS, DEDUPLICATION, PATHS, FILENAMES
+from src.lexisnexis_parser import (
+    docxs_to_df,
+    split_page_from_section,
+    parse_datestring,
+    standardize_df,
+)
+from src.near_duplicates import find_near_duplicates
+from src.query_filter import QueryFilter
+
+
+def textract_batch(
+    batch,
+    name,
+    path_in=PATHS.data_raw,
+    path_out=PATHS.data_int,
+    queries=LEXISNEXIS.queries,
+    max_paragraph_count=LEXISNEXIS.max_paragraph_count,
+):
+    """
+    Parse and process a batch of LexisNexis docx files:
+    1. Parse the docx files and store the raw data.
+    2. Where possible process columns into the appropriate types.
+    3. Remove duplicate records.
+    4. Remove duplicate paragraphs from the text body.
+    5. Standardize the df.
+    6. Perform the queries.
+
+    The processed batch is stored as '[batch].pkl' in `path_out`. The raw data,
+    the duplicate paragraphs, the removed records, the number of records
+    removed per query and the overview are stored in separate files starting
+    with an underscore.
+
+    Parameters
+    ==========
+    :param batch: `str`
+        Name of the folder in `path_in` containing the docx files.
+    :param name: `str`
+        Name of the source.
+
+    Optional key-word arguments
+    ===========================
+    :param path_in: `str` or `Path`, default=PATHS.data_raw
+    :param path_out: `str` or `Path`, default=PATHS.data_int
+    :param queries: `list`, default=LEXISNEXIS.queries
+        Queries used to filter the data set (see `QueryFilter`).
+    :param max_paragraph_count: `int`, default=LEXISNEXIS.max_paragraph_count
+        Paragraphs occurring more often within the batch are removed.
+
+    Returns
+    =======
+    :textract_batch: `Series`
+        Number of records after each step.
+    """
+
+    path_in = Path(path_in)
+    path_out = Path(path_out)
+    results = dict()
+
+    with profiling.stage(batch):
+        # save original parsed data
+        df = docxs_to_df(path_in / batch)
+        df.to_pickle(path_out / f'_{batch}_raw.pkl')
+        results['initial'] = len(df)
+
+        with profiling.stage('types'):
+            # set source to configured batch name
+            df['source'] = name
+
+            # separate section and page
+            df = split_page_from_section(df)
+
+            # extract length as integer
+            df['length'] = df.length.str.split(' ').str[0].astype('int')
+
+            # convert date strings to dates (Dutch or English, no locale)
+            df['load_date'] = pd.to_datetime(df['load_date'])
+            df['publication_date'] = parse_datestring(
+                df['publication_date'],
+                split_on=None,
+            )
+
+        # drop duplicate rows
+        with profiling.stage('dedup'):
+            subset = ['title', 'publication_date', 'section']
+            df = df.drop_duplicates(subset=subset, keep='first')
+            results['deduped'] = len(df)
+
+        with profiling.stage('paragraph_dedup'):
+            # count occurrence of paragraphs
+            paragraphs = ParagraphCounter('exact').update(df.body.values)
+            df_dupes = paragraph_table(df.body.values, paragraphs, min_count=2)
+            df_dupes.to_pickle(path_out / f"_{batch}_paragraph_dupes.pkl")
+
+            # remove duplicate paragraphs
+            dupes = paragraphs.boilerplate(max_paragraph_count)
+            df['body_'] = remove_paragraphs(df.body.values, dupes)
+
+            # add body as string
+            df['body_str'] = df.body_.str.join('\n')
+
+        # standardize
+        with profiling.stage('standardize'):
+            df = standardize_df(df, batch)
+
+        # remove items
+        with profiling.stage('query'):
+            query_filter = QueryFilter(queries)
+            df_out, df_removed = query_filter.apply(df)
+            hits = query_filter.hits(df)
+
+        # save files
+        with profiling.stage('write'):
+            df_out.to_pickle(path_out / f'{batch}.pkl')
+            df_removed.to_pickle(path_out / f'_{batch}_removed.pkl')
+            hits.to_pickle(path_out / f'_{batch}_query_hits.pkl')
+
+    results['filtered'] = len(df_out)
+    results['duped_paragraphs'] = len(df_dupes)
+    profiling.count('articles', results['initial'])
+    profiling.count('articles_kept', results['filtered'])
+    s = pd.Series(results, name=name)
+    s.to_pickle(path_out / f'_{batch}_overview.pkl')
+    return s
+
+
+def textract_batch_profiled(batch, name, path_profiles=None, **kwargs):
+    """
+    Run `textract_batch` with its own profile, eg in a worker process.
+    The profile is stored in `path_profiles` if given.
+
+    Returns
+    =======
+    :textract_batch_profiled: `Series`
+    """
+
+    profiling.start_run(f'textraction_{batch}', path_out=path_profiles)
+    s = textract_batch(batch, name, **kwargs)
+    if path_profiles:
+        profiling.dump(path_profiles)
+    return s
+
+
+def to_pickle_if_changed(df, path):
+    """
+    Store `df` as pickle at `path`, unless the stored `DataFrame` is equal to
+    it, so the files of the batches that did not change keep their content
+    and modification time.
+
+    Returns
+    =======
+    :to_pickle_if_changed: `bool`
+        True if the file was written.
+    """
+
+    path = Path(path)
+    if path.exists() and pd.read_pickle(path).equals(df):
+        return False
+    df.to_pickle(path)
+    return True
+
+
+def processed_path(path=PATHS.data_int):
+    """
+    Return the folder holding the processed batches: the 'clean' folder in
+    `path` if one of the corpus-wide steps is enabled in 'config.ini', else
+    `path` itself.
+    """
+
+    path = Path(path)
+    corpus = (
+        LEXISNEXIS.paragraph_scope == 'corpus'
+        or DEDUPLICATION.near_duplicates
+    )
+    return path / 'clean' if corpus else path
+
+
+def strip_boilerplate(
+    batches=LEXISNEXIS.batches,
+    path_in=PATHS.data_int,
+    path_out=PATHS.data_int / 'clean',
+    max_paragraph_count=LEXISNEXIS.max_paragraph_count,
+    mode='auto',
+):
+    """
+    Remove boilerplate paragraphs corpus-wide from the processed batches.
+
+    The paragraphs of all batches are counted by hash, one batch at a time.
+    Paragraphs occurring more than `max_paragraph_count` times in the corpus
+    are removed from 'body_' (and 'body_str') of every batch. With a large
+    corpus the counter switches to a count-min sketch and the candidates are
+    verified in a second pass (see the `boilerplate` module), so memory stays
+    bounded.
+
+    The batches are read from `path_in` and stored in `path_out`, the
+    boilerplate paragraphs in '_paragraph_dupes.pkl' in `path_out`.
+
+    Optional key-word arguments
+    ===========================
+    :param batches: `list`, default=LEXISNEXIS.batches
+    :param path_in: `str` or `Path`, default=PATHS.data_int
+        Location of the processed batches.
+    :param path_out: `str` or `Path`, default=PATHS.data_int / 'clean'
+        Location of the cleaned batches.
+    :param max_paragraph_count: `int`, default=LEXISNEXIS.max_paragraph_count
+    :param mode: `str`, default='auto'
+        'exact', 'sketch' or 'auto'.
+
+    Returns
+    =======
+    :strip_boilerplate: `Series`
+        Number of paragraphs removed per batch.
+    """
+
+    path_in = Path(path_in)
+    path_out = Path(path_out)
+    path_out.mkdir(parents=True, exist_ok=True)
+
+    def bodies():
+        for batch in batches:
+            yield pd.read_pickle(path_in / f'{batch}.pkl').body.values
+
+    with profiling.stage('boilerplate'):
+        paragraphs = ParagraphCounter(mode)
+        for body in bodies():
+            paragraphs.update(body)
+        paragraphs.verify(bodies(), max_count=max_paragraph_count)
+        dupes = paragraphs.boilerplate(max_paragraph_count)
+        profiling.count('boilerplate.paragraphs', len(dupes))
+
+        removed = dict()
+        tables = list()
+        for batch in batches:
+            df = pd.read_pickle(path_in / f'{batch}.pkl')
+            n_before = df.body_.str.len().sum()
+            df['body_'] = remove_paragraphs(df.body_.values, dupes)
+            df['body_str'] = df.body_.str.join('\n')
+            removed[batch] = n_before - df.body_.str.len().sum()
+            tables.append(paragraph_table(
+                df.body.values, paragraphs, min_count=max_paragraph_count + 1
+                ))
+            to_pickle_if_changed(df, path_out / f'{batch}.pkl')
+
+    df_dupes = pd.concat(tables)
+    df_dupes = df_dupes[~df_dupes.index.duplicated()]
+    df_dupes.to_pickle(path_out / '_paragraph_dupes.pkl')
+    return pd.Series(removed, name='boilerplate_removed')
+
+
+def drop_near_duplicates(
+    batches=LEXISNEXIS.batches,
+    path_in=PATHS.data_int,
+    path_out=PATHS.data_int / 'clean',
+    threshold=DEDUPLICATION.threshold,
+    shingle_size=DEDUPLICATION.shingle_size,
+    permutations=DEDUPLICATION.permutations,
+    bands=DEDUPLICATION.bands,
+    across_sources=DEDUPLICATION.across_sources,
+):
+    """
+    Remove near-duplicate articles corpus-wide from the processed batches.
+
+    The 'body_' of all batches is compared with MinHash LSH (see the
+    `near_duplicates` module). Of every cluster of near-duplicates only the
+    earliest article is kept. The batches are read from `path_in` and stored
+    without the removed articles in `path_out`. The removed articles are
+    stored in '_[batch]_near_duplicates.pkl' and the clusters with the
+    keep/drop decision in '_near_duplicates.pkl' in `path_out`.
+
+    Optional key-word arguments
+    ===========================
+    :param batches: `list`, default=LEXISNEXIS.batches
+    :param path_in: `str` or `Path`, default=PATHS.data_int
+        Location of the processed batches.
+    :param path_out: `str` or `Path`, default=PATHS.data_int / 'clean'
+        Location of the cleaned batches.
+    :param threshold: `float`, default=DEDUPLICATION.threshold
+    :param shingle_size: `int`, default=DEDUPLICATION.shingle_size
+    :param permutations: `int`, default=DEDUPLICATION.permutations
+    :param bands: `int`, default=DEDUPLICATION.bands
+    :param across_sources: `boolean`, default=DEDUPLICATION.across_sources
+
+    Returns
+    =======
+    :drop_near_duplicates: `Series`
+        Number of articles removed per batch.
+    """
+
+    path_in = Path(path_in)
+    path_out = Path(path_out)
+    path_out.mkdir(parents=True, exist_ok=True)
+    columns = ['id', 'source', 'publication_date', 'body_']
+
+    with profiling.stage('near_duplicates'):
+        df = pd.concat(
+            [pd.read_pickle(path_in / f'{b}.pkl')[columns] for b in batches],
+            ignore_index=True,
+        )
+        clusters = find_near_duplicates(
+            df,
+            threshold=threshold,
+            shingle_size=shingle_size,
+            permutations=permutations,
+            bands=bands,
+            across_sources=across_sources,
+        )
+        clusters.to_pickle(path_out / '_near_duplicates.pkl')
+        drop = set(clusters.loc[~clusters.keep.astype(bool), 'id'])
+        profiling.count('near_duplicates.dropped', len(drop))
+
+        removed = dict()
+        for batch in batches:
+            df = pd.read_pickle(path_in / f'{batch}.pkl')
+            mask = df.id.isin(drop)
+            to_pickle_if_changed(
+                df.loc[mask], path_out / f'_{batch}_near_duplicates.pkl'
+            )
+            to_pickle_if_changed(df.loc[~mask], path_out / f'{batch}.pkl')
+            removed[batch] = int(mask.sum())
+    return pd.Series(removed, name='near_duplicates_removed')
+
+
+def clean_corpus(
+    batches=LEXISNEXIS.batches,
+    path_in=PATHS.data_int,
+    path_out=PATHS.data_int / 'clean',
+    paragraph_scope=LEXISNEXIS.paragraph_scope,
+    near_duplicates=DEDUPLICATION.near_duplicates,
+):
+    """
+    Run the enabled corpus-wide steps (`strip_boilerplate` if
+    `paragraph_scope` is 'corpus', `drop_near_duplicates` if
+    `near_duplicates`) on the batches in `path_in`.
+
+    The cleaned batches are stored in `path_out`, the batches in `path_in`
+    are left as they are. Running it again therefore always starts from the
+    output of `textract_batch`. Only the cleaned batches whose content
+    changed are written (eg after adding a batch), so the stages reading
+    the other batches are not rerun. If both steps run, the batches without
+    boilerplate are kept in '_stripped' in `path_out`. The number of
+    paragraphs and articles removed per batch is stored in '_overview.pkl'
+    in `path_out`.
+
+    Returns
+    =======
+    :clean_corpus: `DataFrame`
+        Number of paragraphs and articles removed (columns) per batch.
+    """
+
+    path_out = Path(path_out)
+    results = list()
+    if paragraph_scope == 'corpus':
+        path_stripped = path_out / '_stripped' if near_duplicates else path_out
+        results.append(strip_boilerplate(batches, path_in, path_stripped))
+        path_in = path_stripped
+    if near_duplicates:
+        results.append(drop_near_duplicates(batches, path_in, path_out))
+    df = pd.concat(results, axis=1) if results else pd.DataFrame(index=batches)
+    path_out.mkdir(parents=True, exist_ok=True)
+    df.to_pickle(path_out / '_overview.pkl')
+    return df
+
+
+def collect_overview(
+    batches=LEXISNEXIS.batches,
+    path_in=PATHS.data_int,
+    path_out=PATHS.results / FILENAMES.textraction,
+):
+    """
+    Combine the overviews stored by `textract_batch` in the order of `batches`
+    and store the result as the textraction overview. If the corpus-wide
+    steps are enabled, the numbers removed by `clean_corpus` are added, with
+    the number of articles in the cleaned batches as 'clean'.
+
+    Returns
+    =======
+    :collect_overview: `DataFrame`
+    """
+
+    path_in = Path(path_in)
+    overview = [pd.read_pickle(path_in / f'_{b}_overview.pkl') for b in batches]
+    df = pd.concat(overview, axis=1)
+    path_clean = processed_path(path_in)
+    if path_clean != path_in:
+        corpus = pd.read_pickle(path_clean / '_overview.pkl').loc[batches]
+        corpus.index = df.columns
+        df = pd.concat([df, corpus.T])
+        if 'near_duplicates_removed' in corpus:
+            df.loc['clean'] = df.loc['filtered'] - corpus.near_duplicates_removed
+        else:
+            df.loc['clean'] = df.loc['filtered']
+    df.to_pickle(path_out)
+    return df
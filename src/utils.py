@@ -1,5 +1,6 @@
 #standard library
-import requests
+import hashlib
+import json
 import zipfile
 from pathlib import Path
 
@@ -116,6 +117,8 @@ def get_dataset(parameters, path_out):
 
 
 def download_from_url(url, filename=None, path_out=None, chunk_size=1024):
+    import requests
+
     headers = {'User-_Agent': PROJECT.user_agent}
     if not filename:
         filename = Path(url).name
@@ -157,3 +160,44 @@ def load_csv_from_zip(
 def print_title(x):
     print(f"{x.upper()}\n{'=' * len(x)}", flush=True)
     return None
+
+
+def file_digest(path, algorithm='sha1', chunk_size=1 << 20):
+    """
+    Return the hex digest of the content of a file.
+    Return `None` if the file does not exist.
+
+    Parameters
+    ==========
+    :param path: `str` or `Path`
+
+    Optional key-word arguments
+    ===========================
+    :param algorithm: `str`, default='sha1'
+        Any algorithm available in `hashlib`.
+    :param chunk_size: `int`, default=1MB
+        Number of bytes read at once.
+
+    Returns
+    =======
+    :file_digest: `str`
+    """
+
+    path = Path(path)
+    if not path.is_file():
+        return None
+    h = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def fingerprint(*parts):
+    """
+    Return a digest of json serializable parts (eg file digests, queries).
+    Equal parts always give the same fingerprint.
+    """
+
+    data = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha1(data.encode('utf8')).hexdigest()
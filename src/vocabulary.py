@@ -0,0 +1,113 @@
+"""
+This module holds the shared vocabulary of the counts.
+
+The lemmas and entities are counted by their 64-bit spaCy hash id (eg
+`token.lemma` instead of `token.lemma_`), so counting does not allocate a
+string per token and the stored counts do not repeat the strings. The strings
+are stored once, in the vocabulary (FILENAMES.vocabulary), and only looked up
+when they are displayed:
+
+    vocabulary = Vocabulary.load()
+    vocabulary.materialize(counts['total']['trouw']['countries'])
+"""
+
+
+# standard library
+import pickle
+from collections import Counter
+
+# local
+from src.config import PATHS, FILENAMES
+
+
+class Vocabulary():
+    """
+    Vocabulary
+    ==========
+    Mapping of the hash ids used as keys in the counts to their strings.
+
+    Attributes
+    ==========
+    strings: `dict` mapping ids to strings
+
+    Methods
+    =======
+    add: Add the strings of ids from a spaCy `StringStore`
+    add_string: Add a string (hashed as spaCy does) and return its id
+    id: Return the id of a string
+    encode: Return the ids of a list of strings
+    materialize: Return a `Counter` with strings as keys
+    save: Store the vocabulary
+    load: Load a stored vocabulary (classmethod)
+    """
+
+    def __init__(self, strings=None):
+        self.strings = dict(strings or {})
+        self._ids = None
+
+    def __len__(self):
+        return len(self.strings)
+
+    def __contains__(self, idx):
+        return idx in self.strings
+
+    def __getitem__(self, idx):
+        return self.strings[idx]
+
+    def add(self, store, ids):
+        """
+        Add the strings of `ids` from a spaCy `StringStore` (eg `nlp.vocab.
+        strings`). Return the ids that are not in the store.
+        """
+
+        missing = list()
+        for idx in ids:
+            if idx in self.strings:
+                continue
+            try:
+                self.strings[idx] = store[idx]
+            except KeyError:
+                missing.append(idx)
+        self._ids = None
+        return missing
+
+    def add_string(self, string):
+        "Add `string` with its spaCy hash as id and return the id."
+        idx = self.id(string)
+        if idx is None:
+            from spacy.strings import hash_string
+            idx = hash_string(string)
+            self.strings[idx] = string
+            self._ids[string] = idx
+        return idx
+
+    def id(self, string):
+        "Return the id of `string` or `None` if it is not in the vocabulary."
+        if self._ids is None:
+            self._ids = {s: idx for idx, s in self.strings.items()}
+        return self._ids.get(string)
+
+    def encode(self, strings):
+        "Return the ids of `strings`, skipping the unknown strings."
+        ids = (self.id(string) for string in strings)
+        return [idx for idx in ids if idx is not None]
+
+    def materialize(self, counter):
+        """
+        Return `counter` with the strings as keys. Keys that are not ids in the
+        vocabulary (eg strings) are kept.
+        """
+
+        return Counter({
+            self.strings.get(key, key): n for key, n in counter.items()
+        })
+
+    def save(self, path=PATHS.results / FILENAMES.vocabulary):
+        with open(path, 'wb') as f:
+            pickle.dump(self.strings, f)
+        return None
+
+    @classmethod
+    def load(cls, path=PATHS.results / FILENAMES.vocabulary):
+        with open(path, 'rb') as f:
+            return cls(pickle.load(f))
@@ -0,0 +1,57 @@
+# standard library
+from collections import namedtuple
+from datetime import datetime
+
+# third party
+import pandas as pd
+
+# local
+from src.annotation_store import AnnotationStore
+from src.doc_analysis import get_positives
+
+
+Annotation = namedtuple(
+    'Annotation', ['phrase', 'id', 'annotation', 'timestamp']
+)
+ANNOTATIONS = [
+    Annotation('Holland', 'trouw_0000', '+', datetime(2019, 1, 1, 12)),
+    Annotation('Holland', 'trouw_0001', '-', datetime(2019, 1, 1, 13)),
+    Annotation('Brussel', 'volks_0000', '+', datetime(2019, 1, 2, 9)),
+    Annotation('Brussel', 'volks_0001', '+', datetime(2019, 1, 2, 10)),
+    Annotation('Londen', 'teleg_0000', '?', datetime(2019, 1, 3, 8)),
+    Annotation('Londen', 'teleg_0001', '+', datetime(2019, 1, 3, 9)),
+    Annotation('Londen', 'teleg_0002', '+', datetime(2019, 1, 3, 10)),
+]
+
+
+def test_append_load(tmp_path):
+    path = tmp_path / 'places.jsonl'
+    store = AnnotationStore(Annotation, path=path)
+    for annotation in ANNOTATIONS:
+        store.append(annotation)
+    loaded = AnnotationStore.load(path)
+    assert [tuple(a) for a in loaded.annotations] == ANNOTATIONS
+    assert loaded.tallies == store.tallies
+    assert 'Brussel' in loaded
+
+
+def test_missing_values_roundtrip(tmp_path):
+    path = tmp_path / 'places.jsonl'
+    df = pd.DataFrame(ANNOTATIONS[:2])
+    df.loc[0, 'timestamp'] = pd.NaT
+    df.loc[1, 'id'] = None
+    AnnotationStore(Annotation, path=path).replace(df.itertuples(index=False))
+    loaded = AnnotationStore.load(path)
+    assert loaded.annotations[0].timestamp is None
+    assert loaded.annotations[1].id is None
+    assert loaded.annotations[1].timestamp == ANNOTATIONS[1].timestamp
+
+
+def test_positives(tmp_path):
+    store = AnnotationStore(Annotation)
+    store.replace(ANNOTATIONS)
+    df = pd.DataFrame(ANNOTATIONS)
+    for threshold in [0, 50, 60, 100]:
+        expected = sorted(get_positives(df, threshold=threshold))
+        assert sorted(store.positives(threshold=threshold)) == expected
+        assert sorted(get_positives(store, threshold=threshold)) == expected
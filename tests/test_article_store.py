@@ -0,0 +1,37 @@
+# third party
+import pandas as pd
+
+# local
+from src.article_store import ArticleStore
+
+
+def make_batch(path, batch, n):
+    df = pd.DataFrame({
+        'id': [f'{batch}_{i:04d}' for i in range(n)],
+        'source': batch,
+        'publication_date': pd.date_range('2019-01-01', periods=n),
+        'body_': [[f'paragraph {i}', 'tekst'] for i in range(n)],
+    })
+    df.to_pickle(path / f'{batch}.pkl')
+    return df
+
+
+def test_get_article(tmp_path):
+    dfs = {batch: make_batch(tmp_path, batch, 5) for batch in ['trouw', 'volks']}
+    store = ArticleStore(tmp_path)
+    for batch, df in dfs.items():
+        for row in df.itertuples(index=False):
+            article = store.get_article(row.id)
+            assert article.name == row.id
+            assert article['source'] == row.source
+            assert article['publication_date'] == row.publication_date
+            assert article['body_'] == row.body_
+
+
+def test_get_article_after_change(tmp_path):
+    make_batch(tmp_path, 'trouw', 3)
+    ArticleStore(tmp_path).get_article('trouw_0002')
+    df = make_batch(tmp_path, 'trouw', 4)
+    df['source'] = 'Trouw'
+    df.to_pickle(tmp_path / 'trouw.pkl')
+    assert ArticleStore(tmp_path).get_article('trouw_0003')['source'] == 'Trouw'
@@ -0,0 +1,15 @@
+# local
+from src.basemaps import source_key
+
+
+def test_source_key_includes_sidecar_files(tmp_path):
+    shp = tmp_path / 'provincies.shp'
+    assert source_key(shp) is None
+    for suffix in ['.shp', '.shx', '.dbf']:
+        shp.with_suffix(suffix).write_bytes(b'0000')
+    (tmp_path / 'gemeenten.dbf').write_bytes(b'0000')
+    key = source_key(shp)
+    (tmp_path / 'gemeenten.dbf').write_bytes(b'00000')
+    assert source_key(shp) == key
+    shp.with_suffix('.dbf').write_bytes(b'00000')
+    assert source_key(shp) != key
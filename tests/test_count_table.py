@@ -0,0 +1,58 @@
+# standard library
+from collections import Counter
+
+# third party
+import pandas as pd
+
+# local
+from src.count_table import CountTable
+
+
+COUNTS = {
+    'total': {
+        'trouw': {
+            'countries': Counter({'Nederland': 5, 'Holland': 2, 'China': 1}),
+            'lemma': Counter({'zijn': 9, 'brexit': 4}),
+        },
+        'volkskrant': {
+            'countries': Counter({'China': 3}),
+            'lemma': Counter({'brexit': 7, 'worden': 2}),
+        },
+    },
+}
+ALTS = {'Nederland': ['Holland']}
+
+
+def test_to_dict_equals_counts():
+    d = CountTable.build(COUNTS).to_dict()
+    assert d.keys() == COUNTS.keys()
+    for count_type, batches in COUNTS.items():
+        assert d[count_type].keys() == batches.keys()
+        for batch, attributes in batches.items():
+            assert dict(d[count_type][batch]) == attributes
+
+
+def test_to_dict_merges_and_drops_stopwords():
+    table = CountTable.build(COUNTS, alts=ALTS)
+    d = table.to_dict(stopwords=['zijn', 'worden'])
+    assert d['total']['trouw']['countries'] == Counter(
+        {'Nederland': 7, 'China': 1}
+    )
+    assert d['total']['trouw']['lemma'] == Counter({'brexit': 4})
+    assert d['total']['volkskrant']['lemma'] == Counter({'brexit': 7})
+
+
+def test_to_dict_is_lazy():
+    view = CountTable.build(COUNTS).to_dict()['total']['trouw']
+    assert not view._counters
+    assert view['lemma'] is view['lemma']
+    assert list(view._counters) == ['lemma']
+
+
+def test_save_load(tmp_path):
+    table = CountTable.build(COUNTS, alts=ALTS)
+    table.save(tmp_path, key='key')
+    loaded = CountTable.load(tmp_path)
+    assert loaded.offsets == table.offsets
+    assert loaded.to_dict() == table.to_dict()
+    pd.testing.assert_frame_equal(loaded.to_frame(), table.to_frame())
@@ -0,0 +1,26 @@
+# third party
+import pytest
+
+# local
+from src.datasets import load_dataset, load_results
+
+
+def test_missing_file_raises(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        load_dataset(tmp_path / 'missing.csv')
+    with pytest.raises(FileNotFoundError):
+        load_results(str(tmp_path / 'missing_results.gz'))
+
+
+def test_load_dataset_dtypes(tmp_path):
+    path = tmp_path / 'dataset.csv'
+    path.write_text(
+        'id,source,publication_date,page,n_words\n'
+        'trouw_0000,trouw,2019-01-01,5,120\n'
+        'volks_0000,volks,2019-01-02,,80\n'
+    )
+    df = load_dataset(str(path), cache=False)
+    assert df.source.dtype == 'category'
+    assert df.page.dtype == 'Int16'
+    assert df.n_words.dtype == 'Int32'
+    assert df.page.isna().tolist() == [False, True]
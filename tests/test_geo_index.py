@@ -0,0 +1,28 @@
+# third party
+import numpy as np
+import pandas as pd
+
+# local
+from src.geo_index import GeoIndex, haversine
+
+
+PLACES = pd.DataFrame({
+    'name': ['Amsterdam', 'Haarlem', 'Utrecht', 'Zandvoort', 'Rotterdam'],
+    'latitude': [52.37, 52.38, 52.09, 52.37, 51.92],
+    'longitude': [4.90, 4.64, 5.12, 4.53, 4.48],
+    'population': [870_000, 160_000, 360_000, 17_000, 650_000],
+})
+
+
+def test_nearest_min_population():
+    index = GeoIndex(PLACES)
+    for min_population in [0, 100_000, 500_000, 10**7]:
+        result = index.nearest(52.38, 4.55, k=2, min_population=min_population)
+        places = PLACES.loc[PLACES.population >= min_population]
+        km = haversine(52.38, 4.55, places.latitude, places.longitude)
+        expected = places.assign(km=km).nsmallest(2, 'km')
+        assert result.name.tolist() == expected.name.tolist()
+        assert np.allclose(result.distance_km, expected.km)
+    data, tree = index.populated(500_000)
+    assert index.populated(500_000)[1] is tree
+    assert data.name.tolist() == ['Amsterdam', 'Rotterdam']
@@ -0,0 +1,33 @@
+# third party
+import pandas as pd
+
+# local
+from src.lexisnexis_parser import split_page_from_section
+
+
+def test_split_page_from_section():
+    df = pd.DataFrame({'section': [
+        'SPORT; Blz. 5',
+        'SPORT; Voetbal; Blz. 5',
+        'Binnenland; | Politiek; Blz. 12',
+        '; Blz. 2',
+    ]})
+    df = split_page_from_section(df)
+    assert df.section.tolist()[:3] == [
+        'sport', 'sport; voetbal', 'binnenland; politiek'
+    ]
+    assert df.sub_section.tolist()[1:3] == ['voetbal', 'politiek']
+    assert df.section.isna().tolist() == [False, False, False, True]
+    assert df.sub_section.isna().tolist() == [True, False, False, True]
+    assert df.page.tolist() == [5, 5, 12, 2]
+
+
+def test_sub_sections_are_not_duplicates():
+    df = pd.DataFrame({
+        'title': ['Uitslagen'] * 2,
+        'publication_date': ['2019-01-01'] * 2,
+        'section': ['SPORT; Voetbal; Blz. 5', 'SPORT; Tennis; Blz. 5'],
+    })
+    df = split_page_from_section(df)
+    subset = ['title', 'publication_date', 'section']
+    assert len(df.drop_duplicates(subset=subset)) == 2
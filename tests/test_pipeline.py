@@ -0,0 +1,83 @@
+# local
+from src.pipeline import Stage, run
+
+
+def extract(path_in, path_out):
+    path_out.write_text(path_in.read_text().upper())
+
+
+def combine(paths_in, paths_out):
+    "Write every output, but only if its content changed (as `clean_corpus`)."
+    for path_in, path_out in zip(paths_in, paths_out):
+        text = path_in.read_text().strip()
+        if not path_out.exists() or path_out.read_text() != text:
+            path_out.write_text(text)
+
+
+def serialize(path_in, path_out):
+    path_out.write_text(path_in.read_text()[::-1])
+
+
+def get_stages(path, batches):
+    raw, clean = path / 'raw', path / 'clean'
+    clean.mkdir(exist_ok=True)
+    stages = [
+        Stage(
+            name=f'textraction:{batch}',
+            func=extract,
+            args=(raw / f'{batch}.txt', path / f'{batch}.txt'),
+            inputs=[raw / f'{batch}.txt'],
+            outputs=[path / f'{batch}.txt'],
+            params=[],
+        )
+        for batch in batches
+    ]
+    stages.append(Stage(
+        name='corpus',
+        func=combine,
+        args=(
+            [path / f'{batch}.txt' for batch in batches],
+            [clean / f'{batch}.txt' for batch in batches],
+        ),
+        inputs=[path / f'{batch}.txt' for batch in batches],
+        outputs=[clean / f'{batch}.txt' for batch in batches],
+        params=[batches],
+    ))
+    stages.extend(
+        Stage(
+            name=f'serialize:{batch}',
+            func=serialize,
+            args=(clean / f'{batch}.txt', path / f'{batch}.prc'),
+            inputs=[clean / f'{batch}.txt'],
+            outputs=[path / f'{batch}.prc'],
+            params=[],
+        )
+        for batch in batches
+    )
+    return stages
+
+
+def test_adding_a_batch_only_runs_its_stages(tmp_path):
+    (tmp_path / 'raw').mkdir()
+    for batch in ['trouw', 'volks']:
+        (tmp_path / 'raw' / f'{batch}.txt').write_text(f'{batch} ')
+    kw = dict(jobs=1, path_state=tmp_path / 'pipeline.json')
+
+    status = run(stages=get_stages(tmp_path, ['trouw', 'volks']), **kw)
+    assert set(status.values()) == {'ran'}
+
+    (tmp_path / 'raw' / 'teleg.txt').write_text('teleg ')
+    batches = ['trouw', 'volks', 'teleg']
+    status = run(stages=get_stages(tmp_path, batches), **kw)
+    assert status == {
+        'textraction:trouw': 'skipped',
+        'textraction:volks': 'skipped',
+        'textraction:teleg': 'ran',
+        'corpus': 'ran',
+        'serialize:trouw': 'skipped',
+        'serialize:volks': 'skipped',
+        'serialize:teleg': 'ran',
+    }
+
+    status = run(stages=get_stages(tmp_path, batches), dry_run=True, **kw)
+    assert set(status.values()) == {'skipped'}
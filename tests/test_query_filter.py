@@ -0,0 +1,62 @@
+# third party
+import pandas as pd
+import pytest
+
+# local
+from src.query_filter import QueryFilter, is_compound
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({
+        'id': ['a_0', 'a_1', 'a_2', 'b_0', 'b_1', 'b_2'],
+        'section': ['sport', 'news', 'sport', 'opinion', 'news', 'sport'],
+        'title': ['zzz', 'brexit', 'voetbal', 'zzz', 'brexit deal', 'uitslag'],
+        'length': [10, 200, 30, 400, 500, 60],
+    })
+
+
+QUERIES = [
+    ["section != 'sport'"],
+    ["section != 'sport'", "section != 'news'", "id != 'b_0'"],
+    ["section == 'news'"],
+    ["~title.str.contains('zzz')", "~title.str.contains('deal')"],
+    ["title.str.contains('brexit')"],
+    ["length > 50"],
+    # compound clauses must be evaluated as a whole
+    ["section != 'sport' or title == 'zzz'"],
+    ["section == 'sport' and title != 'zzz'"],
+    ["(section != 'sport') | (length > 50)"],
+    ["section != 'sport' & id != 'b_0'"],
+    ["not section == 'news'"],
+    ["~title.str.contains('zzz') | title.str.contains('voetbal')"],
+    ["section != 'sport' or title == 'zzz'", "id != 'a_1'", "length > 20"],
+    # clauses sharing a value
+    ["section != 'sport'", "section!='sport'", "section != 'sport'"],
+    ["section == 'news'", 'section == "news"'],
+    ["~title.str.contains('zzz')", "~ title.str.contains('zzz')"],
+    ["title.str.contains('brexit')", 'title.str.contains("brexit")'],
+]
+
+
+@pytest.mark.parametrize('queries', QUERIES)
+def test_filter_equals_query(df, queries):
+    expected = df.query(' and '.join(f"({q})" for q in queries))
+    kept, removed = QueryFilter(queries).apply(df)
+    pd.testing.assert_frame_equal(kept, expected)
+    assert len(kept) + len(removed) == len(df)
+
+
+@pytest.mark.parametrize('queries', QUERIES)
+def test_hits_equal_query(df, queries):
+    hits = QueryFilter(queries).hits(df)
+    for query in queries:
+        assert hits[query] == len(df) - len(df.query(query))
+
+
+def test_is_compound():
+    assert is_compound("section != 'sport' or title == 'zzz'")
+    assert is_compound("(a == 'x') & (b == 'y')")
+    assert not is_compound("section != 'sport'")
+    assert not is_compound("section != 'sport or news'")
+    assert not is_compound("~title.str.contains('a|b')")
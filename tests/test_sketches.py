@@ -0,0 +1,21 @@
+# standard library
+from collections import Counter
+
+# third party
+import pandas as pd
+
+# local
+from src.sketches import CorpusSketch
+
+
+def test_update_without_date():
+    sketch = CorpusSketch(period='month')
+    sketch.update('trouw', '2019-01-15', {'lemma': Counter('ab')})
+    sketch.update('trouw', pd.NaT, {'lemma': Counter('abc')})
+    sketch.update('trouw', None, {'lemma': Counter('d')})
+
+    counts = sketch.distinct_counts(by='period')
+    assert round(counts[pd.Timestamp('2019-01-01')]) == 2
+    assert round(counts[pd.NaT]) == 4
+    top = dict(sketch.frequent[('trouw', 'lemma')].top(2))
+    assert top == {'a': 2, 'b': 2}
@@ -0,0 +1,44 @@
+# third party
+import numpy as np
+import pandas as pd
+
+# local
+from src.textraction import clean_corpus
+
+
+TEXT = 'de snelle bruine vos springt over de luie hond in het park van de stad'
+
+
+def make_batch(path, batch, n, start='2019-01-01', duplicate=False):
+    words = np.random.default_rng(list(batch.encode())).integers(0, 10**6, (n, 20))
+    bodies = [[' '.join(map(str, row))] for row in words]
+    if duplicate:
+        bodies[0] = [TEXT]
+    df = pd.DataFrame({
+        'id': [f'{batch}_{i:04d}' for i in range(n)],
+        'source': 'bron',
+        'publication_date': pd.date_range(start, periods=n),
+        'body': bodies,
+        'body_': bodies,
+    })
+    df['body_str'] = df.body_.str.join('\n')
+    df.to_pickle(path / f'{batch}.pkl')
+
+
+def test_clean_corpus_only_writes_changed_batches(tmp_path):
+    clean = tmp_path / 'clean'
+    make_batch(tmp_path, 'trouw', 3, duplicate=True)
+    make_batch(tmp_path, 'volks', 3)
+    kw = dict(path_in=tmp_path, path_out=clean, near_duplicates=True)
+    clean_corpus(['trouw', 'volks'], **kw)
+    mtimes = {f.name: f.stat().st_mtime_ns for f in clean.glob('*.pkl')}
+
+    # the new batch repeats an article of trouw: only teleg changes
+    make_batch(tmp_path, 'teleg', 2, start='2019-02-01', duplicate=True)
+    df = clean_corpus(['trouw', 'volks', 'teleg'], **kw)
+    assert df.near_duplicates_removed.to_dict() == {
+        'trouw': 0, 'volks': 0, 'teleg': 1
+    }
+    for name in ['trouw.pkl', 'volks.pkl', '_volks_near_duplicates.pkl']:
+        assert (clean / name).stat().st_mtime_ns == mtimes[name]
+    assert len(pd.read_pickle(clean / 'teleg.pkl')) == 1